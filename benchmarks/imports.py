@@ -0,0 +1,50 @@
+""" Reports the cumulative import time of each tropopause entry point,
+    measured with python -X importtime in a fresh interpreter
+
+    python benchmarks/imports.py
+"""
+import subprocess
+import sys
+
+STATEMENTS = [
+    'import tropopause',
+    'from tropopause import Template',
+    'from tropopause import InternetGatewayVPC',
+    'from tropopause import AutoScalingGroup',
+    'from tropopause import RoleFromYaml',
+    'import tropopause.ec2',
+    'import tropopause.elasticloadbalancingv2',
+]
+
+
+def import_times(statement):
+    """ Cumulative microseconds spent importing each top level module
+        and the names of every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented below the module importing them
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+        modules.add(name.strip())
+    return total, modules
+
+
+def main():
+    baseline, startup = import_times('pass')
+    for statement in STATEMENTS:
+        total, modules = import_times(statement)
+        print('%-48s %8dus %4d modules' % (
+            statement, total - baseline, len(modules - startup)
+        ))
+
+
+if __name__ == '__main__':
+    main()
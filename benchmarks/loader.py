@@ -0,0 +1,63 @@
+""" Compares loading YAML documents one at a time with preloading them
+    in a thread pool, optionally adding a per file delay to stand in for
+    a network file system
+
+    python benchmarks/loader.py --files 200 --latency 0.005
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+import tropopause.loader
+from tropopause.loader import DocumentCache
+
+DOCUMENT = '''Version: '2012-10-17'
+Statement:
+- Effect: Allow
+  Action:
+  - s3:GetObject
+  Resource: arn:aws:s3:::bucket%d/*
+'''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds added to every file read')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args(argv)
+    directory = tempfile.mkdtemp()
+    safe_load = tropopause.loader.safe_load
+
+    def slow_load(stream):
+        time.sleep(args.latency)
+        return safe_load(stream)
+    try:
+        paths = []
+        for i in range(args.files):
+            paths.append(os.path.join(directory, 'policy%d.yaml' % i))
+            with open(paths[-1], 'w') as stream:
+                stream.write(DOCUMENT % i)
+        with mock.patch('tropopause.loader.safe_load', slow_load):
+            cache = DocumentCache(maxsize=args.files)
+            start = time.perf_counter()
+            for path in paths:
+                cache.load(path)
+            serial = time.perf_counter() - start
+            cache = DocumentCache()
+            start = time.perf_counter()
+            cache.preload(directory, max_workers=args.workers)
+            for path in paths:
+                cache.load(path)
+            preloaded = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory)
+    print('%-12s %10.4fs' % ('serial', serial))
+    print('%-12s %10.4fs' % ('preload', preloaded))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+""" Compares Template.to_json() with the streaming serializers on a large
+    template. Each method runs in its own process so the peak RSS growth
+    while serializing is not hidden by an earlier run
+
+    python benchmarks/serializer.py
+"""
+import multiprocessing
+import resource
+import tempfile
+import time
+import tracemalloc
+from troposphere import Template
+from troposphere.ec2 import SecurityGroup, SecurityGroupRule
+from tropopause.serializer import dump_json, dump_yaml
+
+GROUPS = 200
+RULES = 200
+
+
+def build():
+    template = Template()
+    for i in range(GROUPS):
+        SecurityGroup(
+            'sg%d' % i,
+            template,
+            GroupDescription='group %d' % i,
+            SecurityGroupIngress=[
+                SecurityGroupRule(
+                    IpProtocol='tcp',
+                    CidrIp='10.%d.%d.0/24' % (i, j),
+                    FromPort=str(1000 + j),
+                    ToPort=str(1000 + j)
+                ) for j in range(RULES)
+            ]
+        )
+    return template
+
+
+METHODS = {
+    'to_json': lambda template, stream: stream.write(template.to_json()),
+    'dump_json': dump_json,
+    'dump_json compact': lambda template, stream: dump_json(
+        template, stream, compact=True
+    ),
+    'dump_yaml': dump_yaml,
+}
+
+
+def run(name, queue):
+    template = build()
+    with tempfile.TemporaryFile('w') as stream:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        METHODS[name](template, stream)
+        seconds = time.perf_counter() - start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        size = stream.tell()
+        stream.seek(0)
+        tracemalloc.start()
+        METHODS[name](template, stream)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    queue.put((seconds, rss, peak, size))
+
+
+def main():
+    print('%d resources, %d rules each' % (GROUPS, RULES))
+    print('%18s %10s %14s %16s %12s' % (
+        'method', 'seconds', 'rss growth KB', 'traced peak KB', 'output KB'
+    ))
+    queue = multiprocessing.Queue()
+    for name in METHODS:
+        process = multiprocessing.Process(target=run, args=(name, queue))
+        process.start()
+        seconds, rss, peak, size = queue.get()
+        process.join()
+        print('%18s %10.3f %14d %16d %12d' % (
+            name, seconds, rss, peak // 1024, size // 1024
+        ))
+
+
+if __name__ == '__main__':
+    main()
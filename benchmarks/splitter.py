@@ -0,0 +1,53 @@
+""" Times building, rendering and splitting a network of public and
+    private subnets well beyond CloudFormation's resource limit
+
+    python benchmarks/splitter.py [ZONES]
+"""
+import sys
+import time
+from troposphere import Ref
+from tropopause import Tags, Template
+from tropopause.ec2 import InternetGatewayVPC, PrivateSubnet, PublicSubnet
+from tropopause.splitter import report, split_template
+
+ZONES = 1000
+
+
+def build(zones):
+    template = Template(max_resources=None)
+    vpc = InternetGatewayVPC(
+        'vpc', template, CidrBlock='10.0.0.0/8', Tags=Tags(Name='vpc')
+    )
+    for i in range(zones):
+        PublicSubnet(
+            'publiczone%d' % i, template, AvailabilityZone='zone%d' % i,
+            CidrBlock='10.%d.%d.0/24' % (i // 128, i % 128 * 2),
+            VpcId=Ref(vpc)
+        )
+        PrivateSubnet(
+            'private%d' % i, template, AvailabilityZone='zone%d' % i,
+            CidrBlock='10.%d.%d.0/24' % (i // 128, i % 128 * 2 + 1),
+            VpcId=Ref(vpc)
+        )
+    return template
+
+
+def main():
+    zones = int(sys.argv[1]) if len(sys.argv) > 1 else ZONES
+    start = time.perf_counter()
+    template = build(zones)
+    print('build %d resources %.3f' % (
+        len(template.resources), time.perf_counter() - start
+    ))
+    start = time.perf_counter()
+    document = template.to_dict()
+    print('to_dict %.3f' % (time.perf_counter() - start))
+    for mode in ('nested', 'exports'):
+        start = time.perf_counter()
+        split = split_template(document, name='network', mode=mode)
+        print('%s %.3f' % (mode, time.perf_counter() - start))
+    report(split)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+""" Builds templates of parametrised size from every tropopause construct
+    and records construction, tag merging and serialization time plus
+    peak traced memory, as JSON so results can be compared between
+    releases
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --zones 3 --tiers 3 --peers 4 --tags 30
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+import troposphere
+from troposphere import Ref
+from troposphere.autoscaling import Metadata
+from troposphere.cloudformation import Init
+from troposphere.elasticloadbalancingv2 import Certificate
+import tropopause
+from tropopause import Tags, Template
+from tropopause.autoscaling import AutoScalingGroup, LaunchConfigurationRPM
+from tropopause.cloudformation import InitConfigFromS3
+from tropopause.ec2 import InternetGatewayVPC, RoutedVPCPeeringConnection
+from tropopause.ec2 import PublicSubnet, PrivateSubnet, SecureSubnet
+from tropopause.ec2 import SecurityGroupFromYaml, Tier, build_subnet_tiers
+from tropopause.elasticloadbalancingv2 import SecureLoadBalancerWithListener
+from tropopause.serializer import dump_json
+
+TIERS = [
+    Tier('public', PublicSubnet),
+    Tier('private', PrivateSubnet),
+    Tier('secure', SecureSubnet),
+    Tier('data', SecureSubnet),
+]
+
+SIZES = [
+    {'zones': 1, 'tiers': 2, 'peers': 1, 'tags': 5, 'rules': 10},
+    {'zones': 3, 'tiers': 3, 'peers': 2, 'tags': 20, 'rules': 50},
+    {'zones': 6, 'tiers': 4, 'peers': 2, 'tags': 50, 'rules': 200},
+]
+
+
+def write_rules(directory, rules):
+    """ A rules document with one cidr and port per rule, so nothing
+        collapses and the compiled rule count equals rules
+    """
+    path = os.path.join(directory, 'rules%d.yaml' % rules)
+    with open(path, 'w') as stream:
+        for i in range(rules):
+            stream.write(
+                'r%d:\n  cidr:\n  - 10.%d.%d.0/24\n'
+                '  protocols:\n    tcp:\n    - \'%d\'\n'
+                % (i, i // 256, i % 256, 1000 + 2 * i)
+            )
+    return path
+
+
+def timed(timings, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = timings.get(name, 0) + time.perf_counter() - start
+    return result
+
+
+def build(size, rules_path):
+    """ Build a stack from every construct, returns the template and the
+        time spent in each construct
+    """
+    timings = OrderedDict()
+    template = Template()
+    tags = {'tag%d' % i: 'value%d' % i for i in range(size['tags'])}
+    vpc = timed(
+        timings, 'InternetGatewayVPC', InternetGatewayVPC,
+        'vpc', template, CidrBlock='10.0.0.0/16', Tags=Tags(tags)
+    )
+    zones = ['us-east-1' + chr(ord('a') + i) for i in range(size['zones'])]
+    subnets = timed(
+        timings, 'build_subnet_tiers', build_subnet_tiers,
+        template, vpc, '10.0.0.0/16', zones, TIERS[:size['tiers']]
+    )
+    for i in range(size['peers']):
+        timed(
+            timings, 'RoutedVPCPeeringConnection',
+            RoutedVPCPeeringConnection,
+            'peer%d' % i, template,
+            PeerCidrBlock='10.%d.0.0/16' % (i + 1),
+            PeerVpcId='vpc-%08d' % i,
+            VpcId=Ref(vpc)
+        )
+    timed(
+        timings, 'SecurityGroupFromYaml', SecurityGroupFromYaml,
+        'securitygroup', template, GroupDescription='benchmark',
+        SecurityGroupIngress=rules_path, VpcId=Ref(vpc)
+    )
+    timed(
+        timings, 'LaunchConfigurationRPM', LaunchConfigurationRPM,
+        'launchconfig', template, ImageId='ami-12345678',
+        InstanceType='t2.micro',
+        Metadata=Metadata(Init({
+            'config': timed(
+                timings, 'InitConfigFromS3', InitConfigFromS3,
+                url='s3://example/bootstrap.sh'
+            )
+        }))
+    )
+    zone_subnets = list(subnets.values())[-1]
+    timed(
+        timings, 'AutoScalingGroup', AutoScalingGroup,
+        'asg', template, MinSize=0, MaxSize=1,
+        LaunchConfigurationName=Ref('launchconfig'),
+        VPCZoneIdentifier=[Ref(subnet) for subnet in zone_subnets]
+    )
+    timed(
+        timings, 'SecureLoadBalancerWithListener',
+        SecureLoadBalancerWithListener,
+        'loadbalancer', template,
+        Certificates=[Certificate(CertificateArn='arn:aws:acm:::x')],
+        Port='443', Subnets=[Ref(subnet) for subnet in zone_subnets],
+        VpcId=Ref(vpc)
+    )
+    return template, timings
+
+
+def tag_merge(size, number=1000):
+    """ Seconds per merge of a VPC and a subnet Tags of the given size """
+    left = Tags({'tag%d' % i: 'vpc' for i in range(size['tags'])})
+    right = {'tag%d' % i: 'subnet' for i in range(0, size['tags'], 2)}
+    start = time.perf_counter()
+    for _ in range(number):
+        left + Tags(right)
+    return (time.perf_counter() - start) / number
+
+
+def run(size, rules_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        template, timings = build(size, rules_path)
+        timings['total'] = time.perf_counter() - start
+        if best is None or timings['total'] < best['total']:
+            best = timings
+    start = time.perf_counter()
+    template.to_json()
+    to_json = time.perf_counter() - start
+    start = time.perf_counter()
+    dump_json(template, io.StringIO())
+    streamed = time.perf_counter() - start
+    tracemalloc.start()
+    template, _ = build(size, rules_path)
+    build_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    tracemalloc.start()
+    template.to_json()
+    serialize_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return OrderedDict([
+        ('parameters', size),
+        ('resources', len(template.resources)),
+        ('construction', best),
+        ('tag_merge', tag_merge(size)),
+        ('serialization', OrderedDict([
+            ('to_json', to_json), ('dump_json', streamed)
+        ])),
+        ('peak_bytes', OrderedDict([
+            ('construction', build_peak), ('to_json', serialize_peak)
+        ])),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    for name in ['zones', 'tiers', 'peers', 'tags', 'rules']:
+        parser.add_argument('--' + name, type=int)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results here, not stdout')
+    args = parser.parse_args(argv)
+    sizes = SIZES
+    given = {
+        name: getattr(args, name)
+        for name in ['zones', 'tiers', 'peers', 'tags', 'rules']
+        if getattr(args, name) is not None
+    }
+    if given:
+        sizes = [dict(SIZES[0], **given)]
+    directory = tempfile.mkdtemp()
+    try:
+        results = OrderedDict([
+            ('tropopause', tropopause.__version__),
+            ('troposphere', troposphere.__version__),
+            ('python', platform.python_version()),
+            ('results', [
+                run(size, write_rules(directory, size['rules']), args.repeat)
+                for size in sizes
+            ]),
+        ])
+    finally:
+        shutil.rmtree(directory)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=4)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == '__main__':
+    main()
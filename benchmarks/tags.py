@@ -0,0 +1,31 @@
+""" Measures the cost of merging tropopause Tags as the tag count grows
+
+    python benchmarks/tags.py
+"""
+import timeit
+from tropopause import Tags
+
+SIZES = [1, 10, 50, 100, 500, 1000]
+NUMBER = 1000
+
+
+def merge(size):
+    left = Tags({'left%d' % i: 'value' for i in range(size)})
+    right = {'right%d' % i: 'value' for i in range(size // 2)}
+    right.update({'left%d' % i: 'other' for i in range(size // 2)})
+
+    def run():
+        return left + Tags(right)
+    return run
+
+
+def main():
+    print('%8s %14s %14s' % ('tags', 'usec/merge', 'usec/tag'))
+    for size in SIZES:
+        seconds = timeit.timeit(merge(size), number=NUMBER)
+        usec = seconds / NUMBER * 1e6
+        print('%8d %14.2f %14.4f' % (size, usec, usec / size))
+
+
+if __name__ == '__main__':
+    main()
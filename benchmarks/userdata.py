@@ -0,0 +1,71 @@
+""" Compares allocations for stacks of LaunchConfigurationRPMs with init
+    configs when the UserData and cfn-init fragments are rebuilt for every
+    resource and when they are shared between resources and stacks
+
+    python benchmarks/userdata.py
+"""
+import gc
+import tracemalloc
+from troposphere import Template
+from troposphere.autoscaling import Metadata
+from troposphere.cloudformation import Init
+from tropopause.autoscaling import LaunchConfigurationRPM
+from tropopause.autoscaling import generic_user_data_rpm
+from tropopause.cloudformation import InitConfigFromS3
+from tropopause.cloudformation import cfn_hup_files, cfn_hup_services
+
+STACKS = 20
+LAUNCH_CONFIGURATIONS = 10
+
+
+def clear():
+    generic_user_data_rpm.cache_clear()
+    cfn_hup_files.cache_clear()
+    cfn_hup_services.cache_clear()
+
+
+def build(shared):
+    templates = []
+    for stack in range(STACKS):
+        template = Template()
+        for i in range(LAUNCH_CONFIGURATIONS):
+            if not shared:
+                clear()
+            LaunchConfigurationRPM(
+                'launchconfig%d' % i,
+                template,
+                ImageId='ami-12345678',
+                InstanceType='t2.micro',
+                Metadata=Metadata(Init({
+                    'config': InitConfigFromS3(url='s3://example/example.sh')
+                }))
+            )
+        templates.append(template)
+    return templates
+
+
+def measure(shared):
+    clear()
+    gc.collect()
+    objects = len(gc.get_objects())
+    tracemalloc.start()
+    templates = build(shared)
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    objects = len(gc.get_objects()) - objects
+    del templates
+    return objects, current
+
+
+def main():
+    print('%10s %12s %14s' % ('fragments', 'gc objects', 'bytes'))
+    for shared in (False, True):
+        objects, current = measure(shared)
+        print('%10s %12d %14d' % (
+            'shared' if shared else 'rebuilt', objects, current
+        ))
+
+
+if __name__ == '__main__':
+    main()
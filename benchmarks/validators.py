@@ -0,0 +1,55 @@
+""" Times tropopause.validators.valid_url against the nested quantifier
+    pattern it replaced, on valid urls and adversarial paths that make the
+    old pattern backtrack exponentially
+
+    python benchmarks/validators.py
+"""
+import re
+import timeit
+from tropopause.validators import valid_url
+
+NESTED = r'(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?$'
+SIZES = [2, 4, 6, 8, 10, 12]
+LONG_SIZES = [1000, 10000, 100000]
+
+
+def nested_url(url):
+    if re.compile(NESTED).match(url):
+        return url
+    raise ValueError(url)
+
+
+def adversarial(size):
+    return 'http://www.example.com/' + 'a' * size + '!'
+
+
+def seconds(validator, url, number):
+    def run():
+        try:
+            validator(url)
+        except ValueError:
+            pass
+    return timeit.timeit(run, number=number) / number
+
+
+def main():
+    url = 'https://s3.amazonaws.com/example/bootstrap/example.sh'
+    print('valid url, usec: nested %.2f, valid_url %.2f' % (
+        seconds(nested_url, url, 10000) * 1e6,
+        seconds(valid_url, url, 10000) * 1e6
+    ))
+    print('%8s %14s %14s' % ('path', 'nested ms', 'valid_url ms'))
+    for size in SIZES:
+        print('%8d %14.3f %14.3f' % (
+            size,
+            seconds(nested_url, adversarial(size), 1) * 1e3,
+            seconds(valid_url, adversarial(size), 100) * 1e3
+        ))
+    for size in LONG_SIZES:
+        print('%8d %14s %14.3f' % (
+            size, '-', seconds(valid_url, adversarial(size), 10) * 1e3
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
+import sys
 from troposphere import Ref, Template
 from troposphere.autoscaling import Metadata
 from troposphere.cloudformation import Init
 from troposphere.ec2 import Subnet, VPC
 from tropopause.autoscaling import AutoScalingGroup, LaunchConfigurationRPM
 from tropopause.cloudformation import InitConfigFromS3
+from tropopause.serializer import dump_json
 
 
 CidrBlock = '10.10.0.0/20'
@@ -57,4 +59,5 @@ asg = AutoScalingGroup(
 )
 
 
-print(template.to_json())
+dump_json(template, sys.stdout)
+print()
@@ -1,11 +1,12 @@
-from ipaddress import ip_network
-from troposphere import Ref, Tags, Template
-from tropopause.ec2 import InternetGatewayVPC
+import sys
+from troposphere import Tags
+from tropopause import Template
+from tropopause.ec2 import InternetGatewayVPC, Tier, build_subnet_tiers
 from tropopause.ec2 import PublicSubnet, PrivateSubnet, SecureSubnet
+from tropopause.serializer import dump_json
 
 CidrBlock = '10.10.0.0/20'
 region = 'us-east-1'
-subnets = list(ip_network(CidrBlock).subnets(prefixlen_diff=4))
 
 template = Template()
 template.add_version('2010-09-09')
@@ -19,32 +20,18 @@ vpc = InternetGatewayVPC(
 
 zones = ['a', 'b', 'c']
 
-i = 0
-for zone in zones:
-    PublicSubnet(
-        'public' + region.replace('-', '') + zone,
-        template,
-        AvailabilityZone=region + zone,
-        CidrBlock=str(subnets[i % len(zones) + 0 * len(zones)]),
-        MapPublicIpOnLaunch=True,
-        VpcId=Ref(vpc)
-    )
-    PrivateSubnet(
-        'private' + region.replace('-', '') + zone,
-        template,
-        AvailabilityZone=region + zone,
-        CidrBlock=str(subnets[i % len(zones) + 1 * len(zones)]),
-        MapPublicIpOnLaunch=False,
-        VpcId=Ref(vpc)
-    )
-    SecureSubnet(
-        'secure' + region.replace('-', '') + zone,
-        template,
-        AvailabilityZone=region + zone,
-        CidrBlock=str(subnets[i % len(zones) + 2 * len(zones)]),
-        MapPublicIpOnLaunch=False,
-        VpcId=Ref(vpc)
-    )
-    i = i + 1
+build_subnet_tiers(
+    template,
+    vpc,
+    CidrBlock,
+    [region + zone for zone in zones],
+    [
+        Tier('public', PublicSubnet),
+        Tier('private', PrivateSubnet),
+        Tier('secure', SecureSubnet)
+    ],
+    new_prefix=24
+)
 
-print(template.to_json())
+dump_json(template, sys.stdout)
+print()
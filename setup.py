@@ -10,9 +10,13 @@ setup(
     url="https://github.com/graze/tropopause",
     license="The MIT License",
     packages=['tropopause'],
+    entry_points={
+        'console_scripts': ['tropopause = tropopause.cli:main']
+    },
     test_suite="tests",
     install_requires=[
-        "troposphere[policy]>=1.9.5, <2.0"
+        "troposphere[policy]>=1.9.5, <2.0",
+        "PyYAML>=3.12"
     ],
     python_requires='>=3.4',
     use_2to3=False
@@ -1,6 +1,13 @@
+import gc
+import pickle
+import tracemalloc
 import unittest
-from tropopause import Tags
+from tropopause import Frozen, TagPair, TagSet, Tags, Template
+from tropopause import resources_of_type
+from troposphere import Join, Ref
 from troposphere import Tags as upstreamTags
+from troposphere import Template as upstreamTemplate
+from troposphere.ec2 import VPC, Subnet
 
 
 class TestTags(unittest.TestCase):
@@ -24,3 +31,215 @@ class TestTags(unittest.TestCase):
         self.assertEqual(2, len(test_tags.tags))
         self.assertIn({'Key': 'a', 'Value': 'bar'}, test_tags.tags)
         self.assertIn({'Key': 'b', 'Value': 'baz'}, test_tags.tags)
+
+    def test_tag_concatanation_preserves_order(self):
+        t1 = Tags(b='foo', c='foo')
+        t2 = Tags(a='bar', b='bar')
+        test_tags = t1 + t2
+        self.assertEqual(
+            [
+                {'Key': 'b', 'Value': 'bar'},
+                {'Key': 'c', 'Value': 'foo'},
+                {'Key': 'a', 'Value': 'bar'}
+            ],
+            test_tags.tags
+        )
+
+    def test_tag_concatanation_with_upstream_tags(self):
+        test_tags = Tags(a='foo', b='foo') + upstreamTags(a='bar')
+        self.assertIsInstance(test_tags, upstreamTags)
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'bar'}, {'Key': 'b', 'Value': 'foo'}],
+            test_tags.tags
+        )
+        test_tags = upstreamTags(a='foo', b='foo') + Tags(a='bar')
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'bar'}, {'Key': 'b', 'Value': 'foo'}],
+            test_tags.tags
+        )
+
+    def test_tag_concatanation_leaves_left_operand(self):
+        t1 = Tags(a='foo')
+        t1 + Tags(a='bar', b='baz')
+        self.assertEqual([{'Key': 'a', 'Value': 'foo'}], t1.tags)
+
+    def test_tag_to_dict(self):
+        test_tags = Tags(a='foo') + Tags(b='bar')
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'foo'}, {'Key': 'b', 'Value': 'bar'}],
+            test_tags.to_dict()
+        )
+
+    def test_tag_list_changes_are_written_back(self):
+        test_tags = Tags(a='b')
+        test_tags.tags.append({'Key': 'c', 'Value': 'd'})
+        tags = test_tags.tags
+        tags.extend([{'Key': 'e', 'Value': 'f'}])
+        tags[0] = {'Key': 'a', 'Value': 'x'}
+        tags.pop(1)
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'x'}, {'Key': 'e', 'Value': 'f'}],
+            test_tags.to_dict()
+        )
+        test_tags.tags += [{'Key': 'a', 'Value': 'y'}]
+        del test_tags.tags[1]
+        self.assertEqual([{'Key': 'a', 'Value': 'y'}], test_tags.tags)
+        test_tags.tags.clear()
+        self.assertEqual([], test_tags.to_dict())
+
+    def test_tag_list_items_are_read_only(self):
+        test_tags = Tags(a='b')
+        with self.assertRaises(TypeError):
+            test_tags.tags[0]['Value'] = 'c'
+        with self.assertRaises(TypeError):
+            test_tags.tags[0].update(Value='c')
+        self.assertEqual([{'Key': 'a', 'Value': 'b'}], test_tags.tags)
+        copied = pickle.loads(pickle.dumps(test_tags.tags))
+        copied[0]['Value'] = 'c'
+        copied.append({'Key': 'd', 'Value': 'e'})
+        self.assertEqual([{'Key': 'a', 'Value': 'b'}], test_tags.tags)
+
+    def test_tag_rejects_positional_non_dict(self):
+        with self.assertRaises(TypeError):
+            Tags('a')
+
+    def test_tag_pairs_are_interned_and_immutable(self):
+        self.assertIs(TagPair('a', 'b'), TagPair('a', 'b'))
+        self.assertIsNot(TagPair('a', 'b'), TagPair('a', 'c'))
+        unhashable = TagPair('a', {'Ref': 'b'})
+        self.assertEqual({'Ref': 'b'}, unhashable.value)
+        with self.assertRaises(AttributeError):
+            TagPair('a', 'b').value = 'c'
+        with self.assertRaises(AttributeError):
+            TagPair('a', 'b').other = 'c'
+        self.assertIs(TagPair('a', 'b'), pickle.loads(
+            pickle.dumps(TagPair('a', 'b'))
+        ))
+
+    def test_tag_pairs_are_interned_by_type(self):
+        one = TagPair('a', 1)
+        self.assertIs(True, TagPair('a', True).value)
+        self.assertIs(float, type(TagPair('a', 1.0).value))
+        self.assertIs(one, TagPair('a', 1))
+        self.assertEqual(
+            [{'Key': 'a', 'Value': True}], Tags(a=True).tags
+        )
+
+    def test_tag_sets_are_interned_and_shared(self):
+        vpc = Tags(a='vpc', b='vpc')
+        first = vpc + Tags(b='subnet', c='subnet')
+        second = vpc + Tags(b='subnet', c='subnet')
+        self.assertIsNot(first, second)
+        self.assertIs(first.tagset, second.tagset)
+        self.assertEqual(
+            [('a', 'vpc'), ('b', 'subnet'), ('c', 'subnet')],
+            first.tagset.items()
+        )
+        self.assertIs(vpc.tagset, (Tags() + vpc).tagset)
+        self.assertIs(vpc.tagset, Tags(vpc.tagset).tagset)
+        self.assertIs(vpc.tagset, pickle.loads(pickle.dumps(vpc.tagset)))
+        with self.assertRaises(AttributeError):
+            vpc.tagset.pairs = ()
+
+    def test_merges_returning_an_operand_are_not_kept(self):
+        gc.collect()
+        before = len(TagSet._merged)
+        for i in range(1000):
+            left = TagSet.from_items([('k%d' % i, 'a'), ('l%d' % i, 'a')])
+            self.assertIs(left, left + TagSet.from_items([('k%d' % i, 'a')]))
+            right = TagSet.from_items([('k%d' % i, 'b'), ('l%d' % i, 'b')])
+            self.assertIs(right, left + right)
+        del left, right
+        gc.collect()
+        self.assertEqual(before, len(TagSet._merged))
+
+    def test_tag_set_from_items_keeps_last_value(self):
+        self.assertEqual(
+            [('b', 3), ('a', 2)],
+            TagSet.from_items([('b', 1), ('a', 2), ('b', 3)]).items()
+        )
+
+    def test_tag_memory_is_shared_between_resources(self):
+        vpc = Tags({'tag%d' % i: 'value%d' % i for i in range(30)})
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            kept = [vpc + Tags(Tier='private') for _ in range(1000)]
+            used = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(1000, len(kept))
+        # one Tags object per resource, the 31 tags are stored once
+        self.assertLess(used, 1000 * 300)
+
+
+class TestFrozen(unittest.TestCase):
+    def test_frozen_values_are_read_only(self):
+        frozen = Frozen(Join('', ['a', Ref('b')]))
+        self.assertEqual(
+            {'Fn::Join': ['', ['a', {'Ref': 'b'}]]}, frozen.to_dict()
+        )
+        frozen.data['Fn::Join'][1].append('c')
+        self.assertEqual(['a', {'Ref': 'b'}], frozen.data['Fn::Join'][1])
+        with self.assertRaises(AttributeError):
+            frozen.json = '{}'
+        template = upstreamTemplate()
+        Subnet(
+            'subnet', template, CidrBlock=frozen, VpcId='vpc-12345678'
+        )
+        self.assertEqual(
+            frozen.to_dict(),
+            template.to_dict()['Resources']['subnet']['Properties'][
+                'CidrBlock'
+            ]
+        )
+
+
+class TestTemplate(unittest.TestCase):
+    def test_template_is_correct_class(self):
+        self.assertIsInstance(
+            Template(),
+            upstreamTemplate
+        )
+
+    def test_template_indexes_resources_by_type(self):
+        template = Template()
+        vpc = VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        subnet = Subnet('subnet', template, CidrBlock='10.0.0.0/24')
+        template.add_resource([
+            VPC('second', CidrBlock='10.1.0.0/16')
+        ])
+        self.assertEqual(
+            ['vpc', 'second'],
+            list(template.index['AWS::EC2::VPC'])
+        )
+        self.assertIs(vpc, template.index['AWS::EC2::VPC']['vpc'])
+        self.assertIs(subnet, template.index['AWS::EC2::Subnet']['subnet'])
+
+    def test_template_resource_limit(self):
+        template = Template()
+        for i in range(200):
+            VPC('vpc%d' % i, template, CidrBlock='10.0.0.0/16')
+        with self.assertRaises(ValueError):
+            VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        template = Template(max_resources=None)
+        for i in range(250):
+            VPC('vpc%d' % i, template, CidrBlock='10.0.0.0/16')
+        self.assertEqual(250, len(template.index['AWS::EC2::VPC']))
+        template = Template(max_resources=1)
+        VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        with self.assertRaises(ValueError):
+            VPC('second', template, CidrBlock='10.0.0.0/16')
+
+    def test_resources_of_type_scans_upstream_template(self):
+        template = upstreamTemplate()
+        vpc = VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        Subnet('subnet', template, CidrBlock='10.0.0.0/24')
+        self.assertEqual(
+            {'vpc': vpc},
+            dict(resources_of_type(template, 'AWS::EC2::VPC'))
+        )
+        self.assertEqual(
+            {},
+            dict(resources_of_type(template, 'AWS::EC2::RouteTable'))
+        )
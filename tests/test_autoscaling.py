@@ -1,10 +1,14 @@
+import copy
+import json
+import pickle
 import unittest
 
 from tropopause import Tags as BaseTags
-from tropopause.ec2 import InternetGatewayVPC, PublicSubnet
+from tropopause.ec2 import InternetGatewayVPC, PublicSubnet, SecureSubnet
 from tropopause.autoscaling import AutoScalingGroup, LaunchConfigurationRPM
 from troposphere import Ref, Template
 from troposphere.autoscaling import LaunchConfiguration, Tag
+from troposphere.autoscaling import Tags as AutoScalingTags
 
 
 class TestAutoscaling(unittest.TestCase):
@@ -37,6 +41,43 @@ class TestAutoscaling(unittest.TestCase):
         )
         self.assertIsInstance(lc.props['UserData'], tuple)
 
+    def test_user_data_is_shared_between_stacks(self):
+        first = LaunchConfigurationRPM(
+            'launchconfig',
+            self._create_test_document(),
+            ImageId='ami-123456',
+            InstanceType='t2.micro'
+        )
+        second = LaunchConfigurationRPM(
+            'launchconfig',
+            self._create_test_document(),
+            ImageId='ami-123456',
+            InstanceType='t2.micro'
+        )
+        other = LaunchConfigurationRPM(
+            'other',
+            self._create_test_document(),
+            ImageId='ami-123456',
+            InstanceType='t2.micro'
+        )
+        self.assertIs(
+            first.properties['UserData'], second.properties['UserData']
+        )
+        self.assertIsNot(
+            first.properties['UserData'], other.properties['UserData']
+        )
+        self.assertIn(
+            'other',
+            other.properties['UserData'].data['Fn::Base64']['Fn::Join'][1]
+        )
+        user_data = first.properties['UserData']
+        user_data.data['Fn::Base64']['Fn::Join'][1].append('changed')
+        self.assertNotIn(
+            'changed', user_data.to_dict()['Fn::Base64']['Fn::Join'][1]
+        )
+        with self.assertRaises(AttributeError):
+            user_data.json = '{}'
+
     def test_tag_inheritance_decorator_vpc(self):
         template = self._create_test_document()
         lc = LaunchConfigurationRPM(
@@ -60,6 +101,136 @@ class TestAutoscaling(unittest.TestCase):
              Tag
         )
 
+    def _asg_tags(self, template, subnets, **kwargs):
+        asg = AutoScalingGroup(
+            'asg',
+            template,
+            MinSize=0,
+            MaxSize=1,
+            LaunchConfigurationName='launchconfig',
+            VPCZoneIdentifier=[Ref(subnet) for subnet in subnets],
+            **kwargs
+        )
+        return [tag.data for tag in asg.properties['Tags']]
+
+    def test_tag_inheritance_keeps_tags_after_duplicate(self):
+        template = self._create_test_document()
+        SecureSubnet(
+            'second',
+            template,
+            CidrBlock='10.0.1.0/24',
+            VpcId=Ref('igw'),
+            Tags=BaseTags(f='other', g='ggg')
+        )
+        tags = self._asg_tags(template, ['subnet', 'second'])
+        self.assertEqual(
+            [
+                {'Key': 'a', 'Value': 'b', 'PropagateAtLaunch': True},
+                {'Key': 'f', 'Value': 'fpp', 'PropagateAtLaunch': True},
+                {'Key': 'g', 'Value': 'ggg', 'PropagateAtLaunch': True}
+            ],
+            tags
+        )
+
+    def test_tag_inheritance_explicit_tags_take_precedence(self):
+        template = self._create_test_document()
+        tags = self._asg_tags(
+            template, ['subnet'], Tags=BaseTags(f='asg', h='asg')
+        )
+        self.assertEqual(3, len(tags))
+        self.assertIn(
+            {'Key': 'f', 'Value': 'asg', 'PropagateAtLaunch': True}, tags
+        )
+        self.assertIn(
+            {'Key': 'h', 'Value': 'asg', 'PropagateAtLaunch': True}, tags
+        )
+
+    def test_tag_inheritance_autoscaling_tags_keep_propagation(self):
+        template = self._create_test_document()
+        tags = self._asg_tags(
+            template, ['subnet'], Tags=AutoScalingTags(f=('asg', False))
+        )
+        self.assertIn(
+            {'Key': 'f', 'Value': 'asg', 'PropagateAtLaunch': 'false'}, tags
+        )
+        self.assertIn(
+            {'Key': 'a', 'Value': 'b', 'PropagateAtLaunch': True}, tags
+        )
+
+    def test_tag_inheritance_at_scale(self):
+        template = self._create_test_document()
+        subnets = []
+        for i in range(100):
+            subnets.append('scale%d' % i)
+            SecureSubnet(
+                'scale%d' % i,
+                template,
+                CidrBlock='10.0.%d.0/24' % i,
+                VpcId=Ref('igw'),
+                Tags=BaseTags(
+                    {'tag%d' % j: str(i) for j in range(i % 10, 50)}
+                )
+            )
+        tags = self._asg_tags(template, subnets)
+        self.assertEqual(51, len(tags))
+        values = {tag['Key']: tag['Value'] for tag in tags}
+        self.assertEqual('0', values['tag0'])
+        self.assertEqual('0', values['tag49'])
+
+    def test_inherited_tags_are_shared_and_serialized(self):
+        template = self._create_test_document()
+        tags = AutoScalingGroup(
+            'asg',
+            template,
+            MinSize=0,
+            MaxSize=1,
+            LaunchConfigurationName='launchconfig',
+            VPCZoneIdentifier=[Ref('subnet')],
+            Tags=AutoScalingTags(f=('asg', False))
+        ).properties['Tags']
+        self.assertIs(
+            template.resources['subnet'].properties['Tags'].tagset.pairs[0],
+            tags.tagset.pairs[0]
+        )
+        self.assertEqual(2, len(tags))
+        self.assertIsInstance(tags[0], Tag)
+        self.assertEqual(
+            [
+                {'Key': 'a', 'Value': 'b', 'PropagateAtLaunch': True},
+                {'Key': 'f', 'Value': 'asg', 'PropagateAtLaunch': 'false'},
+            ],
+            json.loads(template.to_json())['Resources']['asg']['Properties'][
+                'Tags'
+            ]
+        )
+
+    def test_propagated_tags_are_read_only(self):
+        template = self._create_test_document()
+        tags = AutoScalingGroup(
+            'asg',
+            template,
+            MinSize=0,
+            MaxSize=1,
+            LaunchConfigurationName='launchconfig',
+            VPCZoneIdentifier=[Ref('subnet')],
+            Tags=AutoScalingTags(f=('asg', False))
+        ).properties['Tags']
+        with self.assertRaises(AttributeError):
+            tags.append(Tag('g', 'h', True))
+        with self.assertRaises(TypeError):
+            tags += [Tag('g', 'h', True)]
+        self.assertEqual(tags, copy.copy(tags))
+        self.assertEqual(tags, pickle.loads(pickle.dumps(tags)))
+        self.assertIn("TagPair('f', 'asg')", repr(tags))
+        self.assertEqual(
+            [('a', 'b', True), ('f', 'asg', 'false')],
+            [
+                (tag.data['Key'], tag.data['Value'],
+                 tag.data['PropagateAtLaunch'])
+                for tag in tags
+            ]
+        )
+
     def test_launch_configuration_rpm(self):
         template = self._create_test_document()
         lc = LaunchConfigurationRPM(
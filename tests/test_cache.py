@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from troposphere import Template
+from tropopause.cache import BuildCache
+from tropopause.ec2 import SecurityGroupFromYaml
+from tropopause.loader import documents
+
+
+class TestCache(unittest.TestCase):
+    """ Unit Tests for tropopause.cache """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = BuildCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _create_security_group(self, path='tests/data/security-group.yaml'):
+        return SecurityGroupFromYaml(
+            'sg', Template(), GroupDescription='test',
+            SecurityGroupIngress=path
+        )
+
+    def test_get_and_set(self):
+        key = self.cache.key('a', 1)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, {'a': [1]})
+        self.assertEqual({'a': [1]}, self.cache.get(key))
+        self.assertEqual((1, 1, 1024, 1), self.cache.cache_info())
+        self.assertNotEqual(key, self.cache.key('a', 2))
+        self.cache.cache_clear()
+        self.assertEqual((0, 0, 1024, 0), self.cache.cache_info())
+        self.assertIsNone(self.cache.get(key))
+
+    def test_key_includes_file_contents(self):
+        path = os.path.join(self.directory, 'a.yaml')
+        with open(path, 'w') as stream:
+            stream.write('a: b\n')
+        key = self.cache.key('a', paths=[path])
+        self.assertEqual(key, self.cache.key('a', paths=[path]))
+        with open(path, 'w') as stream:
+            stream.write('a: c\n')
+        self.assertNotEqual(key, self.cache.key('a', paths=[path]))
+
+    def test_least_recently_used_evicted(self):
+        cache = BuildCache(self.cache.directory, maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(
+            ['a.json', 'c.json'], sorted(os.listdir(cache.directory))
+        )
+        reopened = BuildCache(cache.directory, maxsize=2)
+        self.assertEqual(2, reopened.cache_info().currsize)
+
+    def test_size_limit(self):
+        cache = BuildCache(self.cache.directory, max_bytes=20)
+        cache.set('a', 'a' * 10)
+        cache.set('b', 'b' * 10)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual('b' * 10, cache.get('b'))
+
+    def test_security_group_rules_cached(self):
+        expected = self._create_security_group().to_dict()
+        with self.cache:
+            first = self._create_security_group()
+            with documents.recording() as paths:
+                second = self._create_security_group()
+        self.assertIsNone(BuildCache.active)
+        self.assertEqual(expected, first.to_dict())
+        self.assertEqual(expected, second.to_dict())
+        self.assertEqual(first.rule_counts, second.rule_counts)
+        self.assertEqual((1, 1, 1024, 1), self.cache.cache_info())
+        self.assertEqual(
+            {os.path.abspath('tests/data/security-group.yaml')}, paths
+        )
+
+    def test_changed_document_misses(self):
+        path = os.path.join(self.directory, 'rules.yaml')
+        shutil.copy('tests/data/security-group.yaml', path)
+        with self.cache:
+            self._create_security_group(path)
+            with open(path, 'a') as stream:
+                stream.write(
+                    'extra:\n  cidr:\n  - 192.168.0.0/24\n'
+                    '  protocols:\n    tcp:\n    - \'25\'\n'
+                )
+            sg = self._create_security_group(path)
+        self.assertEqual(2, self.cache.cache_info().misses)
+        self.assertIn(
+            '192.168.0.0/24',
+            [rule.CidrIp for rule in sg.SecurityGroupIngress]
+        )
+
+    def test_rules_version_change_misses(self):
+        with self.cache:
+            self._create_security_group()
+            with mock.patch('tropopause.ec2.RULES_VERSION', -1):
+                self._create_security_group()
+            self._create_security_group()
+        self.assertEqual((1, 2, 1024, 2), self.cache.cache_info())
+
+
+if __name__ == '__main__':
+    unittest.main()
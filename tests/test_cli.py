@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+from tropopause.cli import build_all, expand_matrix, main, stack_name
+
+DEFINITION = textwrap.dedent('''
+    from troposphere import Template
+    from tropopause.ec2 import SecurityGroupFromYaml
+
+
+    def build(environment, region='us-east-1'):
+        template = Template()
+        template.add_description(environment + ' ' + region)
+        SecurityGroupFromYaml(
+            'sg',
+            template,
+            GroupDescription=environment,
+            SecurityGroupIngress=%r
+        )
+        return template
+''')
+
+
+class TestCli(unittest.TestCase):
+    """ Unit Tests for tropopause.cli """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rules = os.path.join(self.directory, 'rules.yaml')
+        shutil.copy('tests/data/security-group.yaml', self.rules)
+        self.definition = os.path.join(self.directory, 'network.py')
+        with open(self.definition, 'w') as stream:
+            stream.write(DEFINITION % self.rules)
+        self.output = os.path.join(self.directory, 'out')
+        self.matrix = {'environment': ['dev', 'prod'], 'region': 'eu-west-1'}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_expand_matrix(self):
+        self.assertEqual(
+            [
+                {'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'},
+                {'a': 2, 'b': 'x'}, {'a': 2, 'b': 'y'}
+            ],
+            [dict(p) for p in expand_matrix({'a': [1, 2], 'b': ['x', 'y']})]
+        )
+        self.assertEqual([{}], [dict(p) for p in expand_matrix({})])
+
+    def test_stack_name(self):
+        self.assertEqual(
+            'network-dev-eu',
+            stack_name('stacks/network.py', {'a': 'dev', 'b': 'eu'})
+        )
+        self.assertEqual('network', stack_name('stacks.network', {}))
+        self.assertEqual(
+            'network-10.0.0.0_16', stack_name('network', {'a': '10.0.0.0/16'})
+        )
+
+    def test_build_all_writes_every_stack(self):
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=2
+        )
+        self.assertEqual(
+            ['network-dev-eu-west-1', 'network-prod-eu-west-1'], built
+        )
+        self.assertEqual([], skipped)
+        with open(os.path.join(
+            self.output, 'network-prod-eu-west-1.json'
+        )) as stream:
+            document = json.load(stream)
+        self.assertEqual('prod eu-west-1', document['Description'])
+        with open(os.path.join(self.output, 'manifest.json')) as stream:
+            manifest = json.load(stream)
+        self.assertEqual(
+            [os.path.abspath(self.rules)],
+            manifest['network-dev-eu-west-1']['files']
+        )
+
+    def test_build_all_with_cache(self):
+        cache = os.path.join(self.directory, 'cache')
+        build_all(self.definition, self.matrix, self.output, cache=cache)
+        self.assertEqual(1, len(os.listdir(cache)))
+        with open(os.path.join(self.output, 'manifest.json')) as stream:
+            manifest = json.load(stream)
+        built, _ = build_all(
+            self.definition, self.matrix, self.output, force=True,
+            cache=cache
+        )
+        self.assertEqual(2, len(built))
+        with open(os.path.join(self.output, 'manifest.json')) as stream:
+            self.assertEqual(manifest, json.load(stream))
+
+    def test_unchanged_stacks_are_skipped(self):
+        build_all(self.definition, self.matrix, self.output, jobs=1)
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=1
+        )
+        self.assertEqual([], built)
+        self.assertEqual(2, len(skipped))
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=1, force=True
+        )
+        self.assertEqual(2, len(built))
+
+    def test_changed_yaml_rebuilds(self):
+        build_all(self.definition, self.matrix, self.output, jobs=1)
+        with open(self.rules, 'a') as stream:
+            stream.write("    - '22'\n")
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=1
+        )
+        self.assertEqual(2, len(built))
+
+    def test_changed_parameters_and_missing_output_rebuild(self):
+        build_all(self.definition, self.matrix, self.output, jobs=1)
+        os.remove(os.path.join(self.output, 'network-dev-eu-west-1.json'))
+        self.matrix['environment'].append('test')
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=1
+        )
+        self.assertEqual(
+            ['network-dev-eu-west-1', 'network-test-eu-west-1'], built
+        )
+        self.assertEqual(['network-prod-eu-west-1'], skipped)
+
+    def test_import_time_documents_are_in_every_manifest_entry(self):
+        settings = os.path.join(self.directory, 'settings.yaml')
+        with open(settings, 'w') as stream:
+            stream.write('description: imported\n')
+        with open(self.definition, 'a') as stream:
+            stream.write(textwrap.dedent('''
+
+                from tropopause.loader import load_yaml
+                SETTINGS = load_yaml(%r)
+            ''' % settings))
+        build_all(self.definition, self.matrix, self.output, jobs=1)
+        with open(os.path.join(self.output, 'manifest.json')) as stream:
+            manifest = json.load(stream)
+        for entry in manifest.values():
+            self.assertIn(os.path.abspath(settings), entry['files'])
+        with open(settings, 'a') as stream:
+            stream.write('changed: true\n')
+        built, skipped = build_all(
+            self.definition, self.matrix, self.output, jobs=1
+        )
+        self.assertEqual(2, len(built))
+
+    def test_colliding_stack_names_are_rejected(self):
+        with self.assertRaises(ValueError):
+            build_all(
+                self.definition, {'environment': ['a/b', 'a_b']},
+                self.output, jobs=1
+            )
+        self.assertEqual(1, main([
+            self.definition, '-p', 'environment=a b,a_b', '-o', self.output
+        ]))
+
+    def test_validate_fails_dangling_references(self):
+        with open(self.definition, 'a') as stream:
+            stream.write(textwrap.dedent('''
+
+                def build():
+                    from troposphere import Ref
+                    from troposphere.ec2 import Subnet
+                    template = Template()
+                    Subnet('subnet', template, CidrBlock='10.0.0.0/24',
+                           VpcId=Ref('vpc'))
+                    return template
+            '''))
+        built, _ = build_all(self.definition, {}, self.output, jobs=1)
+        self.assertEqual(['network'], built)
+        logged = []
+        with self.assertRaises(RuntimeError):
+            build_all(
+                self.definition, {}, self.output, jobs=1, force=True,
+                log=logged.append, validate=True
+            )
+        self.assertEqual(
+            ['failed network: subnet: Ref vpc does not exist'], logged
+        )
+
+    def test_main_yaml_output_and_failures(self):
+        self.assertEqual(0, main([
+            self.definition, '-p', 'environment=dev', '-o', self.output,
+            '-f', 'yaml', '-j', '1'
+        ]))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output, 'network-dev.yaml')
+        ))
+        self.assertEqual(1, main([
+            self.definition, '-p', 'unknown=x', '-o', self.output, '-j', '1'
+        ]))
@@ -1,9 +1,18 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import hashlib
 import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
 import unittest
 from troposphere import Template
 from troposphere.autoscaling import LaunchConfiguration, Metadata
 from troposphere.cloudformation import Init
-from tropopause.cloudformation import InitConfigFromHTTP
+from tropopause.cloudformation import InitConfigFromHTTP, InitConfigFromS3
+from tropopause.cloudformation import FETCH_PATH, FETCH_SCRIPT
+from tropopause.cloudformation import cfn_hup_files
 
 
 class TestEc2(unittest.TestCase):
@@ -48,9 +57,164 @@ class TestEc2(unittest.TestCase):
         init = md['AWS::CloudFormation::Init']
         self.assertIn('files', init['config'])
 
+    def test_init_config_fragments_are_shared(self):
+        http = InitConfigFromHTTP(url='http://www.example.com')
+        s3 = InitConfigFromS3(url='s3://example/example.sh')
+        self.assertIs(http.properties['files'], s3.properties['files'])
+        self.assertIs(
+            http.properties['services']['sysvinit'],
+            s3.properties['services']['sysvinit']
+        )
+
+    def test_init_config_commands_without_cache(self):
+        http = InitConfigFromHTTP(url='http://www.example.com/boot.sh')
+        s3 = InitConfigFromS3(url='s3://example/boot.sh', cache=False)
+        self.assertEqual(
+            '/usr/bin/curl -s http://www.example.com/boot.sh | /bin/sh',
+            http.properties['commands']['01_bootstrap_from_http']['command']
+        )
+        self.assertEqual(
+            '/usr/bin/aws s3 cp s3://example/boot.sh - | /bin/sh',
+            s3.properties['commands']['01_bootstrap_from_s3']['command']
+        )
+        self.assertIs(cfn_hup_files(), s3.properties['files'])
+
+    def test_init_config_cached_fetch(self):
+        sha256 = '0' * 64
+        http = InitConfigFromHTTP(
+            url='https://www.example.com/boot.sh', sha256=sha256, splay=30
+        )
+        s3 = InitConfigFromS3(
+            url='s3://example/boot.sh', cache='/opt/boot.sh', retries=3
+        )
+        command = http.properties['commands']['01_bootstrap_from_http'][
+            'command'
+        ]
+        self.assertTrue(command.startswith(
+            FETCH_PATH + ' http https://www.example.com/boot.sh '
+            '/var/cache/tropopause/'
+        ))
+        self.assertIn(' %s 5 30 && /bin/sh /var/cache/' % sha256, command)
+        self.assertEqual(
+            FETCH_PATH + " s3 s3://example/boot.sh /opt/boot.sh '' 3 0 "
+            "&& /bin/sh /opt/boot.sh",
+            s3.properties['commands']['01_bootstrap_from_s3']['command']
+        )
+        files = http.properties['files']
+        self.assertIs(files, s3.properties['files'])
+        self.assertEqual('000755', files.data[FETCH_PATH]['mode'])
+        self.assertNotIn(FETCH_PATH, cfn_hup_files().data)
+        for name in cfn_hup_files().data:
+            self.assertIn(name, files.data)
+
+    def test_init_config_cached_fetch_rejects_bad_options(self):
+        with self.assertRaises(ValueError):
+            InitConfigFromS3(url='s3://example/boot.sh', sha256='abc')
+        with self.assertRaises(ValueError):
+            InitConfigFromS3(url='s3://example/boot.sh', retries=-1)
+        with self.assertRaises(ValueError):
+            InitConfigFromS3(
+                url='s3://example/boot.sh', cache=False, sha256='0' * 64
+            )
+
     def test_init_config_from_http_has_service(self):
         document = self._create_test_document()
         lc = document['Resources']['launchconfig']
         md = lc['Metadata']
         init = md['AWS::CloudFormation::Init']
         self.assertIn('services', init['config'])
+
+
+class _Origin(BaseHTTPRequestHandler):
+    """ Serves body with an ETag, or status when it is not 200 """
+    body = b''
+    status = 200
+    requests = []
+
+    def do_GET(self):
+        etag = '"%s"' % hashlib.sha256(self.body).hexdigest()[:8]
+        type(self).requests.append(self.headers.get('If-None-Match'))
+        if self.status != 200:
+            self.send_response(self.status)
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipUnless(
+    shutil.which('curl') and shutil.which('sha256sum'),
+    'tropopause-fetch needs curl and sha256sum'
+)
+class TestFetchScript(unittest.TestCase):
+    """ Runs tropopause-fetch against a local origin """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.script = os.path.join(self.directory, 'tropopause-fetch')
+        with open(self.script, 'w') as stream:
+            stream.write(FETCH_SCRIPT)
+        self.cache = os.path.join(self.directory, 'cache', 'boot.sh')
+        _Origin.body, _Origin.status, _Origin.requests = b'echo v1\n', 200, []
+        self.server = HTTPServer(('127.0.0.1', 0), _Origin)
+        self.url = 'http://127.0.0.1:%d/boot.sh' % self.server.server_port
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def _fetch(self, sha256='', retries=0):
+        return subprocess.run(
+            ['sh', self.script, 'http', self.url, self.cache, sha256,
+             str(retries)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60
+        )
+
+    def _cached(self):
+        with open(self.cache, 'rb') as stream:
+            return stream.read()
+
+    def test_unchanged_script_is_revalidated(self):
+        self.assertEqual(0, self._fetch().returncode)
+        self.assertEqual(b'echo v1\n', self._cached())
+        self.assertEqual(0, self._fetch().returncode)
+        self.assertIsNone(_Origin.requests[0])
+        self.assertIsNotNone(_Origin.requests[1])
+        self.assertEqual(b'echo v1\n', self._cached())
+        _Origin.body = b'echo v2\n'
+        self.assertEqual(0, self._fetch().returncode)
+        self.assertEqual(b'echo v2\n', self._cached())
+
+    def test_pinned_copy_skips_the_origin(self):
+        sha256 = hashlib.sha256(b'echo v1\n').hexdigest()
+        self.assertEqual(0, self._fetch(sha256).returncode)
+        self.assertEqual(0, self._fetch(sha256).returncode)
+        self.assertEqual(1, len(_Origin.requests))
+
+    def test_pin_mismatch_is_not_cached(self):
+        result = self._fetch('0' * 64)
+        self.assertEqual(1, result.returncode)
+        self.assertIn(b'does not match', result.stderr)
+        self.assertFalse(os.path.exists(self.cache))
+
+    def test_failed_fetch_falls_back_to_the_cached_copy(self):
+        self.assertEqual(0, self._fetch().returncode)
+        _Origin.status = 500
+        result = self._fetch(retries=1)
+        self.assertEqual(0, result.returncode)
+        self.assertIn(b'using the cached copy', result.stderr)
+        self.assertEqual(3, len(_Origin.requests))
+        os.remove(self.cache)
+        self.assertEqual(1, self._fetch().returncode)
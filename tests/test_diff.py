@@ -0,0 +1,82 @@
+import io
+import json
+import unittest
+from troposphere import Ref
+from tropopause import Tags, Template
+from tropopause.diff import diff, fingerprints, main, save_fingerprints
+from tropopause.ec2 import InternetGatewayVPC, PublicSubnet
+from tropopause.ec2 import RoutedVPCPeeringConnection
+
+
+class TestDiff(unittest.TestCase):
+    """ Unit Tests for tropopause.diff """
+
+    def _create_test_document(self, environment='dev', peers=('10.1',)):
+        template = Template()
+        vpc = InternetGatewayVPC(
+            'vpc', template, CidrBlock='10.0.0.0/16',
+            Tags=Tags(Environment=environment)
+        )
+        PublicSubnet(
+            'publicuseast1a', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.0.0/24', VpcId=Ref(vpc)
+        )
+        for i, peer in enumerate(peers):
+            RoutedVPCPeeringConnection(
+                'peer%d' % i, template, PeerCidrBlock=peer + '.0.0/16',
+                PeerVpcId='vpc-12345678', VpcId=Ref(vpc)
+            )
+        return template
+
+    def test_identical_builds(self):
+        self.assertEqual(
+            ([], [], []),
+            diff(self._create_test_document(), self._create_test_document())
+        )
+
+    def test_changed_tags(self):
+        result = diff(
+            self._create_test_document(),
+            self._create_test_document(environment='prod')
+        )
+        self.assertEqual([], result.added)
+        self.assertEqual([], result.removed)
+        self.assertEqual(
+            ['internetgateway', 'publicuseast1a', 'publicuseast1aroutetable',
+             'vpc'],
+            result.changed
+        )
+
+    def test_added_and_removed(self):
+        old = self._create_test_document(peers=('10.1',))
+        new = self._create_test_document(peers=('10.2', '10.3'))
+        result = diff(old, new)
+        self.assertIn('peer1', result.added)
+        self.assertIn('peer1securitygroup', result.added)
+        self.assertEqual([], result.removed)
+        self.assertEqual(
+            ['peer0icmpingress', 'peer0sshingress',
+             'publicuseast1aroutetabletopeer0route'],
+            result.changed
+        )
+        self.assertEqual(result.added, diff(new, old).removed)
+
+    def test_rendered_template_and_fingerprint_file(self):
+        template = self._create_test_document()
+        rendered = json.loads(template.to_json())
+        self.assertEqual(fingerprints(template), fingerprints(rendered))
+        stream = io.StringIO()
+        save_fingerprints(template, stream)
+        saved = json.loads(stream.getvalue())
+        self.assertEqual(([], [], []), diff(saved, rendered))
+        self.assertEqual(
+            ['vpc'],
+            diff(saved, self._create_test_document('prod')).changed[-1:]
+        )
+
+    def test_main(self):
+        self.assertEqual(2, main([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
 import unittest
-from tropopause import Tags
-from tropopause.ec2 import InternetGatewayVPC
+from unittest import mock
+import warnings
+from tropopause import Tags, Template as IndexedTemplate
+from tropopause import ec2
+from tropopause.ec2 import GatewayVPCEndpoint, InternetGatewayVPC
 from tropopause.ec2 import PublicSubnet, PrivateSubnet, SecureSubnet
-from tropopause.ec2 import SecurityGroupFromYaml
-from troposphere import Ref, Template
+from tropopause.ec2 import SecurityGroupFromYaml, compile_rules, find_vpc
+from tropopause.ec2 import Tier, build_subnet_tiers, route_tables
+from tropopause.ec2 import RoutedVPCPeeringConnection
+from tropopause.ec2 import build_vpc_peering, check_cidr_overlaps
+from troposphere import ImportValue, Ref, Template
+from troposphere import Tags as upstreamTags
 from troposphere.ec2 import EIP, InternetGateway, NatGateway, Route, RouteTable
 from troposphere.ec2 import SecurityGroup, SecurityGroupRule
 from troposphere.ec2 import Subnet, SubnetRouteTableAssociation
@@ -333,8 +340,593 @@ class TestEc2(unittest.TestCase):
             subnet.properties['Tags'].tags
         )
 
+    def test_find_vpc_defaults_to_first_vpc(self):
+        template = IndexedTemplate()
+        first = VPC('first', template, CidrBlock='10.0.0.0/16')
+        VPC('second', template, CidrBlock='10.1.0.0/16')
+        self.assertIs(first, find_vpc(template))
+
+    def test_find_vpc_selects_vpc_by_ref(self):
+        template = IndexedTemplate()
+        VPC('first', template, CidrBlock='10.0.0.0/16')
+        second = VPC('second', template, CidrBlock='10.1.0.0/16')
+        self.assertIs(second, find_vpc(template, Ref(second)))
+
+    def test_subnet_inherits_tags_from_referenced_vpc(self):
+        template = IndexedTemplate()
+        VPC(
+            'first',
+            template,
+            CidrBlock='10.0.0.0/16',
+            Tags=Tags(Vpc='first')
+        )
+        second = VPC(
+            'second',
+            template,
+            CidrBlock='10.1.0.0/16',
+            Tags=Tags(Vpc='second')
+        )
+        subnet = SecureSubnet(
+            'subnet',
+            template,
+            CidrBlock='10.1.0.0/24',
+            VpcId=Ref(second)
+        )
+        self.assertIn(
+            {'Key': 'Vpc', 'Value': 'second'},
+            subnet.properties['Tags'].tags
+        )
+
+    def test_subnet_sees_tags_added_to_upstream_vpc_tags(self):
+        template = IndexedTemplate()
+        vpc = VPC(
+            'vpc', template, CidrBlock='10.0.0.0/16',
+            Tags=upstreamTags(a='b')
+        )
+        first = SecureSubnet(
+            'first', template, CidrBlock='10.0.0.0/24', VpcId=Ref(vpc)
+        )
+        vpc.properties['Tags'].tags.append({'Key': 'c', 'Value': 'd'})
+        second = SecureSubnet(
+            'second', template, CidrBlock='10.0.1.0/24', VpcId=Ref(vpc)
+        )
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'b'}], first.properties['Tags'].tags
+        )
+        self.assertEqual(
+            [{'Key': 'a', 'Value': 'b'}, {'Key': 'c', 'Value': 'd'}],
+            second.properties['Tags'].tags
+        )
+
+    def test_subnet_tags_from_vpc_without_tags(self):
+        template = IndexedTemplate()
+        vpc = VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        subnet = SecureSubnet(
+            'subnet', template, CidrBlock='10.0.0.0/24', VpcId=Ref(vpc),
+            Tags=Tags(a='b')
+        )
+        self.assertEqual([{'Key': 'a', 'Value': 'b'}], subnet.Tags.tags)
+
+    def test_subnet_tags_without_vpc(self):
+        subnet = SecureSubnet(
+            'subnet', IndexedTemplate(), CidrBlock='10.0.0.0/24',
+            VpcId='vpc-12345678'
+        )
+        self.assertEqual([], subnet.Tags.tags)
+
+    def test_subnet_outside_template_vpcs_gets_no_vpc_tags(self):
+        template = IndexedTemplate()
+        VPC('vpc', template, CidrBlock='10.0.0.0/16', Tags=Tags(a='b'))
+        subnet = SecureSubnet(
+            'subnet', template, CidrBlock='10.1.0.0/24',
+            VpcId='vpc-12345678'
+        )
+        self.assertEqual([], subnet.Tags.tags)
+        self.assertIsNone(find_vpc(template, 'vpc-12345678'))
+
+    def test_vpc_tags_are_merged_once_per_vpc(self):
+        template = IndexedTemplate()
+        first = VPC(
+            'first', template, CidrBlock='10.0.0.0/16',
+            Tags=upstreamTags(Vpc='first', Name='first')
+        )
+        second = InternetGatewayVPC(
+            'second', template, CidrBlock='10.1.0.0/16',
+            Tags=Tags(Vpc='second')
+        )
+        tier = Tags(Tier='secure')
+        subnets = [
+            SecureSubnet(
+                'subnet%d' % i, template, CidrBlock='10.%d.%d.0/24' % (
+                    i % 2, i
+                ),
+                VpcId=Ref(first if i % 2 == 0 else second), Tags=tier
+            )
+            for i in range(4)
+        ]
+        self.assertEqual(
+            [('Name', 'first'), ('Vpc', 'first'), ('Tier', 'secure')],
+            subnets[0].Tags.tagset.items()
+        )
+        self.assertEqual(
+            [('Vpc', 'second'), ('Tier', 'secure')],
+            subnets[1].Tags.tagset.items()
+        )
+        self.assertIs(subnets[0].Tags.tagset, subnets[2].Tags.tagset)
+        self.assertIs(subnets[1].Tags.tagset, subnets[3].Tags.tagset)
+        self.assertEqual([{'Key': 'Tier', 'Value': 'secure'}], tier.tags)
+        self.assertEqual(
+            [{'Key': 'Name', 'Value': 'first'},
+             {'Key': 'Vpc', 'Value': 'first'}],
+            first.Tags.tags
+        )
+
+    def _build_tiers(self, **kwargs):
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC(
+            'vpc',
+            template,
+            CidrBlock='10.0.0.0/16',
+            Tags=Tags(Test='test')
+        )
+        tiers = build_subnet_tiers(
+            template,
+            vpc,
+            '10.0.0.0/16',
+            ['us-east-1a', 'us-east-1b', 'us-east-1c'],
+            [
+                Tier('public', PublicSubnet),
+                Tier('private', PrivateSubnet, Tags(Tier='private')),
+                Tier('secure', SecureSubnet, Tags(Tier='secure'))
+            ],
+            **kwargs
+        )
+        return template, tiers
+
+    def test_build_subnet_tiers_creates_every_subnet(self):
+        template, tiers = self._build_tiers()
+        self.assertEqual(['public', 'private', 'secure'], list(tiers))
+        self.assertEqual(
+            ['privateuseast1a', 'privateuseast1b', 'privateuseast1c'],
+            [subnet.title for subnet in tiers['private']]
+        )
+        self.assertEqual(9, len(template.index['AWS::EC2::Subnet']))
+        self.assertEqual(3, len(template.index['AWS::EC2::NatGateway']))
+        self.assertEqual(6, len(template.index['AWS::EC2::RouteTable']))
+
+    def test_build_subnet_tiers_carves_cidrs(self):
+        template, tiers = self._build_tiers()
+        cidrs = [
+            subnet.properties['CidrBlock']
+            for subnets in tiers.values() for subnet in subnets
+        ]
+        self.assertEqual('10.0.0.0/20', cidrs[0])
+        self.assertEqual('10.0.128.0/20', cidrs[-1])
+        self.assertEqual(9, len(set(cidrs)))
+
+    def test_build_subnet_tiers_new_prefix(self):
+        template, tiers = self._build_tiers(new_prefix=24)
+        self.assertEqual(
+            '10.0.3.0/24',
+            tiers['private'][0].properties['CidrBlock']
+        )
+
+    def test_build_subnet_tiers_routes_private_through_public(self):
+        template, tiers = self._build_tiers()
+        route = template.resources['privateuseast1broute']
+        self.assertEqual(
+            'publicuseast1bnatgateway',
+            route.properties['NatGatewayId'].data['Ref']
+        )
+
+    def test_build_subnet_tiers_shares_tier_tags(self):
+        with mock.patch(
+            'tropopause.ec2.vpc_tags', wraps=ec2.vpc_tags
+        ) as merge:
+            template, tiers = self._build_tiers()
+        self.assertEqual(3, merge.call_count)
+        tags = tiers['secure'][0].properties['Tags']
+        self.assertIs(tags, tiers['secure'][2].properties['Tags'])
+        self.assertIs(
+            tags, template.resources['secureuseast1a'].properties['Tags']
+        )
+        self.assertEqual(
+            [{'Key': 'Test', 'Value': 'test'}],
+            tiers['public'][1].properties['Tags'].tags
+        )
+        self.assertIn({'Key': 'Test', 'Value': 'test'}, tags.tags)
+        self.assertIn({'Key': 'Tier', 'Value': 'secure'}, tags.tags)
+        self.assertEqual(
+            'false',
+            tiers['secure'][0].properties['MapPublicIpOnLaunch']
+        )
+        self.assertEqual(
+            'true',
+            tiers['public'][0].properties['MapPublicIpOnLaunch']
+        )
+
+    def test_build_subnet_tiers_rejects_small_cidr(self):
+        with self.assertRaises(ValueError):
+            self._build_tiers(new_prefix=19)
+
+    def test_build_subnet_tiers_private_needs_public(self):
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC('vpc', template, CidrBlock='10.0.0.0/16')
+        with self.assertRaises(ValueError):
+            build_subnet_tiers(
+                template, vpc, '10.0.0.0/16', ['us-east-1a'],
+                [Tier('private', PrivateSubnet)]
+            )
+
+    def _nat_routes(self, template, tier='private'):
+        return [
+            route.properties['NatGatewayId'].data['Ref']
+            for title, route in template.resources.items()
+            if title.startswith(tier) and title.endswith('route')
+        ]
+
+    def _build_two_private_tiers(self, **kwargs):
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC('vpc', template, CidrBlock='10.0.0.0/16')
+        build_subnet_tiers(
+            template, vpc, '10.0.0.0/16', ['us-east-1a', 'us-east-1b'],
+            [
+                Tier('public', PublicSubnet),
+                Tier('app', PrivateSubnet),
+                Tier('data', PrivateSubnet)
+            ],
+            **kwargs
+        )
+        return template
+
+    def test_build_subnet_tiers_shards_nat_gateways(self):
+        template = self._build_two_private_tiers(nat_gateways=2)
+        self.assertEqual(
+            [
+                'publicuseast1anatgateway', 'publicuseast1anatgateway1',
+                'publicuseast1bnatgateway', 'publicuseast1bnatgateway1'
+            ],
+            list(template.index['AWS::EC2::NatGateway'])
+        )
+        self.assertEqual(
+            'publicuseast1aeip1',
+            template.resources['publicuseast1anatgateway1'].properties[
+                'AllocationId'
+            ].data['Fn::GetAtt'][0]
+        )
+        self.assertEqual(
+            ['publicuseast1anatgateway', 'publicuseast1bnatgateway'],
+            self._nat_routes(template, 'app')
+        )
+        self.assertEqual(
+            ['publicuseast1anatgateway1', 'publicuseast1bnatgateway1'],
+            self._nat_routes(template, 'data')
+        )
+
+    def test_build_subnet_tiers_routes_every_nat_gateway(self):
+        for kwargs in (
+            {}, {'nat_gateways': 2}, {'nat': 'shared'},
+            {'nat': 'shared', 'nat_gateways': 4}
+        ):
+            template = self._build_two_private_tiers(**kwargs)
+            self.assertEqual(
+                set(template.index['AWS::EC2::NatGateway']),
+                set(self._nat_routes(template, 'app') +
+                    self._nat_routes(template, 'data'))
+            )
+        with self.assertRaises(ValueError):
+            self._build_two_private_tiers(nat_gateways=3)
+        with self.assertRaises(ValueError):
+            self._build_two_private_tiers(nat='shared', nat_gateways=5)
+        with self.assertRaises(ValueError):
+            self._build_tiers(nat_gateways=2)
+
+    def test_build_subnet_tiers_shared_nat_gateway(self):
+        template = self._build_two_private_tiers(nat='shared')
+        self.assertEqual(
+            ['publicuseast1anatgateway'],
+            list(template.index['AWS::EC2::NatGateway'])
+        )
+        self.assertEqual(
+            ['publicuseast1anatgateway'] * 4,
+            self._nat_routes(template, 'app') +
+            self._nat_routes(template, 'data')
+        )
+        template = self._build_two_private_tiers(nat='shared', nat_gateways=2)
+        self.assertEqual(
+            [
+                'publicuseast1anatgateway', 'publicuseast1anatgateway1',
+                'publicuseast1anatgateway', 'publicuseast1anatgateway1'
+            ],
+            self._nat_routes(template, 'app') +
+            self._nat_routes(template, 'data')
+        )
+
+    def test_build_subnet_tiers_without_nat_gateways(self):
+        template = self._build_two_private_tiers(nat='none')
+        self.assertNotIn('AWS::EC2::NatGateway', template.index)
+        self.assertNotIn('AWS::EC2::EIP', template.index)
+        self.assertEqual([], self._nat_routes(template, 'app'))
+        self.assertIn('appuseast1asubnetroutetableassociation',
+                      template.resources)
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC('vpc', template, CidrBlock='10.0.0.0/16')
+        build_subnet_tiers(
+            template, vpc, '10.0.0.0/16', ['us-east-1a'],
+            [Tier('private', PrivateSubnet)], nat='none'
+        )
+        with self.assertRaises(ValueError):
+            self._build_two_private_tiers(nat='everywhere')
+        with self.assertRaises(ValueError):
+            self._build_two_private_tiers(nat_gateways=0)
+
+    def test_private_subnet_nat_gateway(self):
+        template = self._create_test_document()
+        PrivateSubnet(
+            'other', template, AvailabilityZone='us-east-1b',
+            CidrBlock='10.0.1.0/24', VpcId=Ref(self.VpcName),
+            NatGateway=template.resources[self.PublicSubnetName + 'natgateway']
+        )
+        self.assertEqual(
+            self.PublicSubnetName + 'natgateway',
+            template.resources['otherroute'].properties[
+                'NatGatewayId'
+            ].data['Ref']
+        )
+
     def test_routed_vpc_peer_connection(self):
-        pass
+        template = self._create_test_document()
+        RoutedVPCPeeringConnection(
+            'peer',
+            template,
+            PeerVpcId='vpc-12345678',
+            PeerCidrBlock='10.1.0.0/16',
+            VpcId=Ref(self.VpcName)
+        )
+        for name in [self.PublicSubnetName, self.PrivateSubnetName]:
+            route = template.resources[name + 'routetabletopeerroute']
+            self.assertEqual(
+                '10.1.0.0/16',
+                route.properties['DestinationCidrBlock']
+            )
+            self.assertEqual(
+                'peer',
+                route.properties['VpcPeeringConnectionId'].data['Ref']
+            )
+        self.assertIsInstance(
+            template.resources['peersecuritygroup'],
+            SecurityGroup
+        )
+
+    def test_route_tables_are_tracked_by_tier(self):
+        template, tiers = self._build_tiers()
+        self.assertEqual(
+            ['publicuseast1aroutetable', 'publicuseast1broutetable',
+             'publicuseast1croutetable'],
+            list(route_tables(template, ['public']))
+        )
+        self.assertEqual(6, len(route_tables(template)))
+        self.assertEqual(0, len(route_tables(template, ['secure'])))
+
+    def test_route_tables_rejects_vpc_ids_it_cannot_compare(self):
+        template, tiers = self._build_tiers()
+        self.assertEqual(
+            6, len(route_tables(template, vpc_id=Ref(self.VpcName)))
+        )
+        self.assertEqual(0, len(route_tables(template, vpc_id=Ref('other'))))
+        RouteTable(
+            'importedroutetable', template, VpcId=ImportValue('shared-vpc')
+        )
+        self.assertEqual(7, len(route_tables(template, vpc_id='vpc-1234')))
+        with self.assertRaisesRegex(ValueError, 'importedroutetable'):
+            route_tables(template, vpc_id=Ref(self.VpcName))
+
+    def test_routed_vpc_peer_connection_scoped_to_tiers(self):
+        template, tiers = self._build_tiers()
+        RoutedVPCPeeringConnection(
+            'peer',
+            template,
+            PeerVpcId='vpc-12345678',
+            PeerCidrBlock='10.1.0.0/16',
+            VpcId=Ref('vpc'),
+            Tiers=['private']
+        )
+        routes = [
+            title for title in template.index['AWS::EC2::Route']
+            if title.endswith('topeerroute')
+        ]
+        self.assertEqual(
+            ['privateuseast1aroutetabletopeerroute',
+             'privateuseast1broutetabletopeerroute',
+             'privateuseast1croutetabletopeerroute'],
+            routes
+        )
+
+    def _create_vpcs(self, cidrs):
+        template = IndexedTemplate()
+        vpcs = []
+        for i, cidr in enumerate(cidrs):
+            vpc = VPC('vpc%d' % i, template, CidrBlock=cidr)
+            RouteTable('vpc%droutetable' % i, template, VpcId=Ref(vpc))
+            vpcs.append(vpc)
+        return template, vpcs
+
+    def test_check_cidr_overlaps_accepts_disjoint_blocks(self):
+        check_cidr_overlaps({
+            'a': '10.0.0.0/16',
+            'b': '10.1.0.0/16',
+            'c': '192.168.0.0/24',
+            'd': '2001:db8::/32'
+        })
+
+    def test_check_cidr_overlaps_rejects_nested_blocks(self):
+        with self.assertRaises(ValueError) as context:
+            check_cidr_overlaps({
+                'a': '10.0.0.0/8',
+                'b': '172.16.0.0/12',
+                'c': '10.200.0.0/16'
+            })
+        self.assertIn('c 10.200.0.0/16 overlaps a 10.0.0.0/8',
+                      str(context.exception))
+
+    def test_check_cidr_overlaps_at_scale(self):
+        cidrs = {'vpc%d' % i: '10.%d.%d.0/24' % (i // 256, i % 256)
+                 for i in range(10000)}
+        check_cidr_overlaps(cidrs)
+        cidrs['overlap'] = '10.20.0.0/14'
+        with self.assertRaises(ValueError):
+            check_cidr_overlaps(cidrs)
+
+    def test_build_vpc_peering_full_mesh(self):
+        template, vpcs = self._create_vpcs(
+            ['10.0.0.0/16', '10.1.0.0/16', '10.2.0.0/16']
+        )
+        connections = build_vpc_peering(template, vpcs)
+        self.assertEqual(
+            ['vpc0tovpc1', 'vpc0tovpc2', 'vpc1tovpc2'],
+            [connection.title for connection in connections]
+        )
+        route = template.resources[
+            'vpc1routetabletovpc0tovpc1accepterroute'
+        ]
+        self.assertEqual(
+            '10.0.0.0/16', route.properties['DestinationCidrBlock']
+        )
+        route = template.resources['vpc0routetabletovpc0tovpc2route']
+        self.assertEqual(
+            '10.2.0.0/16', route.properties['DestinationCidrBlock']
+        )
+        self.assertEqual(6, len(template.index['AWS::EC2::Route']))
+        self.assertEqual(6, len(template.index['AWS::EC2::SecurityGroup']))
+        group = template.resources['vpc0tovpc1acceptersecuritygroup']
+        self.assertEqual('vpc1', group.properties['VpcId'].data['Ref'])
+
+    def test_build_vpc_peering_hub_and_spoke(self):
+        template, vpcs = self._create_vpcs(
+            ['10.0.0.0/16', '10.1.0.0/16', '10.2.0.0/16']
+        )
+        connections = build_vpc_peering(template, vpcs[1:], hub=vpcs[0])
+        self.assertEqual(
+            ['vpc0tovpc1', 'vpc0tovpc2'],
+            [connection.title for connection in connections]
+        )
+        self.assertEqual(4, len(template.index['AWS::EC2::Route']))
+
+    def test_build_vpc_peering_rejects_overlaps(self):
+        template, vpcs = self._create_vpcs(['10.0.0.0/16', '10.0.1.0/24'])
+        with self.assertRaises(ValueError):
+            build_vpc_peering(template, vpcs)
+        self.assertNotIn('AWS::EC2::VPCPeeringConnection', template.index)
+
+    def _endpoint_route_tables(self, endpoint):
+        return [
+            ref.data['Ref'] for ref in endpoint.properties['RouteTableIds']
+        ]
+
+    def test_gateway_endpoints_on_every_route_table(self):
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC(
+            'vpc', template, CidrBlock='10.0.0.0/16',
+            GatewayEndpoints=['s3', 'dynamodb']
+        )
+        build_subnet_tiers(
+            template, vpc, '10.0.0.0/16', ['us-east-1a', 'us-east-1b'],
+            [
+                Tier('public', PublicSubnet),
+                Tier('private', PrivateSubnet),
+                Tier('secure', SecureSubnet)
+            ]
+        )
+        SecureSubnet(
+            'isolated', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.200.0/24', VpcId=Ref(vpc), RouteTable=True
+        )
+        other = VPC('other', template, CidrBlock='10.1.0.0/16')
+        PrivateSubnet(
+            'elsewhere', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.1.0.0/24', VpcId=Ref(other), NatGateway=None
+        )
+        endpoint = template.resources['vpcs3endpoint']
+        self.assertEqual(
+            {'Fn::Sub': 'com.amazonaws.${AWS::Region}.s3'},
+            endpoint.properties['ServiceName'].to_dict()
+        )
+        self.assertEqual(
+            [
+                'publicuseast1aroutetable', 'publicuseast1broutetable',
+                'privateuseast1aroutetable', 'privateuseast1broutetable',
+                'isolatedroutetable'
+            ],
+            self._endpoint_route_tables(endpoint)
+        )
+        self.assertEqual(
+            self._endpoint_route_tables(endpoint),
+            self._endpoint_route_tables(
+                template.resources['vpcdynamodbendpoint']
+            )
+        )
+        self.assertEqual(
+            ['isolatedroutetable'], list(route_tables(template, ['secure']))
+        )
+        self.assertNotIn('secureuseast1aroutetable', template.resources)
+
+    def test_gateway_endpoint_scoped_to_tiers(self):
+        template, tiers = self._build_tiers()
+        GatewayVPCEndpoint(
+            'endpoint', template, Service='s3', VpcId=Ref('vpc'),
+            Tiers=['private']
+        )
+        PrivateSubnet(
+            'late', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.200.0/24', VpcId=Ref('vpc')
+        )
+        PublicSubnet(
+            'publiclate', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.201.0/24', VpcId=Ref('vpc'), NatGateways=0
+        )
+        self.assertEqual(
+            [
+                'privateuseast1aroutetable', 'privateuseast1broutetable',
+                'privateuseast1croutetable', 'lateroutetable'
+            ],
+            self._endpoint_route_tables(template.resources['endpoint'])
+        )
+
+    def test_gateway_endpoint_skips_route_tables_added_directly(self):
+        template = IndexedTemplate()
+        vpc = InternetGatewayVPC('vpc', template, CidrBlock='10.0.0.0/16')
+        endpoint = GatewayVPCEndpoint(
+            'endpoint', template, Service='s3', VpcId=Ref(vpc)
+        )
+        SecureSubnet(
+            'secure', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.0.0/24', VpcId=Ref(vpc)
+        )
+        RouteTable('late', template, VpcId=Ref(vpc))
+        self.assertEqual([], endpoint.properties['RouteTableIds'])
+        with self.assertWarnsRegex(UserWarning, 'endpoint is not attached'):
+            template.to_json()
+        endpoint.properties['RouteTableIds'].append(Ref('late'))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            template.to_json()
+
+    def test_gateway_endpoint_in_troposphere_template(self):
+        template = self._create_test_document()
+        endpoint = GatewayVPCEndpoint(
+            'endpoint', template, ServiceName='com.amazonaws.eu-west-1.s3',
+            VpcId=Ref(self.VpcName)
+        )
+        self.assertEqual(
+            [self.PublicSubnetName + 'routetable',
+             self.PrivateSubnetName + 'routetable'],
+            self._endpoint_route_tables(endpoint)
+        )
+
+    def test_route_tables_tiers_need_tropopause_template(self):
+        template = self._create_test_document()
+        with self.assertRaises(ValueError):
+            route_tables(template, ['private'])
 
     def test_security_group_egress_from_yaml(self):
         template = self._create_test_document()
@@ -366,6 +958,91 @@ class TestEc2(unittest.TestCase):
         for rule in security_group.properties['SecurityGroupIngress']:
             self.assertIsInstance(rule, SecurityGroupRule)
 
+    def test_security_group_from_yaml_raises_on_bad_files(self):
+        template = self._create_test_document()
+        with self.assertRaisesRegex(ValueError, 'tests/data/missing.yaml'):
+            SecurityGroupFromYaml(
+                'sg', template, GroupDescription='example',
+                SecurityGroupIngress='tests/data/missing.yaml'
+            )
+        self.assertNotIn('sg', template.resources)
+
+    def test_security_group_from_yaml_compiles_rules(self):
+        template = self._create_test_document()
+        security_group = SecurityGroupFromYaml(
+            'sg',
+            template,
+            GroupDescription='example',
+            SecurityGroupIngress='tests/data/security-group-overlap.yaml'
+        )
+        rules = [
+            rule.properties for rule in
+            security_group.properties['SecurityGroupIngress']
+        ]
+        self.assertEqual(
+            [
+                {'IpProtocol': 'icmp', 'CidrIp': '10.0.0.0/24',
+                 'FromPort': '-1', 'ToPort': '-1'},
+                {'IpProtocol': 'tcp', 'CidrIp': '10.0.0.0/24',
+                 'FromPort': '80', 'ToPort': '83'},
+                {'IpProtocol': 'tcp', 'CidrIp': '10.0.0.0/24',
+                 'FromPort': '443', 'ToPort': '443'},
+                {'IpProtocol': 'tcp', 'CidrIp': '10.0.0.0/24',
+                 'FromPort': '8000', 'ToPort': '8081'},
+                {'IpProtocol': 'tcp', 'CidrIpv6': '2001:db8::/32',
+                 'FromPort': '80', 'ToPort': '82'},
+                {'IpProtocol': 'tcp', 'CidrIpv6': '2001:db8::/32',
+                 'FromPort': '443', 'ToPort': '443'}
+            ],
+            rules
+        )
+        self.assertEqual(
+            (29, 6),
+            security_group.rule_counts['SecurityGroupIngress']
+        )
+
+    def test_compile_rules_keeps_distinct_rules(self):
+        rules, expanded = compile_rules({
+            'a': {
+                'cidr': ['10.0.0.0/24', '10.0.2.0/24'],
+                'protocols': {'tcp': ['22', 22], 'udp': ['53']}
+            }
+        })
+        self.assertEqual(6, expanded)
+        self.assertEqual(4, len(rules))
+
+    def test_compile_rules_keeps_icmp_types(self):
+        rules, expanded = compile_rules({
+            'a': {
+                'cidr': ['10.0.0.0/24'],
+                'protocols': {
+                    'icmp': ['3', '4', '8'], 'icmpv6': ['1', '2'],
+                    '-1': ['-1'], '17': ['53', '54']
+                }
+            }
+        })
+        self.assertEqual(8, expanded)
+        self.assertEqual(
+            [('-1', -1, -1), ('17', 53, 54), ('icmp', 3, 3), ('icmp', 4, 4),
+             ('icmp', 8, 8), ('icmpv6', 1, 1), ('icmpv6', 2, 2)],
+            [(protocol, start, end) for protocol, _, start, end in rules]
+        )
+
+    def test_security_group_rule_titles_are_distinct(self):
+        template = self._create_test_document()
+        security_group = SecurityGroupFromYaml(
+            'sg',
+            template,
+            GroupDescription='example',
+            SecurityGroupIngress='tests/data/security-group-overlap.yaml'
+        )
+        titles = [
+            rule.title for rule in
+            security_group.properties['SecurityGroupIngress']
+        ]
+        self.assertIn('1000024tcp80to83', titles)
+        self.assertEqual(len(titles), len(set(titles)))
+
     def test_security_group(self):
         template = self._create_test_document()
         SecurityGroup(
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import unittest
+from troposphere import GetAtt, Join, Output, Parameter, Ref, Sub, Template
+from troposphere.ec2 import Route, RouteTable, VPC
+from tropopause.ec2 import InternetGatewayVPC, PrivateSubnet, PublicSubnet
+from tropopause.graph import (
+    Dangling, Edge, cycles, dangling, dependency_graph, order, references,
+    validate
+)
+from tropopause import Template as tropopauseTemplate
+
+
+def graph_of(edges):
+    return {
+        title: [Edge(target, None, 'Ref') for target in targets]
+        for title, targets in edges
+    }
+
+
+class TestGraph(unittest.TestCase):
+    """ Unit Tests for tropopause.graph """
+
+    def test_references(self):
+        value = {
+            'a': Ref('vpc').to_dict(),
+            'b': [GetAtt('vpc', 'CidrBlock').to_dict(), {'Fn::GetAtt': 'x.Y'}],
+            'c': Join('', ['${nope}', Ref('AWS::Region')]).to_dict(),
+            'd': Sub('${vpc}-${gw.Id}-${!Literal}').to_dict(),
+            'e': Sub('${local}', local=Ref('table')).to_dict(),
+        }
+        self.assertEqual(
+            [
+                Edge('vpc', None, 'Ref'),
+                Edge('vpc', 'CidrBlock', 'GetAtt'),
+                Edge('x', 'Y', 'GetAtt'),
+                Edge('AWS::Region', None, 'Ref'),
+                Edge('vpc', None, 'Sub'),
+                Edge('gw', 'Id', 'Sub'),
+                Edge('table', None, 'Ref'),
+            ],
+            references(value)
+        )
+
+    def test_dependency_graph(self):
+        template = Template()
+        vpc = VPC('vpc', template, CidrBlock='10.0.0.0/16')
+        table = RouteTable('table', template, VpcId=Ref(vpc))
+        Route(
+            'route', template, RouteTableId=Ref(table),
+            DestinationCidrBlock='0.0.0.0/0', GatewayId=Ref('gateway'),
+            DependsOn=['vpc', 'table']
+        )
+        graph = dependency_graph(template)
+        self.assertEqual(['vpc', 'table', 'route'], list(graph))
+        self.assertEqual([], graph['vpc'])
+        self.assertEqual([Edge('vpc', None, 'Ref')], graph['table'])
+        self.assertCountEqual(
+            [
+                Edge('gateway', None, 'Ref'),
+                Edge('table', None, 'Ref'),
+                Edge('vpc', None, 'DependsOn'),
+                Edge('table', None, 'DependsOn'),
+            ],
+            graph['route']
+        )
+        self.assertEqual(graph, dependency_graph(template.to_dict()))
+
+    def test_dangling(self):
+        template = Template()
+        template.add_parameter(Parameter('cidr', Type='String'))
+        vpc = VPC('vpc', template, CidrBlock=Ref('cidr'))
+        RouteTable(
+            'table', template, VpcId=Ref(vpc),
+            Tags=[{'Key': 'a', 'Value': Sub('${AWS::Region}-${cidr.Id}')}],
+            DependsOn=['cidr', 'missing']
+        )
+        template.add_output(Output('gateway', Value=GetAtt('gateway', 'Id')))
+        self.assertEqual(
+            [
+                Dangling('table', Edge('cidr', 'Id', 'Sub')),
+                Dangling('table', Edge('cidr', None, 'DependsOn')),
+                Dangling('table', Edge('missing', None, 'DependsOn')),
+                Dangling('Outputs.gateway', Edge('gateway', 'Id', 'GetAtt')),
+            ],
+            dangling(template)
+        )
+
+    def test_cycles(self):
+        graph = graph_of([
+            ('a', ['b']), ('b', ['c', 'x']), ('c', ['a']), ('d', ['d']),
+            ('e', ['a', 'f']), ('f', ['e']), ('g', []),
+        ])
+        self.assertEqual([['a', 'b', 'c'], ['d'], ['e', 'f']], cycles(graph))
+        self.assertEqual([], cycles(graph_of([('a', ['b']), ('b', [])])))
+
+    def test_order(self):
+        graph = graph_of([
+            ('route', ['table', 'gateway']), ('table', ['vpc']),
+            ('gateway', []), ('vpc', ['cidr']), ('other', []),
+        ])
+        self.assertEqual(
+            ['vpc', 'table', 'gateway', 'route', 'other'], order(graph)
+        )
+        with self.assertRaisesRegex(ValueError, 'a, b'):
+            order(graph_of([('a', ['b']), ('b', ['a'])]))
+
+    def test_order_is_linear(self):
+        titles = ['r%d' % i for i in range(100000)]
+        graph = OrderedDict(graph_of(
+            [(titles[0], [])] +
+            [(title, [titles[i]]) for i, title in enumerate(titles[1:])]
+        ))
+        graph.move_to_end(titles[0])
+        self.assertEqual(titles, order(graph))
+        self.assertEqual([], cycles(graph))
+
+    def test_validate(self):
+        template = tropopauseTemplate()
+        vpc = InternetGatewayVPC('vpc', template, CidrBlock='10.0.0.0/16')
+        PublicSubnet(
+            'publicsubnet', template, AvailabilityZone='a',
+            CidrBlock='10.0.0.0/24', VpcId=Ref(vpc)
+        )
+        graph = validate(template)
+        self.assertEqual(dependency_graph(template), graph)
+        PrivateSubnet(
+            'privatesubnet', template, AvailabilityZone='b',
+            CidrBlock='10.0.1.0/24', VpcId=Ref(vpc)
+        )
+        with self.assertRaises(ValueError) as cm:
+            validate(template)
+        self.assertIn(
+            'privatesubnetroute: Ref publicbnatgateway does not exist',
+            str(cm.exception)
+        )
+        RouteTable('loop', template, VpcId=Ref('loop'))
+        with self.assertRaisesRegex(ValueError, 'cycle: loop -> loop'):
+            validate(template)
+
+
+if __name__ == '__main__':
+    unittest.main()
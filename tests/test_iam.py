@@ -1,6 +1,8 @@
+import os
 import unittest
 from troposphere import Template, Ref
 from tropopause.iam import RoleFromYaml, PolicyFromYaml, PolicyTypeFromYaml
+from tropopause.loader import documents, preload
 
 
 class TestIAM(unittest.TestCase):
@@ -33,10 +35,41 @@ class TestIAM(unittest.TestCase):
         return template
 
     def test_role_from_yaml(self):
-        pass
+        template = self._create_test_document()
+        role = template.resources['role']
+        self.assertEqual(
+            'sts:AssumeRole',
+            role.properties['AssumeRolePolicyDocument']['Statement'][0][
+                'Action'
+            ]
+        )
 
     def test_policy_from_yaml(self):
-        pass
+        template = self._create_test_document()
+        policy = template.resources['role'].properties['Policies'][0]
+        self.assertEqual(
+            ['s3:ListObjects', 's3:GetObject'],
+            policy.properties['PolicyDocument']['Statement'][0]['Action']
+        )
 
     def test_policy_type_from_yaml(self):
-        pass
+        template = self._create_test_document()
+        policy_type = template.resources['policytype']
+        self.assertIn('Statement', policy_type.properties['PolicyDocument'])
+
+    def test_documents_are_loaded_from_cache(self):
+        self._create_test_document()
+        hits = documents.cache_info().hits
+        self._create_test_document()
+        self.assertEqual(hits + 3, documents.cache_info().hits)
+
+    def test_preloaded_documents_are_used(self):
+        preloaded = preload('tests/data/iam_*.yaml')
+        self.assertEqual(3, len(preloaded))
+        hits = documents.cache_info().hits
+        template = self._create_test_document()
+        self.assertEqual(hits + 3, documents.cache_info().hits)
+        self.assertEqual(
+            preloaded[os.path.abspath('tests/data/iam_policy_type.yaml')],
+            template.resources['policytype'].properties['PolicyDocument']
+        )
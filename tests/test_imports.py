@@ -0,0 +1,84 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+import tropopause
+
+
+def imported_modules(statement):
+    """ Names of the modules python -X importtime reports for statement """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    return set(
+        line.split('|')[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:')
+    )
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'requires -X importtime')
+class TestImports(unittest.TestCase):
+    """ Import time tests for tropopause """
+
+    SUBMODULES = [
+        'troposphere.autoscaling', 'troposphere.cloudformation',
+        'troposphere.ec2', 'troposphere.elasticloadbalancingv2',
+        'troposphere.iam', 'yaml',
+    ]
+
+    def test_import_tropopause_is_lazy(self):
+        modules = imported_modules('import tropopause')
+        self.assertIn('troposphere', modules)
+        for module in self.SUBMODULES:
+            self.assertNotIn(module, modules)
+
+    def test_lazy_attribute_imports_only_its_submodule(self):
+        modules = imported_modules(
+            'from tropopause import AutoScalingGroup'
+        )
+        self.assertIn('tropopause.autoscaling', modules)
+        self.assertIn('troposphere.autoscaling', modules)
+        # troposphere.autoscaling imports troposphere.cloudformation
+        for module in self.SUBMODULES[2:]:
+            self.assertNotIn(module, modules)
+
+    def test_yaml_imported_on_first_load(self):
+        modules = imported_modules('import tropopause.ec2, tropopause.iam')
+        self.assertIn('troposphere.ec2', modules)
+        self.assertNotIn('yaml', modules)
+        modules = imported_modules(
+            'import tropopause.loader; '
+            'tropopause.loader.load_yaml("tests/data/security-group.yaml")'
+        )
+        self.assertIn('yaml', modules)
+
+    def test_lazy_attributes(self):
+        from tropopause.ec2 import InternetGatewayVPC
+        self.assertIs(InternetGatewayVPC, tropopause.InternetGatewayVPC)
+        self.assertIn('InternetGatewayVPC', dir(tropopause))
+        with self.assertRaises(AttributeError):
+            tropopause.DoesNotExist
+
+    def test_lazy_attributes_cover_the_readme(self):
+        path = os.path.join(os.path.dirname(__file__), '..', 'README.md')
+        with open(path) as stream:
+            readme = stream.read()
+        objects = readme.split('## Available Objects')[1].split('\n## ')[0]
+        names = re.findall(r'^\* `(\w+)`', objects, re.MULTILINE)
+        self.assertIn('route_tables', names)
+        for name in names:
+            self.assertTrue(
+                name in tropopause._lazy or name in vars(tropopause), name
+            )
+        for name, module in tropopause._lazy.items():
+            self.assertIs(
+                getattr(__import__(module, fromlist=[name]), name),
+                getattr(tropopause, name)
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
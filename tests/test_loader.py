@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import unittest
+from tropopause.loader import DocumentCache
+
+
+class TestLoader(unittest.TestCase):
+    """ Unit Tests for tropopause.loader """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = DocumentCache(maxsize=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as stream:
+            stream.write(content)
+        return path
+
+    def test_load_parses_document(self):
+        path = self._write('a.yaml', 'a:\n- b\n')
+        self.assertEqual({'a': ['b']}, self.cache.load(path))
+
+    def test_repeated_load_is_a_hit(self):
+        path = self._write('a.yaml', 'a: b\n')
+        first = self.cache.load(path)
+        second = self.cache.load(path)
+        self.assertEqual(first, second)
+        info = self.cache.cache_info()
+        self.assertEqual(1, info.hits)
+        self.assertEqual(1, info.misses)
+        self.assertEqual(1, info.currsize)
+
+    def test_loaded_documents_are_copies(self):
+        path = self._write('a.yaml', 'a:\n- b: [c]\n')
+        first = self.cache.load(path)
+        first['a'][0]['b'].append('d')
+        first['e'] = 'f'
+        self.assertEqual({'a': [{'b': ['c']}]}, self.cache.load(path))
+        preloaded = self.cache.preload([path])
+        preloaded[path]['a'].clear()
+        self.assertEqual({'a': [{'b': ['c']}]}, self.cache.load(path))
+
+    def test_paths_are_only_recorded_while_recording(self):
+        first = self._write('a.yaml', 'a: b\n')
+        second = self._write('b.yaml', 'a: b\n')
+        self.cache.load(first)
+        self.assertIsNone(self.cache.paths)
+        with self.cache.recording() as outer:
+            self.cache.load(first)
+            with self.cache.recording() as inner:
+                self.cache.load(second)
+        self.assertEqual({second}, inner)
+        self.assertEqual({first, second}, outer)
+        self.assertIsNone(self.cache.paths)
+
+    def test_relative_and_absolute_paths_share_an_entry(self):
+        path = self._write('a.yaml', 'a: b\n')
+        self.cache.load(path)
+        self.cache.load(os.path.relpath(path))
+        self.assertEqual(1, self.cache.cache_info().hits)
+
+    def test_changed_file_is_parsed_again(self):
+        path = self._write('a.yaml', 'a: b\n')
+        self.cache.load(path)
+        self._write('a.yaml', 'a: changed\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual({'a': 'changed'}, self.cache.load(path))
+        self.assertEqual(2, self.cache.cache_info().misses)
+
+    def test_least_recently_used_document_is_evicted(self):
+        a = self._write('a.yaml', 'a: a\n')
+        b = self._write('b.yaml', 'b: b\n')
+        c = self._write('c.yaml', 'c: c\n')
+        self.cache.load(a)
+        self.cache.load(b)
+        self.cache.load(a)
+        self.cache.load(c)
+        self.assertEqual(2, self.cache.cache_info().currsize)
+        self.cache.load(a)
+        self.assertEqual(2, self.cache.cache_info().hits)
+        self.cache.load(b)
+        self.assertEqual(4, self.cache.cache_info().misses)
+
+    def test_cache_clear(self):
+        path = self._write('a.yaml', 'a: b\n')
+        self.cache.load(path)
+        self.cache.cache_clear()
+        self.assertEqual((0, 0, 2, 0), tuple(self.cache.cache_info()))
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(OSError):
+            self.cache.load(os.path.join(self.directory, 'missing.yaml'))
+
+    def test_preload_directory(self):
+        os.mkdir(os.path.join(self.directory, 'nested'))
+        paths = [
+            self._write('a.yaml', 'a: a\n'),
+            self._write('b.yml', 'b: b\n'),
+            self._write(os.path.join('nested', 'c.yaml'), 'c: c\n'),
+        ]
+        self._write('d.txt', 'not: loaded\n')
+        preloaded = self.cache.preload(self.directory, max_workers=4)
+        self.assertEqual(sorted(paths), list(preloaded))
+        self.assertEqual({'c': 'c'}, preloaded[paths[2]])
+        self.assertEqual((0, 3, 2, 3), tuple(self.cache.cache_info()))
+        for path in sorted(paths):
+            self.assertEqual(preloaded[path], self.cache.load(path))
+        self.assertEqual((3, 3, 2, 3), tuple(self.cache.cache_info()))
+
+    def test_preload_more_than_maxsize(self):
+        paths = [
+            self._write('%d.yaml' % i, 'i: %d\n' % i) for i in range(20)
+        ]
+        self.cache.preload(paths)
+        for path in paths * 2:
+            self.cache.load(path)
+        self.assertEqual((40, 20, 2, 20), tuple(self.cache.cache_info()))
+        with open(paths[0], 'a') as stream:
+            stream.write('j: 1\n')
+        self.assertEqual({'i': 0, 'j': 1}, self.cache.load(paths[0]))
+        self.assertEqual((40, 21, 2, 20), tuple(self.cache.cache_info()))
+        self.cache.cache_clear()
+        self.assertEqual(0, self.cache.cache_info().currsize)
+
+    def test_preload_glob_and_list(self):
+        a = self._write('a.yaml', 'a: a\n')
+        self._write('b.yaml', 'b: b\n')
+        self.assertEqual(
+            [a], list(self.cache.preload(os.path.join(self.directory, 'a*')))
+        )
+        self.assertEqual([a], list(self.cache.preload([a, a])))
+
+    def test_preload_reports_every_failure(self):
+        self._write('a.yaml', 'a: [\n')
+        self._write('b.yaml', 'b: b\n')
+        self._write('c.yaml', '- c\n')
+
+        def validate(document):
+            if not isinstance(document, dict):
+                raise TypeError('not a mapping')
+        with self.assertRaises(ValueError) as raised:
+            self.cache.preload(self.directory, validate=validate)
+        message = str(raised.exception)
+        self.assertIn('a.yaml', message)
+        self.assertIn('c.yaml: not a mapping', message)
+        self.assertNotIn('b.yaml', message)
+        self.assertEqual(0, self.cache.cache_info().currsize)
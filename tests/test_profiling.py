@@ -0,0 +1,133 @@
+import io
+import tracemalloc
+import unittest
+from troposphere import Ref
+from tropopause import Tags, Template
+from tropopause.cloudformation import InitConfigFromS3
+from tropopause.ec2 import InternetGatewayVPC, PublicSubnet, SecureSubnet
+from tropopause.profiling import Profile, profiled
+
+
+@profiled
+def Allocating(func):
+    """ Allocates and frees a MiB around func """
+    def wrapper(*args, **kwargs):
+        garbage = bytearray(1 << 20)
+        del garbage
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@profiled
+def Outer(func):
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class Allocated(object):
+    @Outer
+    @Allocating
+    def __init__(self):
+        """ Built by Allocating """
+
+
+class TestProfiling(unittest.TestCase):
+    """ Unit Tests for tropopause.profiling """
+
+    def _create_test_document(self):
+        template = Template()
+        vpc = InternetGatewayVPC(
+            'vpc', template, CidrBlock='10.0.0.0/16', Tags=Tags(a='a')
+        )
+        PublicSubnet(
+            'public', template, AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.0.0/24', VpcId=Ref(vpc)
+        )
+        for i in range(3):
+            SecureSubnet(
+                'secure%d' % i, template, CidrBlock='10.0.%d.0/24' % (i + 1),
+                VpcId=Ref(vpc)
+            )
+        InitConfigFromS3(url='s3://example/example.sh')
+        return template
+
+    def test_profile_counts_calls_per_decorator_and_class(self):
+        with Profile() as profile:
+            self._create_test_document()
+        stats = profile.stats
+        self.assertEqual(1, stats[('AddTagsFromVPC', 'PublicSubnet')].calls)
+        self.assertEqual(3, stats[('AddTagsFromVPC', 'SecureSubnet')].calls)
+        self.assertEqual(
+            1, stats[('CommandsDecoratorS3', 'InitConfigFromS3')].calls
+        )
+        self.assertEqual(4, profile.totals()['AddTagsFromVPC'].calls)
+        self.assertEqual(3, profile.totals('class')['InitConfigFromS3'].calls)
+        self.assertGreater(
+            stats[('AddTagsFromVPC', 'PublicSubnet')].seconds, 0
+        )
+        self.assertGreater(stats[('AddTagsFromVPC', 'PublicSubnet')].bytes, 0)
+
+    def test_profile_is_inactive_outside_context(self):
+        with Profile() as profile:
+            pass
+        self._create_test_document()
+        self.assertEqual({}, dict(profile.stats))
+        self.assertIsNone(Profile.active)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profile_without_memory(self):
+        with Profile(memory=False) as profile:
+            self._create_test_document()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(
+            0, profile.stats[('AddTagsFromVPC', 'PublicSubnet')].bytes
+        )
+
+    def test_report_is_sorted(self):
+        with Profile() as profile:
+            self._create_test_document()
+        stream = io.StringIO()
+        profile.report(stream, sort='calls')
+        lines = stream.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('decorator'))
+        calls = [int(line.split()[2]) for line in lines[1:]]
+        self.assertEqual(sorted(calls, reverse=True), calls)
+
+    def test_dump_stacks_nests_stacked_decorators(self):
+        with Profile() as profile:
+            self._create_test_document()
+        stream = io.StringIO()
+        profile.dump_stacks(stream)
+        stacks = [
+            line.rsplit(' ', 1)[0] for line in stream.getvalue().splitlines()
+        ]
+        self.assertIn(
+            'InitConfigFromS3.ServicesDecorator;'
+            'InitConfigFromS3.FilesDecorator;'
+            'InitConfigFromS3.CommandsDecoratorS3',
+            stacks
+        )
+        self.assertIn('SecureSubnet.AddTagsFromVPC', stacks)
+
+    def test_profile_survives_exceptions(self):
+        with Profile() as profile:
+            with self.assertRaises(AttributeError):
+                InitConfigFromS3(url='s3://example/example.sh', bad='x')
+        self.assertEqual((), profile.path)
+
+    @unittest.skipUnless(
+        hasattr(tracemalloc, 'reset_peak'), 'needs tracemalloc.reset_peak'
+    )
+    def test_profile_records_peak_bytes(self):
+        with Profile() as profile:
+            Allocated()
+            Allocated()
+        for decorator in ('Allocating', 'Outer'):
+            stat = profile.stats[(decorator, 'Allocated')]
+            self.assertEqual(2, stat.calls)
+            self.assertGreaterEqual(stat.bytes, 2 << 20)
+
+    def test_profiled_keeps_the_wrapped_name(self):
+        self.assertEqual('__init__', Allocated.__init__.__name__)
+        self.assertEqual(' Built by Allocating ', Allocated.__init__.__doc__)
@@ -0,0 +1,82 @@
+import io
+import json
+import unittest
+import yaml
+from troposphere import Output, Parameter, Ref, Template
+from tropopause import Tags
+from tropopause.ec2 import InternetGatewayVPC, PublicSubnet, PrivateSubnet
+from tropopause.serializer import dump_json, dump_yaml
+
+
+class TestSerializer(unittest.TestCase):
+    """ Unit Tests for tropopause.serializer """
+
+    def _create_test_document(self):
+        template = Template()
+        template.add_version('2010-09-09')
+        template.add_description('test')
+        template.add_parameter(Parameter('Environment', Type='String'))
+        vpc = InternetGatewayVPC(
+            'vpc',
+            template,
+            CidrBlock='10.0.0.0/16',
+            Tags=Tags(Environment=Ref('Environment'))
+        )
+        PublicSubnet(
+            'publicuseast1a',
+            template,
+            AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.0.0/24',
+            VpcId=Ref(vpc)
+        )
+        PrivateSubnet(
+            'privateuseast1a',
+            template,
+            AvailabilityZone='us-east-1a',
+            CidrBlock='10.0.1.0/24',
+            VpcId=Ref(vpc)
+        )
+        template.add_output(Output('vpcid', Value=Ref(vpc)))
+        return template
+
+    def test_dump_json_matches_to_json(self):
+        template = self._create_test_document()
+        stream = io.StringIO()
+        dump_json(template, stream)
+        self.assertEqual(template.to_json(), stream.getvalue())
+
+    def test_dump_json_compact(self):
+        template = self._create_test_document()
+        stream = io.StringIO()
+        dump_json(template, stream, compact=True)
+        self.assertEqual(
+            json.dumps(
+                template.to_dict(), sort_keys=True, separators=(',', ':')
+            ),
+            stream.getvalue()
+        )
+
+    def test_dump_json_empty_template(self):
+        for compact in (False, True):
+            stream = io.StringIO()
+            dump_json(Template(), stream, compact=compact)
+            self.assertEqual(
+                {'Resources': {}}, json.loads(stream.getvalue())
+            )
+        stream = io.StringIO()
+        dump_json(Template(), stream)
+        self.assertEqual(Template().to_json(), stream.getvalue())
+
+    def test_dump_yaml(self):
+        template = self._create_test_document()
+        stream = io.StringIO()
+        dump_yaml(template, stream)
+        self.assertEqual(
+            json.loads(template.to_json()),
+            yaml.safe_load(stream.getvalue())
+        )
+
+    def test_dump_yaml_empty_template(self):
+        stream = io.StringIO()
+        dump_yaml(Template(), stream)
+        self.assertEqual({'Resources': {}}, yaml.safe_load(stream.getvalue()))
@@ -0,0 +1,348 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from troposphere import GetAtt, Output, Parameter, Ref, Sub
+from troposphere.ec2 import SecurityGroup
+from tropopause import Tags, Template
+from tropopause.ec2 import InternetGatewayVPC, PublicSubnet, PrivateSubnet
+from tropopause.graph import Edge, references
+from tropopause.splitter import partition, report, split_template
+from tropopause.splitter import write_split
+
+PSEUDO = ('AWS::Region', 'AWS::StackName', 'AWS::AccountId')
+
+
+class TestSplitter(unittest.TestCase):
+    """ Unit Tests for tropopause.splitter """
+
+    def _create_test_document(self, zones=10):
+        template = Template(max_resources=None)
+        template.add_parameter(Parameter('Environment', Type='String'))
+        vpc = InternetGatewayVPC(
+            'vpc', template, CidrBlock='10.0.0.0/16',
+            Tags=Tags(Environment=Ref('Environment'))
+        )
+        for i in range(zones):
+            PublicSubnet(
+                'publiczone%d' % i, template, AvailabilityZone='zone%d' % i,
+                CidrBlock='10.0.%d.0/24' % (2 * i), VpcId=Ref(vpc)
+            )
+            PrivateSubnet(
+                'privatezone%d' % i, template, AvailabilityZone='zone%d' % i,
+                CidrBlock='10.0.%d.0/24' % (2 * i + 1), VpcId=Ref(vpc)
+            )
+        SecurityGroup(
+            'securitygroup', template, GroupDescription=Sub(
+                '${vpc} ${publiczone0.AvailabilityZone} ${AWS::Region}'
+            ),
+            VpcId=Ref(vpc),
+            DependsOn=['privatezone%d' % (zones - 1), 'vpcgatewayattachment']
+        )
+        template.add_output(Output('subnet', Value=Ref('publiczone0')))
+        template.add_output(
+            Output('cidr', Value=GetAtt('vpc', 'CidrBlock'))
+        )
+        return template
+
+    def _check(self, split):
+        """ Every reference in a part resolves within it, and parts only
+            use values from parts before them
+        """
+        for i, part in enumerate(split.parts):
+            template = part.template
+            names = set(template['Resources']) | set(
+                template.get('Parameters', {})
+            )
+            for edge in references(template):
+                self.assertTrue(
+                    edge.target in names or edge.target in PSEUDO,
+                    '%s in %s' % (edge.target, part.name)
+                )
+            for title, resource in template['Resources'].items():
+                depends = resource.get('DependsOn', [])
+                for target in [depends] if isinstance(depends, str) \
+                        else depends:
+                    self.assertIn(target, template['Resources'])
+            if split.parent is not None:
+                stack = split.parent['Resources'][part.name]
+                for edge in references(stack):
+                    if edge.kind == 'GetAtt':
+                        self.assertLess(
+                            [p.name for p in split.parts].index(edge.target),
+                            i
+                        )
+                self.assertEqual(
+                    set(template.get('Parameters', {})),
+                    set(stack['Properties'].get('Parameters', {}))
+                )
+
+    def test_small_template_is_one_stack(self):
+        template = self._create_test_document(2)
+        split = split_template(template, name='network')
+        self.assertEqual(1, len(split.parts))
+        self.assertEqual(0, split.cut)
+        self.assertEqual(
+            template.to_dict()['Resources'],
+            split.parts[0].template['Resources']
+        )
+        self.assertEqual(
+            {'Fn::GetAtt': ['network0', 'Outputs.subnet']},
+            split.parent['Outputs']['subnet']['Value']
+        )
+        self._check(split)
+
+    def test_nested_split(self):
+        template = self._create_test_document()
+        split = split_template(
+            template, name='network', max_resources=40, hub_degree=8,
+            template_url='https://bucket.s3.amazonaws.com/'
+        )
+        self._check(split)
+        self.assertEqual(
+            len(template.resources), sum(p.resources for p in split.parts)
+        )
+        for part in split.parts:
+            self.assertLessEqual(part.resources, 40)
+            self.assertEqual(
+                len(json.dumps(part.template, separators=(',', ':'))),
+                part.bytes
+            )
+        owner = {
+            title: part.name for part in split.parts
+            for title in part.template['Resources']
+        }
+        # each subnet stays with its route table, routes and nat gateway
+        for i in range(10):
+            self.assertEqual(
+                owner['publiczone%d' % i], owner['publiczone%droutetable' % i]
+            )
+            self.assertEqual(
+                owner['publiczone%d' % i], owner['publiczone%dnatgateway' % i]
+            )
+            self.assertEqual(
+                owner['privatezone%d' % i], owner['privatezone%droute' % i]
+            )
+        self.assertEqual('network0', owner['vpc'])
+        stack = split.parent['Resources'][owner['publiczone1']]
+        self.assertEqual(
+            'https://bucket.s3.amazonaws.com/%s.json' % owner['publiczone1'],
+            stack['Properties']['TemplateURL']
+        )
+        self.assertEqual(
+            {'Fn::GetAtt': ['network0', 'Outputs.vpc']},
+            stack['Properties']['Parameters']['vpc']
+        )
+        self.assertEqual(
+            {'Ref': 'Environment'},
+            stack['Properties']['Parameters']['Environment']
+        )
+        self.assertEqual(
+            {'Value': {'Ref': 'vpc'}},
+            split.parts[0].template['Outputs']['vpc']
+        )
+        self.assertIn('subnet', split.parent['Outputs'])
+        self.assertIn('cidr', split.parent['Outputs'])
+
+    def test_sub_and_depends_on_across_stacks(self):
+        for mode in ('nested', 'exports'):
+            split = split_template(
+                self._create_test_document(), mode=mode, max_resources=40,
+                hub_degree=8
+            )
+            self._check(split)
+            self.assertEqual(
+                'stack0', owner_stack(split, 'vpcgatewayattachment')
+            )
+            name = owner_stack(split, 'securitygroup')
+            part = [p for p in split.parts if p.name == name][0]
+            resource = part.template['Resources']['securitygroup']
+            self.assertEqual(['privatezone9'], resource['DependsOn'])
+            sub = resource['Properties']['GroupDescription']['Fn::Sub']
+            if mode == 'nested':
+                self.assertEqual(
+                    '${vpc} ${publiczone0.AvailabilityZone} ${AWS::Region}',
+                    sub
+                )
+                self.assertIn(
+                    'stack0', split.parent['Resources'][name]['DependsOn']
+                )
+            else:
+                self.assertEqual({'vpc': {'Fn::ImportValue': 'stack-vpc'}},
+                                 sub[1])
+
+    def test_exports_split(self):
+        split = split_template(
+            self._create_test_document(), name='network', mode='exports',
+            max_resources=40, hub_degree=8
+        )
+        self.assertIsNone(split.parent)
+        self._check(split)
+        base = split.parts[0].template
+        self.assertEqual(
+            {'Name': 'network-vpc'}, base['Outputs']['vpc']['Export']
+        )
+        part = split.parts[1].template
+        self.assertNotIn('vpc', part.get('Parameters', {}))
+        self.assertIn(
+            {'Fn::ImportValue': 'network-vpc'},
+            [
+                resource['Properties'].get('VpcId')
+                for resource in part['Resources'].values()
+            ]
+        )
+        stream = io.StringIO()
+        report(split, stream)
+        self.assertIn('network1', stream.getvalue())
+        self.assertIn(
+            '%d values passed between stacks' % split.cut, stream.getvalue()
+        )
+
+    def test_partition_cuts_large_components_in_dependency_order(self):
+        graph = {'r%d' % i: [] for i in range(10)}
+        for i in range(1, 10):
+            graph['r%d' % i].append(Edge('r%d' % (i - 1), None, 'Ref'))
+        sizes = {title: 1 for title in graph}
+        parts = partition(graph, sizes, max_resources=4)
+        self.assertEqual(
+            [['r0', 'r1', 'r2', 'r3'], ['r4', 'r5', 'r6', 'r7'],
+             ['r8', 'r9']],
+            parts
+        )
+        self.assertEqual(
+            [['r0', 'r1', 'r2'], ['r3', 'r4', 'r5'], ['r6', 'r7', 'r8'],
+             ['r9']],
+            partition(graph, sizes, max_bytes=3)
+        )
+        with self.assertRaises(ValueError):
+            partition(graph, dict(sizes, r5=10), max_bytes=5)
+
+    def test_partition_packs_components(self):
+        graph = {}
+        for i in range(6):
+            graph['a%d' % i] = []
+            graph['b%d' % i] = [Edge('a%d' % i, None, 'Ref')]
+        parts = partition(graph, {t: 1 for t in graph}, max_resources=5)
+        self.assertEqual([4, 4, 4], [len(part) for part in parts])
+        for part in parts:
+            for title in part:
+                if title.startswith('b'):
+                    self.assertIn('a' + title[1:], part)
+
+    def test_split_rejects_too_many_parameters(self):
+        resources = {
+            'r%d' % i: {'Type': 'AWS::SNS::Topic'} for i in range(350)
+        }
+        resources['sink'] = {
+            'Type': 'AWS::SNS::TopicPolicy',
+            'Properties': {
+                'PolicyDocument': {},
+                'Topics': [{'Ref': 'r%d' % i} for i in range(350)]
+            }
+        }
+        doc = {'Resources': resources}
+        with self.assertRaisesRegex(ValueError, 'sink alone'):
+            split_template(doc, max_resources=100)
+        split = split_template(doc, max_resources=400)
+        self.assertEqual(1, len(split.parts))
+
+    def test_split_keeps_parameters_and_outputs_within_limits(self):
+        resources = OrderedDict(
+            ('r%d' % i, {'Type': 'AWS::SNS::Topic'}) for i in range(300)
+        )
+        for sink, first, last in (('a', 0, 180), ('b', 120, 300)):
+            resources[sink] = {
+                'Type': 'AWS::SNS::TopicPolicy',
+                'Properties': {
+                    'PolicyDocument': {},
+                    'Topics': [
+                        {'Ref': 'r%d' % i} for i in range(first, last)
+                    ]
+                }
+            }
+        for mode in ('nested', 'exports'):
+            split = split_template(
+                {'Resources': resources}, mode=mode, max_resources=250
+            )
+            for part in split.parts:
+                self.assertLessEqual(part.parameters, 200)
+                self.assertLessEqual(part.outputs, 200)
+            self.assertEqual(
+                302, sum(part.resources for part in split.parts)
+            )
+            self._check(split)
+
+    def test_split_counts_passed_values_in_max_bytes(self):
+        template = self._create_test_document()
+        sizes = [
+            len(json.dumps(resource, separators=(',', ':')))
+            for resource in template.to_dict()['Resources'].values()
+        ]
+        max_bytes = sum(sizes) // 3
+        for mode in ('nested', 'exports'):
+            split = split_template(template, mode=mode, max_bytes=max_bytes)
+            self.assertLess(1, len(split.parts))
+            for part in split.parts:
+                self.assertLessEqual(
+                    len(json.dumps(part.template, separators=(',', ':'))),
+                    max_bytes
+                )
+
+    def test_passed_values_do_not_reuse_logical_ids(self):
+        doc = {
+            'Parameters': {'aTopicName': {'Type': 'String'}},
+            'Resources': OrderedDict([
+                ('a', {'Type': 'AWS::SNS::Topic'}),
+                ('b', {'Type': 'AWS::SNS::TopicPolicy', 'Properties': {
+                    'PolicyDocument': {'Id': {'Ref': 'aTopicName'}},
+                    'Topics': [
+                        {'Ref': 'a'}, {'Fn::GetAtt': ['a', 'TopicName']}
+                    ]
+                }}),
+            ]),
+            'Outputs': {'a': {'Value': {'Ref': 'a'}}},
+        }
+        split = split_template(doc, max_resources=1)
+        self.assertEqual(
+            ['aTopicName', 'a2', 'aTopicName2'],
+            list(split.parts[1].template['Parameters'])
+        )
+        self.assertEqual(
+            ['a', 'a2', 'aTopicName2'],
+            list(split.parts[0].template['Outputs'])
+        )
+        self.assertEqual(
+            [{'Ref': 'a2'}, {'Ref': 'aTopicName2'}],
+            split.parts[1].template['Resources']['b']['Properties']['Topics']
+        )
+        self._check(split)
+
+    def test_write_split(self):
+        directory = tempfile.mkdtemp()
+        try:
+            split = split_template(
+                self._create_test_document(), name='network',
+                max_resources=40, hub_degree=8
+            )
+            write_split(split, directory)
+            self.assertEqual(
+                ['network.json'] + sorted(
+                    part.name + '.json' for part in split.parts
+                ),
+                sorted(os.listdir(directory))
+            )
+        finally:
+            shutil.rmtree(directory)
+
+
+def owner_stack(split, title):
+    for part in split.parts:
+        if title in part.template['Resources']:
+            return part.name
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
+import re
 import unittest
-from tropopause.validators import valid_url
+from tropopause.validators import HOST_RE, PATH_RE, SCHEME_RE, valid_url
 
 
 class TestValidators(unittest.TestCase):
@@ -14,10 +15,38 @@ class TestValidators(unittest.TestCase):
             "http://www.example.com/test/",
             "http://www.example.com/test/test",
             "http://www.example.com/test.html",
+            "www.example.com/test",
+            "http://example.co.uk/a-b/c_d/e f.sh",
         ]
         for url in urls:
             self.assertEqual(url, valid_url(url))
 
+    def test_accepts_the_same_urls_as_the_original_pattern(self):
+        original = re.compile(
+            r'(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?$'
+        )
+        urls = [
+            "https://downloads.example.company/bootstrap.sh",
+            "https://repo.example.solutions/x.sh",
+            "https://bucket.s3.eu-west-1.amazonaws.com/boot.sh",
+            "http://example.io",
+            "example.com/a b/c_d.sh",
+            "http://10.0.0.1/boot.sh",
+            "http://www.example.com/boot.sh\n",
+            "http://www.example.com:8080/",
+            "http://www.example.com/?a=b",
+            "http://Example.com/",
+            "https://.com",
+            "http://ex.c0m",
+            "",
+        ]
+        for url in urls:
+            try:
+                accepted = valid_url(url) == url
+            except ValueError:
+                accepted = False
+            self.assertEqual(bool(original.match(url)), accepted, url)
+
     def test_invalid_path(self):
         url = "http://www.example.com/test!.html"
         with self.assertRaises(ValueError):
@@ -32,3 +61,34 @@ class TestValidators(unittest.TestCase):
         url = "ftp://www.example.com/test.html"
         with self.assertRaises(ValueError):
             valid_url(url)
+
+    def test_invalid_host(self):
+        for url in ["http://", "http://example", "http://example.c0m/"]:
+            with self.assertRaises(ValueError):
+                valid_url(url)
+
+    def test_error_message_includes_url(self):
+        url = "http://www.example!.com/"
+        with self.assertRaisesRegex(ValueError, "example!"):
+            valid_url(url)
+
+    def test_patterns_cannot_backtrack_polynomially(self):
+        """ Without groups and with at most one unbounded quantifier a
+            failing match backtracks at most once per character
+        """
+        for pattern in (SCHEME_RE, HOST_RE, PATH_RE):
+            atoms = re.sub(r'\[(\\.|[^\]])*\]', 'x', pattern.pattern)
+            self.assertNotIn('(', atoms, pattern.pattern)
+            self.assertLessEqual(
+                len(re.findall(r'[*+]|\{\d*,\}', atoms)), 1, pattern.pattern
+            )
+
+    def test_adversarial_urls(self):
+        for url in [
+            "http://www.example.com/" + "a/" * 50000 + "!",
+            "http://" + "a." * 50000 + "!",
+        ]:
+            with self.assertRaises(ValueError):
+                valid_url(url)
+        url = "http://" + "a" * 100000 + ".com"
+        self.assertEqual(url, valid_url(url))
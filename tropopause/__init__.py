@@ -1,25 +1,331 @@
 __version__ = "1.1.1"
+from collections import OrderedDict
+import json
+from weakref import WeakValueDictionary
+from troposphere import AWSHelperFn, MAX_RESOURCES
 from troposphere import Tags as upstreamTags
+from troposphere import encode_to_dict
+from troposphere import Template as upstreamTemplate
+
+
+class TagPair(object):
+    """ Immutable Key and Value, pairs of hashable values are interned so
+        every resource carrying the same tag shares one object. Interned
+        on the types as well, True, 1 and 1.0 are equal but serialize
+        differently
+    """
+    __slots__ = ['key', 'value', '__weakref__']
+    _interned = WeakValueDictionary()
+
+    def __new__(cls, key, value):
+        interned = (key, type(key), value, type(value))
+        try:
+            pair = cls._interned.get(interned)
+        except TypeError:
+            return cls._create(key, value)
+        if pair is None:
+            pair = cls._interned[interned] = cls._create(key, value)
+        return pair
+
+    @classmethod
+    def _create(cls, key, value):
+        pair = object.__new__(cls)
+        object.__setattr__(pair, 'key', key)
+        object.__setattr__(pair, 'value', value)
+        return pair
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TagPair is immutable')
+
+    def __reduce__(self):
+        return (TagPair, (self.key, self.value))
+
+    def __repr__(self):
+        return 'TagPair(%r, %r)' % (self.key, self.value)
+
+
+class TagSet(object):
+    """ Frozen, ordered TagPairs with unique Keys. Interned on its pairs,
+        so equal sets built separately are the same object and resources
+        share them by reference
+    """
+    __slots__ = ['pairs', '__weakref__']
+    _interned = WeakValueDictionary()
+    _merged = WeakValueDictionary()
+
+    def __new__(cls, pairs=()):
+        pairs = tuple(pairs)
+        tagset = cls._interned.get(pairs)
+        if tagset is None:
+            tagset = object.__new__(cls)
+            object.__setattr__(tagset, 'pairs', pairs)
+            cls._interned[pairs] = tagset
+        return tagset
+
+    @classmethod
+    def from_items(cls, items):
+        """ TagSet from (Key, Value) items, a repeated Key keeps its first
+            position and its last Value
+        """
+        merged = OrderedDict()
+        for key, value in items:
+            merged[key] = value
+        return cls(TagPair(key, value) for key, value in merged.items())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TagSet is immutable')
+
+    def __reduce__(self):
+        return (TagSet, (self.pairs,))
+
+    def __add__(self, other):
+        """ Merge with precedence to other, new Keys are appended. Merges
+            are remembered while their result is alive, so merging the
+            same VPC and tier tags for every subnet is done once. A result
+            that is one of the operands is not remembered, the key would
+            keep it alive for good
+        """
+        if not other.pairs:
+            return self
+        if not self.pairs:
+            return other
+        tagset = TagSet._merged.get((self, other))
+        if tagset is None:
+            right = {pair.key: pair for pair in other.pairs}
+            merged = [right.pop(pair.key, pair) for pair in self.pairs]
+            merged.extend(pair for pair in other.pairs if pair.key in right)
+            tagset = TagSet(merged)
+            if tagset is not self and tagset is not other:
+                TagSet._merged[(self, other)] = tagset
+        return tagset
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def items(self):
+        return [(pair.key, pair.value) for pair in self.pairs]
+
+    def __repr__(self):
+        return 'TagSet(%r)' % (self.pairs,)
+
+
+class _TagItem(dict):
+    """ One Key and Value read from Tags.tags, changing it in place would
+        be lost so it raises instead. Copies are plain dicts
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            'Tags.tags items are read only, replace the item in the list'
+        )
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class _TagList(list):
+    """ Tags.tags as read, changes to the list are written back to the
+        Tags it was read from. Copies are plain lists
+    """
+    def __init__(self, owner, tags):
+        super(_TagList, self).__init__(tags)
+        self._owner = owner
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _writes_back(method):
+    def mutate(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._owner.tags = self
+        return result
+    mutate.__name__ = method.__name__
+    return mutate
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+              'clear', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort'):
+    setattr(_TagList, _name, _writes_back(getattr(list, _name)))
+del _name
 
 
 class Tags(upstreamTags):
-    """ extended upstream to prevent tag duplication """
+    """ extended upstream to prevent tag duplication, tags are held in a
+        shared TagSet and only turned into the CloudFormation list form
+        when read or serialized. Changes to the list read from tags are
+        written back, its Key/Value dicts are read only
+    """
     def __init__(self, *args, **kwargs):
-        super(Tags, self).__init__(*args, **kwargs)
-        self.tags = self._dedupe(self.tags)
+        if not args:
+            tag_dict = kwargs
+        elif len(args) == 1 and isinstance(args[0], TagSet):
+            self.tagset = args[0]
+            return
+        elif len(args) == 1 and isinstance(args[0], dict):
+            tag_dict = args[0]
+        else:
+            raise TypeError
+        self.tagset = TagSet(
+            TagPair(key, value) for key, value in sorted(tag_dict.items())
+        )
+
+    @property
+    def tags(self):
+        return _TagList(self, (
+            _TagItem(Key=pair.key, Value=pair.value) for pair in self.tagset
+        ))
+
+    @tags.setter
+    def tags(self, tags):
+        self.tagset = TagSet.from_items(
+            (tag['Key'], tag['Value']) for tag in tags
+        )
 
     def __add__(self, newtags):
-        newtags.tags = self._dedupe(self.tags + newtags.tags)
+        if isinstance(newtags, Tags):
+            newtags.tagset = self.tagset + newtags.tagset
+        else:
+            newtags.tags = [
+                {'Key': key, 'Value': value}
+                for key, value in TagSet.from_items(self.tagset.items() + [
+                    (tag['Key'], tag['Value']) for tag in newtags.tags
+                ]).items()
+            ]
         return newtags
 
-    def _dedupe(self, tags):
-        interim = {}
-        result = []
-        for tag in self.tags + tags:
-            interim[tag['Key']] = tag['Value']
-        for key, val in interim.items():
-            result.append({
-                'Key': key,
-                'Value': val
-            })
+    def to_dict(self):
+        return encode_to_dict(self.tags)
+
+
+class Frozen(AWSHelperFn):
+    """ Read only value for sharing between resources, encoded once and
+        held as JSON. data and to_dict return new dicts and lists, so
+        changes to them never reach other resources
+    """
+    def __init__(self, value):
+        object.__setattr__(
+            self, 'json',
+            json.dumps(encode_to_dict(value), separators=(',', ':'))
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Frozen is immutable')
+
+    @property
+    def data(self):
+        return json.loads(self.json, object_pairs_hook=OrderedDict)
+
+    def to_dict(self):
+        return self.data
+
+    def __repr__(self):
+        return 'Frozen(%s)' % self.json
+
+
+class Template(upstreamTemplate):
+    """ extended upstream to index resources by type as they are added,
+        and Route Tables by the subnet tier they were created for.
+        max_resources replaces the troposphere limit, None removes it for
+        templates that are split before they are deployed
+    """
+    def __init__(self, *args, max_resources=MAX_RESOURCES, **kwargs):
+        super(Template, self).__init__(*args, **kwargs)
+        self.index = {}
+        self.route_tables = {}
+        self.route_table_callbacks = []
+        self.max_resources = max_resources
+
+    def add_route_table(self, tier, route_table):
+        """ Track route_table under tier and pass both to every callable
+            in route_table_callbacks
+        """
+        self.route_tables.setdefault(
+            tier, OrderedDict()
+        )[route_table.title] = route_table
+        for callback in self.route_table_callbacks:
+            callback(tier, route_table)
+
+    def add_resource(self, resource):
+        if self.max_resources is not None and \
+                len(self.resources) >= self.max_resources:
+            raise ValueError(
+                'Maximum number of resources %d reached' % self.max_resources
+            )
+        result = self._update(self.resources, resource)
+        for item in resource if isinstance(resource, list) else [resource]:
+            self.index.setdefault(
+                getattr(item, 'resource_type', None), OrderedDict()
+            )[item.title] = item
         return result
+
+
+def resources_of_type(template, resource_type):
+    """ Title to resource mapping for a single CloudFormation type,
+        upstream Templates are not indexed so they are scanned instead
+    """
+    if isinstance(template, Template):
+        return template.index.get(resource_type, OrderedDict())
+    return OrderedDict(
+        (title, resource) for title, resource in template.resources.items()
+        if getattr(resource, 'resource_type', None) == resource_type
+    )
+
+
+_lazy = {
+    'AutoScalingGroup': 'tropopause.autoscaling',
+    'LaunchConfigurationRPM': 'tropopause.autoscaling',
+    'InitConfigFromHTTP': 'tropopause.cloudformation',
+    'InitConfigFromS3': 'tropopause.cloudformation',
+    'InternetGatewayVPC': 'tropopause.ec2',
+    'GatewayVPCEndpoint': 'tropopause.ec2',
+    'PublicSubnet': 'tropopause.ec2',
+    'PrivateSubnet': 'tropopause.ec2',
+    'SecureSubnet': 'tropopause.ec2',
+    'RoutedVPCPeeringConnection': 'tropopause.ec2',
+    'SecurityGroupFromYaml': 'tropopause.ec2',
+    'Tier': 'tropopause.ec2',
+    'build_subnet_tiers': 'tropopause.ec2',
+    'build_vpc_peering': 'tropopause.ec2',
+    'check_cidr_overlaps': 'tropopause.ec2',
+    'compile_rules': 'tropopause.ec2',
+    'find_vpc': 'tropopause.ec2',
+    'route_tables': 'tropopause.ec2',
+    'vpc_tags': 'tropopause.ec2',
+    'SecureLoadBalancerWithListener': 'tropopause.elasticloadbalancingv2',
+    'RoleFromYaml': 'tropopause.iam',
+    'PolicyFromYaml': 'tropopause.iam',
+    'PolicyTypeFromYaml': 'tropopause.iam',
+    'cycles': 'tropopause.graph',
+    'dangling': 'tropopause.graph',
+    'dependency_graph': 'tropopause.graph',
+    'order': 'tropopause.graph',
+    'validate': 'tropopause.graph',
+    'load_yaml': 'tropopause.loader',
+    'preload': 'tropopause.loader',
+    'Profile': 'tropopause.profiling',
+    'dump_json': 'tropopause.serializer',
+    'dump_yaml': 'tropopause.serializer',
+}
+
+
+def __getattr__(name):
+    """ Import the submodule behind a class on first use (Python 3.7+), so
+        only the troposphere modules a script uses are imported
+    """
+    if name not in _lazy:
+        raise AttributeError(
+            "module 'tropopause' has no attribute '%s'" % name
+        )
+    value = getattr(__import__(_lazy[name], fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -0,0 +1,4 @@
+import sys
+from tropopause.cli import main
+
+sys.exit(main())
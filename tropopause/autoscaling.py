@@ -1,83 +1,155 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from functools import lru_cache
 from troposphere import Tags as baseTags
-from troposphere import Base64, Join, Ref
+from troposphere import AWSHelperFn, Base64, Join, Ref, encode_to_dict
 from troposphere.autoscaling import Tag, Tags
 from troposphere.autoscaling import AutoScalingGroup as upstreamASG
 from troposphere.autoscaling import LaunchConfiguration
+from tropopause import Frozen, TagSet
+from tropopause.profiling import profiled
 
 
+CFN_SIGNAL = Join(
+    '',
+    [
+        'INSTANCE=$(curl http://169.254.169.254/latest/meta-data/instance-id 2> /dev/null)',  # noqa
+        ' && ',
+        'QUERY=AutoScalingInstances[?InstanceId==\\\'$INSTANCE\\\'].[AutoScalingGroupName]',  # noqa
+        ' && ',
+        'RESOURCE=$(/usr/bin/aws --region=',
+        Ref('AWS::Region'),
+        ' ',
+        'autoscaling describe-auto-scaling-instances --query=$QUERY --output=text 2> /dev/null) ',  # noqa
+        ' && ',
+        '/opt/aws/bin/cfn-signal -e $? ',
+        '--stack ',
+        Ref('AWS::StackName'),
+        ' ',
+        '--resource ',
+        '$RESOURCE ',
+        ' ',
+        '--region ',
+        Ref('AWS::Region'),
+        '\n'
+    ]
+)
+
+
+@lru_cache(maxsize=128)
+def generic_user_data_rpm(name):
+    """ Read only UserData for a resource name, shared between
+        LaunchConfigurations, the last 128 names are kept
+    """
+    return Frozen(Base64(Join(
+        ' ',
+        [
+            '#!/bin/bash -xe\n',
+            'yum install -y aws-cfn-bootstrap aws-cli\n',
+            '/opt/aws/bin/cfn-init -v ',
+            '--stack ',
+            Ref('AWS::StackName'),
+            '--resource',
+            name,
+            '--region',
+            Ref('AWS::Region'),
+            '\n',
+            CFN_SIGNAL
+        ]
+    )))
+
+
+@profiled
 def AddGenericUserDataRPM(func):
     """ Add sensible cloudinit into UserData for RPM based systems """
     def wrapper(*args, **kwargs):
         if 'UserData' not in kwargs:
-            name = args[1]
-            cfn_signal = Join(
-                '',
-                [
-                    'INSTANCE=$(curl http://169.254.169.254/latest/meta-data/instance-id 2> /dev/null)',  # noqa
-                    ' && ',
-                    'QUERY=AutoScalingInstances[?InstanceId==\\\'$INSTANCE\\\'].[AutoScalingGroupName]',  # noqa
-                    ' && ',
-                    'RESOURCE=$(/usr/bin/aws --region=',
-                    Ref('AWS::Region'),
-                    ' ',
-                    'autoscaling describe-auto-scaling-instances --query=$QUERY --output=text 2> /dev/null) ',  # noqa
-                    ' && ',
-                    '/opt/aws/bin/cfn-signal -e $? ',
-                    '--stack ',
-                    Ref('AWS::StackName'),
-                    ' ',
-                    '--resource ',
-                    '$RESOURCE ',
-                    ' ',
-                    '--region ',
-                    Ref('AWS::Region'),
-                    '\n'
-                ]
-            )
-            kwargs['UserData'] = Base64(Join(
-                ' ',
-                [
-                    '#!/bin/bash -xe\n',
-                    'yum install -y aws-cfn-bootstrap aws-cli\n',
-                    '/opt/aws/bin/cfn-init -v ',
-                    '--stack ',
-                    Ref('AWS::StackName'),
-                    '--resource',
-                    name,
-                    '--region',
-                    Ref('AWS::Region'),
-                    '\n',
-                    cfn_signal
-                ]
-            ))
+            kwargs['UserData'] = generic_user_data_rpm(args[1])
         return(func(*args, **kwargs))
     return wrapper
 
 
+class PropagatedTags(AWSHelperFn, Sequence):
+    """ AutoScalingGroup Tags held as shared TagSets, one of Values and one
+        of PropagateAtLaunch where it is not True. A read only sequence of
+        Tag objects, created when it is read, dicts are only built when it
+        is serialized
+    """
+    def __init__(self, tagset, propagate=TagSet()):
+        self.tagset = tagset
+        self.propagate = propagate
+
+    def _items(self):
+        propagate = dict(self.propagate.items())
+        return [
+            (pair.key, pair.value, propagate.get(pair.key, True))
+            for pair in self.tagset
+        ]
+
+    def __len__(self):
+        return len(self.tagset)
+
+    def __getitem__(self, index):
+        return [Tag(*item) for item in self._items()][index]
+
+    def __iter__(self):
+        return iter([Tag(*item) for item in self._items()])
+
+    def __eq__(self, other):
+        if not isinstance(other, PropagatedTags):
+            return NotImplemented
+        return self.tagset is other.tagset and \
+            self.propagate is other.propagate
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'PropagatedTags(%r, %r)' % (self.tagset, self.propagate)
+
+    def to_dict(self):
+        return encode_to_dict([
+            {'Key': key, 'Value': value, 'PropagateAtLaunch': propagate}
+            for key, value, propagate in self._items()
+        ])
+
+
+@profiled
 def InheritAndCastTags(func):
-    """ Make sure tags correctly have PropagateAtLaunch """
+    """ Make sure tags correctly have PropagateAtLaunch, tags are inherited
+        from Subnets in VPCZoneIdentifier order, the first Subnet to set a
+        Key wins and explicit AutoScalingGroup Tags override all of them
+    """
     def wrapper(*args, **kwargs):
-        result = []
+        result = OrderedDict()
         if 'VPCZoneIdentifier' in kwargs:
             for ref in kwargs['VPCZoneIdentifier']:
                 if isinstance(ref, Ref):
-                    subnet = args[-1].resources[ref.data['Ref']]
-                    if 'Tags' in subnet.properties:
-                        append = True
+                    subnet = args[-1].resources.get(ref.data['Ref'])
+                    if subnet is not None and 'Tags' in subnet.properties:
                         for tag in subnet.properties['Tags'].tags:
-                            for r_tag in result:
-                                if r_tag.data['Key'] == tag['Key']:
-                                    append = False
-                            if append is True:
-                                result.append(Tag(
-                                    tag['Key'], tag['Value'], True)
-                                             )
+                            if tag['Key'] not in result:
+                                result[tag['Key']] = (tag['Value'], True)
         if 'Tags' in kwargs and isinstance(kwargs['Tags'], baseTags):
             for tag in kwargs['Tags'].tags:
-                result.append(Tag(tag['Key'], tag['Value'], True))
+                result[tag['Key']] = (tag['Value'], True)
         if 'Tags' in kwargs and isinstance(kwargs['Tags'], Tags):
-            result.append(kwargs['Tags'])
-        kwargs['Tags'] = result
+            for tag in kwargs['Tags'].tags:
+                result[tag['Key']] = (tag['Value'], tag['PropagateAtLaunch'])
+        if 'Tags' in kwargs and isinstance(kwargs['Tags'], list):
+            for tag in kwargs['Tags']:
+                if isinstance(tag, Tag):
+                    result[tag.data['Key']] = (
+                        tag.data['Value'], tag.data['PropagateAtLaunch']
+                    )
+        kwargs['Tags'] = PropagatedTags(
+            TagSet.from_items(
+                (key, value) for key, (value, _) in result.items()
+            ),
+            TagSet.from_items(
+                (key, propagate) for key, (_, propagate) in result.items()
+                if propagate is not True
+            )
+        )
         return func(*args, **kwargs)
     return wrapper
 
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import tropopause
+from tropopause.loader import CacheInfo
+
+# the layout of cache entries, part of every key
+FORMAT_VERSION = 1
+
+
+class BuildCache(object):
+    """ Directory of JSON blobs holding derived resource properties
+        between builds, keyed on a hash of whatever they were derived from.
+        Entries are evicted least recently used first once there are more
+        than maxsize or they take more than max_bytes. Used as a context
+        manager, the active cache is read by the objects that support it.
+        Safe to share between processes, a lost write is only a miss
+    """
+    active = None
+
+    def __init__(self, directory, maxsize=1024, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.entries = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = BuildCache.active
+        BuildCache.active = self
+        return self
+
+    def __exit__(self, *exc):
+        BuildCache.active = self.previous
+        return False
+
+    def _scan(self):
+        """ Entries and their sizes, least recently used first """
+        if self.entries is None:
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    try:
+                        stat = os.stat(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_mtime_ns, name, stat.st_size))
+            self.entries = OrderedDict(
+                (name, size) for _, name, size in sorted(found)
+            )
+            self.bytes = sum(self.entries.values())
+        return self.entries
+
+    def key(self, *parts, paths=()):
+        """ Hash of the tropopause version, FORMAT_VERSION, the JSON form
+            of parts and the contents of every path. Callers include a
+            version of their own in parts, bumped whenever what they derive
+            from the same input changes
+        """
+        digest = hashlib.sha256(tropopause.__version__.encode())
+        digest.update(str(FORMAT_VERSION).encode())
+        digest.update(json.dumps(parts, sort_keys=True).encode())
+        for path in paths:
+            with open(path, 'rb') as stream:
+                digest.update(hashlib.sha256(stream.read()).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        entries = self._scan()
+        name = key + '.json'
+        try:
+            with open(os.path.join(self.directory, name)) as stream:
+                value = json.load(stream)
+            os.utime(os.path.join(self.directory, name))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if name in entries:
+            entries.move_to_end(name)
+        return value
+
+    def set(self, key, value):
+        entries = self._scan()
+        name = key + '.json'
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as stream:
+            json.dump(value, stream, sort_keys=True)
+            size = stream.tell()
+        os.replace(path, os.path.join(self.directory, name))
+        self.bytes += size - entries.pop(name, 0)
+        entries[name] = size
+        while entries and (
+            len(entries) > self.maxsize or self.bytes > self.max_bytes
+        ):
+            name, size = entries.popitem(last=False)
+            self.bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def cache_info(self):
+        return CacheInfo(
+            self.hits, self.misses, self.maxsize, len(self._scan())
+        )
+
+    def cache_clear(self):
+        for name in self._scan():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        self.entries.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,234 @@
+""" Build one template per combination of parameters from a stack
+    definition, in parallel, skipping stacks whose inputs are unchanged
+
+    tropopause network.py -p environment=dev,prod -p region=us-east-1 -o out
+
+The definition is a Python file or module with a build(**parameters)
+function returning a Template.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import argparse
+import hashlib
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import re
+import sys
+import tropopause
+from tropopause import graph
+from tropopause.cache import BuildCache
+from tropopause.loader import documents, load_yaml
+from tropopause.serializer import dump_json, dump_yaml
+
+MANIFEST = 'manifest.json'
+_modules = {}
+
+
+def _import_file(name, path):
+    if hasattr(importlib.util, 'module_from_spec'):
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    # Python 3.4
+    return importlib.machinery.SourceFileLoader(name, path).load_module()
+
+
+def load_definition(definition):
+    """ Import a stack definition from a file path or a module name.
+        Returns the module and the YAML files read while importing it,
+        modules are imported once per process
+    """
+    if definition not in _modules:
+        with documents.recording() as paths:
+            if os.path.isfile(definition):
+                name = os.path.splitext(os.path.basename(definition))[0]
+                module = _import_file(name, definition)
+            else:
+                module = importlib.import_module(definition)
+        _modules[definition] = (module, frozenset(paths))
+    return _modules[definition]
+
+
+def definition_source(definition):
+    if os.path.isfile(definition):
+        path = definition
+    else:
+        path = importlib.util.find_spec(definition).origin
+    with open(path, 'rb') as stream:
+        return stream.read()
+
+
+def expand_matrix(matrix):
+    """ Every combination of the parameter values, in the given order """
+    keys = list(matrix)
+    return [
+        OrderedDict(zip(keys, values))
+        for values in product(*(
+            matrix[key] if isinstance(matrix[key], list) else [matrix[key]]
+            for key in keys
+        ))
+    ]
+
+
+def stack_name(definition, parameters):
+    if definition.endswith('.py') or os.sep in definition:
+        name = os.path.splitext(os.path.basename(definition))[0]
+    else:
+        name = definition.rsplit('.', 1)[-1]
+    return '-'.join([name] + [
+        re.sub(r'[^\w.-]', '_', str(value)) for value in parameters.values()
+    ])
+
+
+def fingerprint(source, parameters, paths):
+    """ Hash of everything a stack is built from: tropopause itself, the
+        definition source, the parameters and the YAML files it loaded
+    """
+    digest = hashlib.sha256()
+    digest.update(tropopause.__version__.encode())
+    digest.update(source)
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    for path in sorted(paths):
+        digest.update(path.encode())
+        try:
+            with open(path, 'rb') as stream:
+                digest.update(stream.read())
+        except OSError:
+            digest.update(b'\0missing')
+    return digest.hexdigest()
+
+
+def build_stack(definition, parameters, path, output_format, cache=None,
+                validate=False):
+    """ Build and write one stack, returns the YAML files it loaded,
+        including those its definition read when it was imported.
+        validate checks the references between resources first
+    """
+    module, imported = load_definition(definition)
+    with documents.recording() as paths:
+        if cache is None:
+            template = module.build(**parameters)
+        else:
+            with BuildCache(cache):
+                template = module.build(**parameters)
+    if validate:
+        graph.validate(template)
+    with open(path, 'w') as stream:
+        if output_format == 'yaml':
+            dump_yaml(template, stream)
+        else:
+            dump_json(template, stream)
+    return sorted(paths | imported)
+
+
+def build_all(definition, matrix, output, jobs=None, output_format='json',
+              force=False, log=None, cache=None, validate=False):
+    """ Build every stack in the matrix into output, returns the names of
+        the stacks built and skipped. cache is a BuildCache directory,
+        validate fails stacks with dangling references or cycles. Raises
+        ValueError when two parameter sets give the same stack name
+    """
+    log = log or (lambda message: None)
+    os.makedirs(output, exist_ok=True)
+    manifest_path = os.path.join(output, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as stream:
+            manifest = json.load(stream)
+    source = definition_source(definition)
+    stacks = OrderedDict()
+    for parameters in expand_matrix(matrix):
+        name = stack_name(definition, parameters)
+        if name in stacks:
+            raise ValueError('%s and %s are both named %s' % (
+                dict(stacks[name]), dict(parameters), name
+            ))
+        stacks[name] = parameters
+    built, skipped, failed, futures = [], [], [], OrderedDict()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for name, parameters in stacks.items():
+            path = os.path.join(output, name + '.' + output_format)
+            entry = manifest.get(name)
+            if not force and entry is not None and os.path.exists(path) \
+                    and entry['hash'] == fingerprint(
+                        source, parameters, entry['files']
+                    ):
+                skipped.append(name)
+                log('skipped %s' % name)
+                continue
+            futures[name] = (parameters, executor.submit(
+                build_stack, definition, parameters, path, output_format,
+                cache, validate
+            ))
+        for name, (parameters, future) in futures.items():
+            try:
+                files = future.result()
+            except Exception as e:
+                manifest.pop(name, None)
+                failed.append(name)
+                log('failed %s: %s' % (name, e))
+                continue
+            manifest[name] = {
+                'hash': fingerprint(source, parameters, files),
+                'files': files,
+            }
+            built.append(name)
+            log('built %s' % name)
+    with open(manifest_path, 'w') as stream:
+        json.dump(manifest, stream, indent=4, sort_keys=True)
+    if failed:
+        raise RuntimeError('failed to build %s' % ', '.join(failed))
+    return built, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tropopause',
+        description=__doc__.split('\n')[0],
+    )
+    parser.add_argument('definition', help='stack definition file or module')
+    parser.add_argument(
+        '-p', '--parameter', action='append', default=[],
+        metavar='KEY=VALUE[,VALUE]', help='parameter values to build'
+    )
+    parser.add_argument(
+        '-m', '--matrix', help='YAML file mapping parameters to value lists'
+    )
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    parser.add_argument(
+        '-j', '--jobs', type=int, help='processes, defaults to cpu count'
+    )
+    parser.add_argument('-f', '--format', choices=['json', 'yaml'],
+                        default='json')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild unchanged stacks')
+    parser.add_argument('--cache', metavar='DIRECTORY',
+                        help='reuse derived resources from this directory')
+    parser.add_argument('--validate', action='store_true',
+                        help='fail stacks with dangling references or cycles')
+    args = parser.parse_args(argv)
+    matrix = OrderedDict()
+    if args.matrix:
+        matrix.update(load_yaml(args.matrix))
+    for parameter in args.parameter:
+        key, _, values = parameter.partition('=')
+        matrix[key] = values.split(',')
+    sys.path.insert(0, os.getcwd())
+    try:
+        build_all(
+            args.definition, matrix, args.output, args.jobs, args.format,
+            args.force, print, args.cache, args.validate
+        )
+    except (RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,103 +1,271 @@
+from functools import lru_cache
+import hashlib
+import re
+from shlex import quote
 from troposphere import Join, Ref
 from troposphere.cloudformation import InitConfig
 from troposphere.cloudformation import InitFile, InitFiles
 from troposphere.cloudformation import InitService, InitServices
+from tropopause import Frozen
 from tropopause.validators import valid_url
+from tropopause.profiling import profiled
 
 
+def _cfn_hup_files():
+    return {
+        '/etc/cfn/cfn-hup.conf': InitFile(
+            content=Join('', [
+                    '[main]\n',
+                    'stack=',
+                    Ref('AWS::StackId'),
+                    '\n',
+                    'region=',
+                    Ref('AWS::Region'),
+                    '\n'
+                ]
+            ),
+            mode='00400',
+            owner='root',
+            group='root'
+        ),
+        '/etc/cfn/hooks.d/cfn-auto-reloader.conf': InitFile(
+            content=Join('', [
+                    '[cfn-auto-reloader-hook]\n',
+                    'triggers=post.update\n',
+                    'path=Resources.ContainerInstances',
+                    '.Metadata.AWS::CloudFormation::Init\n',
+                    'action=/opt/aws/bin/cfn-init -v ',
+                    '--stack ',
+                    Ref('AWS::StackName'),
+                    ' ',
+                    '--resource ContainerInstances ',
+                    '--region ',
+                    Ref('AWS::Region'),
+                    '\n',
+                    'runas=root\n'
+                ]
+            ),
+            mode='00400',
+            owner='root',
+            group='root'
+        )
+    }
+
+
+@lru_cache(maxsize=1)
+def cfn_hup_files():
+    """ Read only cfn-hup conf files, built once and shared """
+    return Frozen(InitFiles(_cfn_hup_files()))
+
+
+FETCH_PATH = '/usr/local/bin/tropopause-fetch'
+CACHE_DIRECTORY = '/var/cache/tropopause'
+SHA256_RE = re.compile(r'[0-9a-f]{64}')
+
+FETCH_SCRIPT = r"""#!/bin/sh
+# tropopause-fetch http|s3 URL CACHE [SHA256] [RETRIES] [SPLAY]
+# Keep a copy of URL at CACHE. A copy matching SHA256 is used without
+# asking the origin, otherwise it is revalidated by ETag. Failed fetches
+# are retried up to RETRIES times with jittered exponential backoff,
+# falling back to a cached copy matching SHA256, the first fetch on an
+# instance waits up to SPLAY seconds so a scale-out is spread out
+source=$1 url=$2 cache=$3 sha256=$4 retries=${5:-5} splay=${6:-0}
+etag=
+
+random() {
+    awk -v max="$1" -v seed="$$$(date +%N)" \
+        'BEGIN { srand(seed % 2147483647); print int(rand() * (max + 1)) }'
+}
+
+verify() {
+    [ -z "$sha256" ] || echo "$sha256  $1" | sha256sum -c --status
+}
+
+store() {
+    if ! verify "$cache.tmp"; then
+        echo "tropopause-fetch: $url does not match $sha256" >&2
+        rm -f "$cache.tmp"
+        return 1
+    fi
+    mv -f "$cache.tmp" "$cache" && printf '%s\n' "$etag" > "$cache.etag"
+}
+
+fetch_http() {
+    if [ -s "$cache" ] && [ -s "$cache.etag" ]; then
+        set -- -H "If-None-Match: $(cat "$cache.etag")"
+    else
+        set --
+    fi
+    status=$(curl -sS -o "$cache.tmp" -D "$cache.headers" \
+        -w '%{http_code}' "$@" "$url") || return 1
+    etag=$(sed -n 's/^[Ee][Tt][Aa][Gg]: *//p' "$cache.headers" | tr -d '\r')
+    rm -f "$cache.headers"
+    case $status in
+        304) rm -f "$cache.tmp"; return 0 ;;
+        200) store ;;
+        *) echo "tropopause-fetch: $url returned $status" >&2; return 1 ;;
+    esac
+}
+
+fetch_s3() {
+    path=${url#s3://}
+    etag=$(aws s3api head-object --bucket "${path%%/*}" --key "${path#*/}" \
+        --query ETag --output text) || return 1
+    if [ -s "$cache" ] && [ "$etag" = "$(cat "$cache.etag" 2>/dev/null)" ]
+    then
+        return 0
+    fi
+    aws s3 cp --quiet "$url" "$cache.tmp" && store
+}
+
+if [ -n "$sha256" ] && [ -s "$cache" ] && verify "$cache"; then
+    exit 0
+fi
+mkdir -p "$(dirname "$cache")"
+if [ ! -s "$cache" ] && [ "$splay" -gt 0 ]; then
+    sleep "$(random "$splay")"
+fi
+attempt=0
+until "fetch_$source"; do
+    if [ "$attempt" -ge "$retries" ]; then
+        if [ -s "$cache" ] && verify "$cache"; then
+            echo "tropopause-fetch: using the cached copy of $url" >&2
+            exit 0
+        fi
+        exit 1
+    fi
+    attempt=$((attempt + 1))
+    sleep "$(random $((1 << attempt)))"
+done
+"""
+
+
+@lru_cache(maxsize=1)
+def fetch_files():
+    """ Read only cfn_hup_files with the tropopause-fetch script, built
+        once and shared
+    """
+    files = _cfn_hup_files()
+    files[FETCH_PATH] = InitFile(
+        content=FETCH_SCRIPT,
+        mode='000755',
+        owner='root',
+        group='root'
+    )
+    return Frozen(InitFiles(files))
+
+
+def fetch_command(source, url, cache=True, sha256=None, retries=5, splay=0):
+    """ Shell command copying url to a local cache with tropopause-fetch
+        and running it. cache is the path of the copy, True picks one
+        under CACHE_DIRECTORY from the url. sha256 pins the content,
+        failed fetches are tried again up to retries times
+    """
+    if cache is True:
+        cache = '%s/%s.sh' % (
+            CACHE_DIRECTORY, hashlib.sha256(url.encode()).hexdigest()[:16]
+        )
+    if sha256 is not None and not SHA256_RE.fullmatch(sha256):
+        raise ValueError('%s is not a sha256 hex digest' % sha256)
+    if int(retries) < 0 or int(splay) < 0:
+        raise ValueError('retries and splay must not be negative')
+    return '%s %s %s %s %s %d %d && /bin/sh %s' % (
+        FETCH_PATH, source, quote(url), quote(cache), quote(sha256 or ''),
+        int(retries), int(splay), quote(cache)
+    )
+
+
+def _fetch_kwargs(kwargs):
+    """ Pop the caching keyword arguments, None when there are none or
+        cache is False, which cannot be combined with the others
+    """
+    options = {
+        key: kwargs.pop(key) for key in ('cache', 'sha256', 'retries', 'splay')
+        if key in kwargs
+    }
+    if options.get('cache') is False:
+        if len(options) > 1:
+            raise ValueError(
+                'cache=False cannot be combined with sha256, retries or splay'
+            )
+        return None
+    if not options:
+        return None
+    options.setdefault('cache', True)
+    return options
+
+
+@lru_cache(maxsize=1)
+def cfn_hup_services():
+    """ Read only cfn-hup service, built once and shared """
+    return Frozen(InitServices(
+        {
+            'cfn-hup': InitService(
+                ensureRunning='true',
+                enabled='true',
+                files=[
+                    '/etc/cfn/cfn-hup.conf',
+                    '/etc/cfn/hooks.d/cfn-auto-reloader.conf'
+                ]
+            )
+        }
+    ))
+
+
+@profiled
 def FilesDecorator(func):
     """ Create the conf files for cfn-hup """
     def wrapper(*args, **kwargs):
-        kwargs['files'] = InitFiles(
-            {
-                '/etc/cfn/cfn-hup.conf': InitFile(
-                    content=Join('', [
-                            '[main]\n',
-                            'stack=',
-                            Ref('AWS::StackId'),
-                            '\n',
-                            'region=',
-                            Ref('AWS::Region'),
-                            '\n'
-                        ]
-                    ),
-                    mode='00400',
-                    owner='root',
-                    group='root'
-                ),
-                '/etc/cfn/hooks.d/cfn-auto-reloader.conf': InitFile(
-                    content=Join('', [
-                            '[cfn-auto-reloader-hook]\n',
-                            'triggers=post.update\n',
-                            'path=Resources.ContainerInstances',
-                            '.Metadata.AWS::CloudFormation::Init\n',
-                            'action=/opt/aws/bin/cfn-init -v ',
-                            '--stack ',
-                            Ref('AWS::StackName'),
-                            ' ',
-                            '--resource ContainerInstances ',
-                            '--region ',
-                            Ref('AWS::Region'),
-                            '\n',
-                            'runas=root\n'
-                        ]
-                    ),
-                    mode='00400',
-                    owner='root',
-                    group='root'
-                )
-            }
-        )
+        kwargs['files'] = cfn_hup_files()
         return(func(*args, **kwargs))
     return wrapper
 
 
+@profiled
 def ServicesDecorator(func):
     """ Make sure cfn-hup is running """
     def wrapper(*args, **kwargs):
-        kwargs['services'] = {
-            'sysvinit': InitServices(
-                {
-                    'cfn-hup': InitService(
-                        ensureRunning='true',
-                        enabled='true',
-                        files=[
-                            '/etc/cfn/cfn-hup.conf',
-                            '/etc/cfn/hooks.d/cfn-auto-reloader.conf'
-                        ]
-                    )
-                }
-            )
-        }
+        kwargs['services'] = {'sysvinit': cfn_hup_services()}
         return(func(*args, **kwargs))
     return wrapper
 
 
+@profiled
 def CommandsDecoratorHTTP(func):
-    """ Run shell script from http/https """
+    """ Run shell script from http/https, through a local cache when any
+        of cache, sha256, retries or splay is given
+    """
     def wrapper(*args, **kwargs):
+        fetch = _fetch_kwargs(kwargs)
         if 'url' in kwargs and valid_url(kwargs['url']):
+            if fetch is None:
+                command = '/usr/bin/curl -s ' + kwargs['url'] + ' | /bin/sh'
+            else:
+                command = fetch_command('http', kwargs['url'], **fetch)
+                kwargs['files'] = fetch_files()
             kwargs['commands'] = {
-                '01_bootstrap_from_http': {
-                    'command': '/usr/bin/curl -s '
-                    + kwargs['url']
-                    + ' | /bin/sh'
-                }
+                '01_bootstrap_from_http': {'command': command}
             }
         return(func(*args, **kwargs))
     return wrapper
 
 
+@profiled
 def CommandsDecoratorS3(func):
-    """ Run shell script from s3 """
+    """ Run shell script from s3, through a local cache when any of
+        cache, sha256, retries or splay is given
+    """
     def wrapper(*args, **kwargs):
+        fetch = _fetch_kwargs(kwargs)
         if 'url' in kwargs:
+            if fetch is None:
+                command = '/usr/bin/aws s3 cp ' + kwargs['url'] + \
+                    ' - | /bin/sh'
+            else:
+                command = fetch_command('s3', kwargs['url'], **fetch)
+                kwargs['files'] = fetch_files()
             kwargs['commands'] = {
-                '01_bootstrap_from_s3': {
-                    'command': '/usr/bin/aws s3 cp '
-                    + kwargs['url']
-                    + ' - | /bin/sh'
-                }
+                '01_bootstrap_from_s3': {'command': command}
             }
         return(func(*args, **kwargs))
     return wrapper
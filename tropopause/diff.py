@@ -0,0 +1,82 @@
+""" Compare the resources of two builds without diffing whole templates
+
+    python -m tropopause.diff old.json new.json
+
+Each side is a Template, a rendered template or a fingerprint file
+written by save_fingerprints.
+"""
+from collections import namedtuple, OrderedDict
+import hashlib
+import json
+import sys
+from troposphere import BaseAWSObject, encode_to_dict
+
+Diff = namedtuple('Diff', ['added', 'removed', 'changed'])
+
+
+def fingerprint_resource(resource):
+    """ Stable hash of a resource, a troposphere object or its dict form,
+        independent of dict ordering and of the title it is added under
+    """
+    if isinstance(resource, BaseAWSObject):
+        resource = encode_to_dict(resource)
+    return hashlib.sha256(json.dumps(
+        resource, sort_keys=True, separators=(',', ':')
+    ).encode()).hexdigest()
+
+
+def fingerprints(source):
+    """ Map of logical ID to fingerprint for a Template, a rendered
+        template dict or a fingerprint map, which is returned as is
+    """
+    if isinstance(source, dict) and 'Fingerprints' in source:
+        return source['Fingerprints']
+    resources = source.get('Resources', {}) if isinstance(source, dict) \
+        else source.resources
+    return OrderedDict(
+        (title, fingerprint_resource(resources[title]))
+        for title in sorted(resources)
+    )
+
+
+def diff(old, new):
+    """ Logical IDs added, removed and changed between old and new, each
+        a Template, rendered template or fingerprint map. Sorted lists
+    """
+    old, new = fingerprints(old), fingerprints(new)
+    return Diff(
+        sorted(title for title in new if title not in old),
+        sorted(title for title in old if title not in new),
+        sorted(
+            title for title in new
+            if title in old and old[title] != new[title]
+        ),
+    )
+
+
+def save_fingerprints(template, stream):
+    json.dump(
+        {'Fingerprints': fingerprints(template)}, stream,
+        indent=4, sort_keys=True
+    )
+
+
+def load(path):
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print('usage: python -m tropopause.diff OLD NEW', file=sys.stderr)
+        return 2
+    result = diff(load(argv[0]), load(argv[1]))
+    for mark, titles in zip('+-~', result):
+        for title in titles:
+            print(mark, title)
+    return 1 if any(result) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,38 +1,167 @@
-from tropopause import Tags
-from troposphere import GetAtt, Ref, Template
+from collections import defaultdict, namedtuple, OrderedDict
+from ipaddress import collapse_addresses, ip_network
+from itertools import islice
+import warnings
+from weakref import WeakKeyDictionary
+from tropopause import TagSet, Tags, resources_of_type
+from tropopause import Template as IndexedTemplate
+from tropopause.cache import BuildCache
+from tropopause.loader import documents, load_yaml
+from tropopause.profiling import profiled
+from troposphere import GetAtt, Ref, Sub, Template
 from troposphere import Tags as upstreamTags
 from troposphere.ec2 import (
     EIP, Subnet, VPC, InternetGateway, NatGateway,
     Route, RouteTable, SubnetRouteTableAssociation,
-    VPCPeeringConnection, VPCGatewayAttachment,
+    VPCEndpoint, VPCPeeringConnection, VPCGatewayAttachment,
     SecurityGroup, SecurityGroupRule, SecurityGroupIngress
 )
-import yaml
 
 
+def find_vpc(template, vpc_id=None):
+    """ Look up a VPC through the Template type index. A vpc_id Ref
+        selects the VPC with that logical ID, any other vpc_id is outside
+        the template and finds None. Without one the first VPC is used
+    """
+    vpcs = resources_of_type(template, VPC.resource_type)
+    if vpc_id is None:
+        return next(iter(vpcs.values()), None)
+    if isinstance(vpc_id, Ref):
+        return vpcs.get(vpc_id.data['Ref'])
+    return None
+
+
+def vpc_tags(template, vpc_id=None, tags=None):
+    """ TagSet of the VPC find_vpc selects in template, when it is one,
+        merged with tags. A VPC with troposphere Tags is converted once and
+        reused for all children
+    """
+    tagset = TagSet()
+    vpc = find_vpc(template, vpc_id) if isinstance(template, Template) \
+        else None
+    if vpc is not None and 'Tags' in vpc.properties:
+        tagset = _tagset(vpc.properties['Tags'])
+    if isinstance(tags, upstreamTags):
+        tagset = tagset + _tagset(tags)
+    return tagset
+
+
+_converted = WeakKeyDictionary()
+
+
+def _tagset(tags):
+    if isinstance(tags, Tags):
+        return tags.tagset
+    # compared by contents, upstream Tags.tags may be changed in place
+    items = tuple((tag['Key'], tag['Value']) for tag in tags.tags)
+    cached = _converted.get(tags)
+    if cached is None or cached[0] != items:
+        cached = _converted[tags] = (items, TagSet.from_items(items))
+    return cached[1]
+
+
+def _in_vpc(route_table, vpc_id):
+    """ Whether route_table is in the VPC a vpc_id Ref points to, raises
+        ValueError when its VpcId is not a Ref to compare
+    """
+    if not isinstance(vpc_id, Ref):
+        return True
+    route_table_vpc = route_table.properties.get('VpcId')
+    if not isinstance(route_table_vpc, Ref):
+        raise ValueError(
+            'Route Table %s has a VpcId that is not a Ref, cannot tell if '
+            'it is in %s' % (route_table.title, vpc_id.data['Ref'])
+        )
+    return route_table_vpc.data == vpc_id.data
+
+
+def route_tables(template, tiers=None, vpc_id=None):
+    """ Route Tables in the template, optionally only those created for
+        the named subnet tiers, which needs a tropopause Template, or only
+        those in the VPC a vpc_id Ref points to. Raises ValueError when a
+        Route Table's VpcId cannot be compared with vpc_id
+    """
+    if tiers is None:
+        result = resources_of_type(template, RouteTable.resource_type)
+    elif not isinstance(template, IndexedTemplate):
+        raise ValueError('Route Tables are only tracked by tier in a '
+                         'tropopause Template')
+    else:
+        result = OrderedDict()
+        for tier in tiers:
+            result.update(template.route_tables.get(tier, {}))
+    if isinstance(vpc_id, Ref):
+        result = OrderedDict(
+            (title, route_table) for title, route_table in result.items()
+            if _in_vpc(route_table, vpc_id)
+        )
+    return result
+
+
+@profiled
 def AddTagsFromVPC(func):
-    """ Helper to inject VPC tags into **kwargs """
+    """ Helper to inject VPC tags into **kwargs, VPCTagsMerged=True passes
+        Tags that already hold them through unchanged
+    """
     def wrapper(*args, **kwargs):
-        tags = Tags()
-        if isinstance(args[-1], Template):
-            vpc = next(
-                i for i in args[-1].resources.items()
-                if isinstance(i[-1], VPC)
-            )[-1]
-        if isinstance(vpc, VPC):
-            tags = tags + vpc.properties['Tags']
-        if 'Tags' in kwargs and isinstance(kwargs['Tags'], upstreamTags):
-            tags = tags + kwargs['Tags']
-        kwargs['Tags'] = tags
+        if not kwargs.pop('VPCTagsMerged', False):
+            kwargs['Tags'] = Tags(
+                vpc_tags(args[-1], kwargs.get('VpcId'), kwargs.get('Tags'))
+            )
         return(func(*args, **kwargs))
     return wrapper
 
 
+class GatewayVPCEndpoint(VPCEndpoint):
+    ''' Creates a gateway VPC Endpoint for Service, such as s3 or dynamodb,
+        on every Route Table of VpcId, Tiers limits it to the Route Tables
+        of those subnet tiers. In a tropopause Template Route Tables added
+        by subnets afterwards are attached as they are created, Route
+        Tables added any other way afterwards are not. Warns when it is
+        rendered without any Route Table
+    '''
+    def __init__(self, title, template, *args, **kwargs):
+        tiers = kwargs.pop('Tiers', None)
+        service = kwargs.pop('Service', None)
+        if service is not None:
+            kwargs['ServiceName'] = Sub(
+                'com.amazonaws.${AWS::Region}.' + service
+            )
+        kwargs['RouteTableIds'] = [
+            Ref(route_table) for route_table in
+            route_tables(template, tiers, kwargs['VpcId']).values()
+        ]
+        super().__init__(title, template, *args, **kwargs)
+        if isinstance(template, IndexedTemplate):
+            template.route_table_callbacks.append(self._attach(tiers))
+
+    def _attach(self, tiers):
+        vpc_id = self.properties['VpcId']
+
+        def attach(tier, route_table):
+            if (tiers is None or tier in tiers) and \
+                    _in_vpc(route_table, vpc_id):
+                self.properties['RouteTableIds'].append(Ref(route_table))
+        return attach
+
+    def validate(self):
+        if not self.properties.get('RouteTableIds'):
+            warnings.warn(
+                '%s is not attached to any Route Table, SecureSubnets need '
+                'RouteTable=True and Route Tables added after it must be '
+                'listed in RouteTableIds' % self.title
+            )
+
+
 class InternetGatewayVPC(VPC):
-    ''' Overrides the standard Troposphere VPC to deal with boilerplate '''
+    ''' Overrides the standard Troposphere VPC to deal with boilerplate,
+        GatewayEndpoints lists services, such as s3 and dynamodb, to
+        create a GatewayVPCEndpoint for
+    '''
     def __init__(self, title, template, *args, **kwargs):
         if 'Tags' not in kwargs:
             kwargs['Tags'] = Tags()
+        endpoints = kwargs.pop('GatewayEndpoints', ())
         super().__init__(title, template, *args, **kwargs)
         internet_gateway = InternetGateway(
             'internetgateway',
@@ -45,32 +174,52 @@ class InternetGatewayVPC(VPC):
             InternetGatewayId=Ref(internet_gateway),
             VpcId=Ref(self)
         )
+        for service in endpoints:
+            GatewayVPCEndpoint(
+                title + service + 'endpoint',
+                template,
+                Service=service,
+                VpcId=Ref(self)
+            )
+
+
+def nat_gateway_title(subnet, index=0):
+    """ Logical ID of a PublicSubnet's NAT gateway, the first keeps the
+        name it had before subnets could hold several
+    """
+    return subnet + 'natgateway' + (str(index) if index else '')
 
 
 class PublicSubnet(Subnet):
-    ''' Overrides Subnet, creates a NAT gateway '''
+    ''' Overrides Subnet, creates NatGateways NAT gateways, 1 by default '''
     @AddTagsFromVPC
     def __init__(self, title, template, *args, **kwargs):
+        tier = kwargs.pop('Tier', 'public')
+        nat_gateways = kwargs.pop('NatGateways', 1)
         super().__init__(title, template, *args, **kwargs)
-        EIP(
-            title + 'eip',
-            template,
-            Domain='vpc',
-            DependsOn='vpcgatewayattachment'
-        )
-        NatGateway(
-            title + 'natgateway',
-            template,
-            AllocationId=GetAtt(title + 'eip', 'AllocationId'),
-            SubnetId=Ref(self),
-            DependsOn=title + 'eip'
-        )
-        RouteTable(
+        for index in range(nat_gateways):
+            suffix = str(index) if index else ''
+            EIP(
+                title + 'eip' + suffix,
+                template,
+                Domain='vpc',
+                DependsOn='vpcgatewayattachment'
+            )
+            NatGateway(
+                nat_gateway_title(title, index),
+                template,
+                AllocationId=GetAtt(title + 'eip' + suffix, 'AllocationId'),
+                SubnetId=Ref(self),
+                DependsOn=title + 'eip' + suffix
+            )
+        route_table = RouteTable(
             title + 'routetable',
             template,
             VpcId=self.properties['VpcId'],
             Tags=kwargs['Tags']
         )
+        if isinstance(template, IndexedTemplate):
+            template.add_route_table(tier, route_table)
         Route(
             title + 'route',
             template,
@@ -87,26 +236,37 @@ class PublicSubnet(Subnet):
 
 
 class PrivateSubnet(Subnet):
-    ''' Overrides Subnet, routes traffic through an existing NAT gateway '''
+    ''' Overrides Subnet, routes traffic through an existing NAT gateway,
+        NatGateway or by default the first of the PublicSubnet named
+        public plus the Availability Zone. NatGateway=None creates no
+        default route
+    '''
     @AddTagsFromVPC
     def __init__(self, title, template, *args, **kwargs):
+        tier = kwargs.pop('Tier', 'private')
+        nat_gateway = kwargs.pop('NatGateway', False)
         super().__init__(title, template, *args, **kwargs)
-        RouteTable(
+        if nat_gateway is False:
+            nat_gateway = nat_gateway_title('public' + self.properties[
+                'AvailabilityZone'
+            ].replace('-', ''))
+        route_table = RouteTable(
             title + 'routetable',
             template,
             VpcId=self.properties['VpcId'],
             Tags=kwargs['Tags']
         )
-        Route(
-            title + 'route',
-            template,
-            DestinationCidrBlock='0.0.0.0/0',
-            NatGatewayId=Ref(
-                'public' + self.properties['AvailabilityZone'].replace('-', '')
-                + 'natgateway'
-            ),
-            RouteTableId=Ref(self.name + 'routetable')
-        )
+        if isinstance(template, IndexedTemplate):
+            template.add_route_table(tier, route_table)
+        if nat_gateway is not None:
+            Route(
+                title + 'route',
+                template,
+                DestinationCidrBlock='0.0.0.0/0',
+                NatGatewayId=nat_gateway if isinstance(nat_gateway, Ref)
+                else Ref(nat_gateway),
+                RouteTableId=Ref(self.name + 'routetable')
+            )
         SubnetRouteTableAssociation(
             title + 'subnetroutetableassociation',
             template,
@@ -116,98 +276,390 @@ class PrivateSubnet(Subnet):
 
 
 class SecureSubnet(Subnet):
-    """ Overrides Subnet, no route to the Internet """
+    """ Overrides Subnet, no route to the Internet. RouteTable=True gives
+        it a Route Table of its own, with only the local route, that
+        gateway VPC Endpoints and peering Routes can be added to
+    """
     @AddTagsFromVPC
     def __init__(self, title, template, *args, **kwargs):
+        tier = kwargs.pop('Tier', 'secure')
+        own_route_table = kwargs.pop('RouteTable', False)
         super().__init__(title, template, *args, **kwargs)
+        if not own_route_table:
+            return
+        route_table = RouteTable(
+            title + 'routetable',
+            template,
+            VpcId=self.properties['VpcId'],
+            Tags=kwargs['Tags']
+        )
+        if isinstance(template, IndexedTemplate):
+            template.add_route_table(tier, route_table)
+        SubnetRouteTableAssociation(
+            title + 'subnetroutetableassociation',
+            template,
+            RouteTableId=Ref(route_table),
+            SubnetId=Ref(self)
+        )
+
+
+Tier = namedtuple('Tier', ['name', 'subnet', 'tags'])
+Tier.__new__.__defaults__ = (None,)
+
+
+NAT_PER_ZONE = 'zone'
+NAT_SHARED = 'shared'
+NAT_NONE = 'none'
+
+
+def build_subnet_tiers(template, vpc, cidr_block, zones, tiers,
+                       new_prefix=None, nat=NAT_PER_ZONE, nat_gateways=1):
+    """ Lay out a Subnet for every tier in every Availability Zone in one
+        pass. CidrBlock is carved tier by tier, zone by zone, into equal
+        sized networks, each tier's Tags are merged with the VPC's once
+        and the one Tags object is shared by its Subnets. Route Tables are
+        tracked under the tier name and PrivateSubnets route through the
+        NAT gateways of a tier named 'public'. Returns the Subnets of each
+        tier by name
+
+        nat picks the NAT topology: NAT_PER_ZONE puts nat_gateways NAT
+        gateways in every zone's public Subnet, NAT_SHARED only in the
+        first zone's and NAT_NONE none, leaving private tiers without a
+        default route. Each PrivateSubnet has a route table of its own and
+        these are spread over the NAT gateways they can use round robin,
+        so each gateway's bandwidth and connection limits are shared by
+        fewer route tables. nat_gateways may not exceed the private route
+        tables of a zone, or of the VPC for NAT_SHARED, so that every NAT
+        gateway is routed to
+    """
+    if nat not in (NAT_PER_ZONE, NAT_SHARED, NAT_NONE):
+        raise ValueError('unknown NAT topology %r' % nat)
+    if nat_gateways < 1:
+        raise ValueError('nat_gateways must be at least 1')
+    private_route_tables = sum(
+        issubclass(tier.subnet, PrivateSubnet) for tier in tiers
+    ) * (len(zones) if nat == NAT_SHARED else 1)
+    if nat != NAT_NONE and nat_gateways > max(private_route_tables, 1):
+        raise ValueError(
+            '%d NAT gateways but only %d private route tables to route '
+            'through them' % (nat_gateways, private_route_tables)
+        )
+    network = ip_network(cidr_block)
+    if new_prefix is None:
+        new_prefix = network.prefixlen + (
+            len(tiers) * len(zones) - 1
+        ).bit_length()
+    cidrs = network.subnets(new_prefix=new_prefix)
+    needed = len(tiers) * len(zones)
+    carved = [str(cidr) for cidr in islice(cidrs, needed)]
+    if len(carved) < needed:
+        raise ValueError(
+            '%s cannot hold %d /%d networks' % (cidr_block, needed, new_prefix)
+        )
+    if nat != NAT_NONE and \
+            any(issubclass(tier.subnet, PrivateSubnet) for tier in tiers) and \
+            not any(tier.name == 'public' and
+                    issubclass(tier.subnet, PublicSubnet) for tier in tiers):
+        raise ValueError('PrivateSubnet tiers need a PublicSubnet tier '
+                         'named public')
+    suffixes = [zone.replace('-', '') for zone in zones]
+    carved = iter(carved)
+    result = OrderedDict()
+    routed = defaultdict(int)
+    for tier in tiers:
+        tags = Tags(vpc_tags(template, Ref(vpc), tier.tags))
+        public = issubclass(tier.subnet, PublicSubnet)
+        private = issubclass(tier.subnet, PrivateSubnet)
+        result[tier.name] = []
+        for i, (zone, suffix) in enumerate(zip(zones, suffixes)):
+            kwargs = {}
+            if public:
+                kwargs['NatGateways'] = 0 if nat == NAT_NONE or (
+                    nat == NAT_SHARED and i
+                ) else nat_gateways
+            elif private and nat == NAT_NONE:
+                kwargs['NatGateway'] = None
+            elif private:
+                host = 'public' + (
+                    suffixes[0] if nat == NAT_SHARED else suffix
+                )
+                kwargs['NatGateway'] = nat_gateway_title(
+                    host, routed[host] % nat_gateways
+                )
+                routed[host] += 1
+            result[tier.name].append(tier.subnet(
+                tier.name + suffix,
+                template,
+                AvailabilityZone=zone,
+                CidrBlock=next(carved),
+                MapPublicIpOnLaunch=public,
+                Tags=tags,
+                VPCTagsMerged=True,
+                Tier=tier.name,
+                VpcId=Ref(vpc),
+                **kwargs
+            ))
+    return result
+
+
+def _route_to_peer(template, title, peering, peer_cidr, vpc_id, tiers):
+    for index, route_table in list(
+        route_tables(template, tiers, vpc_id).items()
+    ):
+        Route(
+            index + 'to' + title + 'route',
+            template,
+            DestinationCidrBlock=peer_cidr,
+            RouteTableId=Ref(route_table),
+            VpcPeeringConnectionId=Ref(peering)
+        )
+
+
+def _allow_from_peer(template, title, peer_cidr, vpc_id):
+    SecurityGroup(
+        title + "securitygroup",
+        template,
+        GroupDescription="Allow SSH & ICMP from " + title,
+        VpcId=vpc_id
+    )
+    SecurityGroupIngress(
+        title + "sshingress",
+        template,
+        GroupId=Ref(title + "securitygroup"),
+        CidrIp=peer_cidr,
+        IpProtocol="tcp",
+        FromPort="22",
+        ToPort="22"
+    )
+    SecurityGroupIngress(
+        title + "icmpingress",
+        template,
+        GroupId=Ref(title + "securitygroup"),
+        CidrIp=peer_cidr,
+        IpProtocol="icmp",
+        FromPort="-1",
+        ToPort="-1"
+    )
 
 
 class RoutedVPCPeeringConnection(VPCPeeringConnection):
     ''' Initiates peering with another VPC, adds
-        Routes from all local subnets with Route Table associations
+        Routes from all local subnets with Route Table associations,
+        Tiers limits the Routes to the Route Tables of those subnet tiers
     '''
     def __init__(self, title, template, *args, **kwargs):
+        tiers = kwargs.pop('Tiers', None)
         self.props['PeerCidrBlock'] = (str, True)
         super().__init__(title, template, *args, **kwargs)
-        for index in list(template.resources):
-            resource = template.resources[index]
-            if isinstance(resource, RouteTable):
-                Route(
-                    index + 'to' + title + 'route',
-                    template,
-                    DestinationCidrBlock=kwargs['PeerCidrBlock'],
-                    RouteTableId=Ref(resource),
-                    VpcPeeringConnectionId=Ref(self)
-                )
-        SecurityGroup(
-            title + "securitygroup",
-            template,
-            GroupDescription="Allow SSH & ICMP from " + title,
-            VpcId=kwargs['VpcId']
+        _route_to_peer(
+            template, title, self, kwargs['PeerCidrBlock'],
+            kwargs['VpcId'], tiers
         )
-        SecurityGroupIngress(
-            title + "sshingress",
-            template,
-            GroupId=Ref(title + "securitygroup"),
-            CidrIp=kwargs['PeerCidrBlock'],
-            IpProtocol="tcp",
-            FromPort="22",
-            ToPort="22"
-        )
-        SecurityGroupIngress(
-            title + "icmpingress",
-            template,
-            GroupId=Ref(title + "securitygroup"),
-            CidrIp=kwargs['PeerCidrBlock'],
-            IpProtocol="icmp",
-            FromPort="-1",
-            ToPort="-1"
+        _allow_from_peer(
+            template, title, kwargs['PeerCidrBlock'], kwargs['VpcId']
         )
         self.props.pop('PeerCidrBlock')
         self.properties.pop('PeerCidrBlock')
 
 
+def check_cidr_overlaps(cidrs):
+    """ Raise ValueError if any two of the named CIDR blocks overlap.
+        CIDR blocks either nest or are disjoint, so after sorting by
+        network address each block only needs comparing with the one
+        before it, which ends highest of the blocks seen so far while none
+        overlap, O(n log n) rather than pairwise
+    """
+    networks = sorted(
+        ((ip_network(cidr), name) for name, cidr in cidrs.items()),
+        key=lambda item: (item[0].version, item[0].network_address)
+    )
+    previous = None
+    for network, name in networks:
+        if previous is not None and \
+                previous[0].version == network.version and \
+                network.network_address <= previous[0].broadcast_address:
+            raise ValueError('%s %s overlaps %s %s' % (
+                name, network, previous[1], previous[0]
+            ))
+        previous = (network, name)
+
+
+def build_vpc_peering(template, vpcs, hub=None, tiers=None):
+    """ Peer VPCs in the template with each other, or every VPC with
+        the hub VPC when one is given. Overlapping CidrBlocks are
+        rejected before anything is created. Both sides of each
+        connection get Routes, limited to tiers when given, and a
+        Security Group allowing SSH & ICMP from the other side. Returns
+        the peering connections
+    """
+    check_cidr_overlaps(OrderedDict(
+        (vpc.title, vpc.properties['CidrBlock'])
+        for vpc in ([hub] if hub is not None else []) + list(vpcs)
+    ))
+    if hub is not None:
+        pairs = [(hub, vpc) for vpc in vpcs]
+    else:
+        pairs = [
+            (vpc, peer) for i, vpc in enumerate(vpcs) for peer in vpcs[i + 1:]
+        ]
+    connections = []
+    for vpc, peer in pairs:
+        title = vpc.title + 'to' + peer.title
+        connection = RoutedVPCPeeringConnection(
+            title,
+            template,
+            PeerCidrBlock=peer.properties['CidrBlock'],
+            PeerVpcId=Ref(peer),
+            Tiers=tiers,
+            VpcId=Ref(vpc)
+        )
+        _route_to_peer(
+            template, title + 'accepter', connection,
+            vpc.properties['CidrBlock'], Ref(peer), tiers
+        )
+        _allow_from_peer(
+            template, title + 'accepter', vpc.properties['CidrBlock'],
+            Ref(peer)
+        )
+        connections.append(connection)
+    return connections
+
+
+RuleCount = namedtuple('RuleCount', ['expanded', 'compiled'])
+
+
+# only these protocols have port ranges, for icmp FromPort and ToPort are
+# the type and code
+PORT_PROTOCOLS = frozenset(['tcp', 'udp', '6', '17'])
+# part of the BuildCache key for compiled rules, bump it whenever
+# compile_rules or the rule titles change
+RULES_VERSION = 2
+
+
+def _port_range(protocol, port):
+    """ '80' is (80, 80), '8000-8080' is (8000, 8080) and '-1' is (-1, -1).
+        Other than tcp and udp the port is used as both values, unchanged
+    """
+    port = str(port)
+    if port.startswith('-') or protocol not in PORT_PROTOCOLS:
+        return int(port), int(port)
+    start, _, end = port.partition('-')
+    return int(start), int(end or start)
+
+
+def compile_rules(doc):
+    """ Expand a security group rules document into sorted
+        (protocol, network, from port, to port) tuples. Duplicates are
+        removed, networks sharing a port range are collapsed and contiguous
+        tcp and udp port ranges on a network are coalesced. Returns the
+        rules and the number of rules a plain cidr x protocol x port
+        expansion produces
+    """
+    expanded = 0
+    by_ports = defaultdict(set)
+    for ruleset in doc:
+        for cidr in doc[ruleset]['cidr']:
+            network = ip_network(cidr, strict=False)
+            for protocol in doc[ruleset]['protocols']:
+                name = str(protocol).lower()
+                for port in doc[ruleset]['protocols'][protocol]:
+                    expanded += 1
+                    by_ports[
+                        (name,) + _port_range(name, port)
+                    ].add(network)
+    by_network = defaultdict(list)
+    for (protocol, start, end), networks in by_ports.items():
+        for version in (4, 6):
+            for network in collapse_addresses(
+                n for n in networks if n.version == version
+            ):
+                by_network[(protocol, network)].append((start, end))
+    rules = []
+    for (protocol, network), ranges in by_network.items():
+        ranges.sort()
+        start, end = ranges[0]
+        for next_start, next_end in ranges[1:]:
+            if protocol in PORT_PROTOCOLS and start >= 0 and \
+                    next_start <= end + 1:
+                end = max(end, next_end)
+            else:
+                rules.append((protocol, network, start, end))
+                start, end = next_start, next_end
+        rules.append((protocol, network, start, end))
+    rules.sort(key=lambda rule: (
+        rule[0], rule[1].version, rule[1].network_address,
+        rule[1].prefixlen, rule[2]
+    ))
+    return rules, expanded
+
+
 class SecurityGroupFromYaml(SecurityGroup):
-    """ Allows for a config yaml to be passed in instead of Ingress/Egress """
-    def _rulesFromYaml(self, obj):
-        sgrules = []
+    """ Allows for a config yaml to be passed in instead of Ingress/Egress,
+        rule_counts records the expanded and compiled rule count for each
+    """
+    def _compileRules(self, obj):
+        """ (title, properties) for each rule and the expanded rule count,
+            read from the active BuildCache when the document is unchanged
+        """
+        cache = BuildCache.active
+        if cache is not None:
+            key = cache.key(
+                type(self).__name__, RULES_VERSION, paths=[obj]
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                # recorded for tropopause.cli without parsing the document
+                documents.record(obj)
+                return cached['rules'], cached['expanded']
+        rules, expanded = compile_rules(load_yaml(obj))
+        compiled = []
+        for protocol, network, start, end in rules:
+            ports = str(start) if start == end else '%dto%d' % (start, end)
+            compiled.append((
+                ''.join(
+                    ch for ch in (
+                        str(network) + protocol + ports
+                    ) if ch.isalnum()
+                ),
+                {
+                    'IpProtocol': protocol,
+                    'FromPort': str(start),
+                    'ToPort': str(end),
+                    'CidrIp' if network.version == 4
+                    else 'CidrIpv6': str(network),
+                }
+            ))
+        if cache is not None:
+            cache.set(key, {'rules': compiled, 'expanded': expanded})
+        return compiled, expanded
+
+    def _rulesFromYaml(self, obj, key):
+        """ SecurityGroupRules compiled from the file obj, a file that
+            cannot be read or compiled raises ValueError naming it
+        """
         try:
-            with open(obj, 'r') as stream:
-                doc = yaml.load(stream)
-                for ruleset in doc:
-                    for cidr in doc[ruleset]['cidr']:
-                        for protocol in doc[ruleset]['protocols']:
-                            for port in doc[ruleset]['protocols'][protocol]:
-                                sgrules.append(
-                                    SecurityGroupRule(
-                                        ''.join(
-                                            ch for ch in (
-                                                cidr + protocol + port
-                                            ) if ch.isalnum()
-                                        ),
-                                        CidrIp=cidr,
-                                        IpProtocol=protocol,
-                                        FromPort=port,
-                                        ToPort=port
-                                    )
-                                )
+            rules, expanded = self._compileRules(obj)
         except Exception as e:
-            print(e)
-            exit(1)
-        finally:
-            return sgrules
+            raise ValueError('%s: %s' % (obj, e)) from e
+        sgrules = [
+            SecurityGroupRule(title, **properties)
+            for title, properties in rules
+        ]
+        self.rule_counts[key] = RuleCount(expanded, len(sgrules))
+        return sgrules
 
     def __init__(self, title, template, *args, **kwargs):
+        self.rule_counts = {}
         if 'SecurityGroupIngress' in kwargs and isinstance(
             kwargs['SecurityGroupIngress'], str
         ):
             kwargs['SecurityGroupIngress'] = self._rulesFromYaml(
-                kwargs['SecurityGroupIngress']
+                kwargs['SecurityGroupIngress'], 'SecurityGroupIngress'
             )
         if 'SecurityGroupEgress' in kwargs and isinstance(
             kwargs['SecurityGroupEgress'], str
         ):
             kwargs['SecurityGroupEgress'] = self._rulesFromYaml(
-                kwargs['SecurityGroupEgress']
+                kwargs['SecurityGroupEgress'], 'SecurityGroupEgress'
             )
         super().__init__(title, template, *args, **kwargs)
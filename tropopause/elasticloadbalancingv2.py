@@ -1,26 +1,19 @@
-from troposphere import Ref, Template
-from troposphere import Tags as upstreamTags
-from troposphere.ec2 import VPC
+from troposphere import Ref
 from troposphere.elasticloadbalancingv2 import (
     LoadBalancer, TargetGroup, Listener, Action
 )
 from tropopause import Tags
+from tropopause.ec2 import vpc_tags
+from tropopause.profiling import profiled
 
 
+@profiled
 def AddTagsFromVPC(func):
     """ Helper to inject VPC tags into **kwargs """
     def wrapper(*args, **kwargs):
-        tags = Tags()
-        if isinstance(args[-1], Template):
-            vpc = next(
-                i for i in args[-1].resources.items()
-                if isinstance(i[-1], VPC)
-            )[-1]
-        if isinstance(vpc, VPC) and 'Tags' in vpc.properties:
-            tags = tags + vpc.properties['Tags']
-        if 'Tags' in kwargs and isinstance(kwargs['Tags'], upstreamTags):
-            tags = tags + kwargs['Tags']
-        kwargs['Tags'] = tags
+        kwargs['Tags'] = Tags(
+            vpc_tags(args[-1], kwargs.get('VpcId'), kwargs.get('Tags'))
+        )
         return(func(*args, **kwargs))
     return wrapper
 
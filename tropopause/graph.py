@@ -0,0 +1,206 @@
+""" Dependency graph of the resources in a template, built from the Ref,
+    Fn::GetAtt, Fn::Sub and DependsOn references in their dict form, and
+    checks for references that CloudFormation would reject on deploy
+"""
+from collections import namedtuple, OrderedDict
+import re
+
+Edge = namedtuple('Edge', ['target', 'attribute', 'kind'])
+Dangling = namedtuple('Dangling', ['source', 'edge'])
+
+PSEUDO_PARAMETERS = frozenset([
+    'AWS::AccountId', 'AWS::NotificationARNs', 'AWS::NoValue',
+    'AWS::Partition', 'AWS::Region', 'AWS::StackId', 'AWS::StackName',
+    'AWS::URLSuffix',
+])
+
+SUB_RE = re.compile(r'\$\{([^!}][^}]*)\}')
+
+
+def template_dict(template):
+    """ The dict form of a Template, a dict is returned as is """
+    if isinstance(template, dict):
+        return template
+    return template.to_dict()
+
+
+def references(value):
+    """ Edges for every Ref, Fn::GetAtt and Fn::Sub variable in value, in
+        the order they are found. Names defined by a Fn::Sub variable map
+        are local to it and not reported
+    """
+    found = []
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if len(value) == 1 and 'Ref' in value:
+                found.append(Edge(value['Ref'], None, 'Ref'))
+            elif len(value) == 1 and 'Fn::GetAtt' in value:
+                target = value['Fn::GetAtt']
+                if isinstance(target, str):
+                    target = target.split('.', 1)
+                found.append(Edge(target[0], target[1], 'GetAtt'))
+            elif len(value) == 1 and 'Fn::Sub' in value:
+                sub = value['Fn::Sub']
+                string, variables = (sub, {}) if isinstance(sub, str) \
+                    else sub
+                for name in SUB_RE.findall(string):
+                    target, _, attribute = name.partition('.')
+                    if target not in variables:
+                        found.append(Edge(target, attribute or None, 'Sub'))
+                stack.extend(reversed(list(variables.values())))
+            else:
+                stack.extend(reversed(list(value.values())))
+        elif isinstance(value, (list, tuple)):
+            stack.extend(reversed(value))
+    return found
+
+
+def dependency_graph(template):
+    """ OrderedDict of each resource's logical ID to the Edges leaving it,
+        without duplicates. Edges may point at Parameters, pseudo
+        parameters or names that do not exist
+    """
+    resources = template_dict(template).get('Resources', {})
+    graph = OrderedDict()
+    for title, resource in resources.items():
+        depends = resource.get('DependsOn', [])
+        edges = references([
+            value for key, value in resource.items()
+            if key not in ('Condition', 'DependsOn', 'Type')
+        ])
+        edges.extend(
+            Edge(target, None, 'DependsOn') for target in (
+                [depends] if isinstance(depends, str) else depends
+            )
+        )
+        graph[title] = list(OrderedDict.fromkeys(edges))
+    return graph
+
+
+def dangling(template, graph=None):
+    """ Dangling for every reference from a resource or Output to a name
+        that does not exist. Ref and attribute-less Fn::Sub variables may
+        name Parameters and pseudo parameters, Fn::GetAtt and DependsOn
+        only resources
+    """
+    template = template_dict(template)
+    resources = template.get('Resources', {})
+    parameters = template.get('Parameters', {})
+    graph = dependency_graph(template) if graph is None else graph
+    sources = list(graph.items()) + [
+        ('Outputs.' + name, references(output))
+        for name, output in template.get('Outputs', {}).items()
+    ]
+    found = []
+    for source, edges in sources:
+        for edge in edges:
+            if edge.target in resources:
+                continue
+            if edge.kind in ('Ref', 'Sub') and edge.attribute is None and (
+                edge.target in parameters or edge.target in PSEUDO_PARAMETERS
+            ):
+                continue
+            found.append(Dangling(source, edge))
+    return found
+
+
+def cycles(graph):
+    """ Every set of resources that depend on each other, as lists of
+        logical IDs, by Tarjan's strongly connected components. A resource
+        depending on itself is a cycle of one
+    """
+    index, low, on_stack = {}, {}, set()
+    stack, found = [], []
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph[root]))]
+        while work:
+            node, edges = work[-1]
+            for edge in edges:
+                target = edge.target
+                if target not in graph:
+                    continue
+                if target not in index:
+                    index[target] = low[target] = len(index)
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(graph[target])))
+                    break
+                if target in on_stack:
+                    low[node] = min(low[node], index[target])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or any(
+                        edge.target == node for edge in graph[node]
+                    ):
+                        found.append(component[::-1])
+    return found
+
+
+def order(graph):
+    """ Logical IDs in template order, except that each resource is moved
+        after the resources it depends on. Raises ValueError on a cycle
+    """
+    ordered, done, visiting = [], set(), set()
+    for root in graph:
+        if root in done:
+            continue
+        visiting.add(root)
+        work = [(root, iter(graph[root]))]
+        while work:
+            node, edges = work[-1]
+            for edge in edges:
+                target = edge.target
+                if target in visiting:
+                    raise ValueError('dependency cycle between %s' % '; '.join(
+                        ', '.join(cycle) for cycle in cycles(graph)
+                    ))
+                if target in graph and target not in done:
+                    visiting.add(target)
+                    work.append((target, iter(graph[target])))
+                    break
+            else:
+                work.pop()
+                visiting.discard(node)
+                done.add(node)
+                ordered.append(node)
+    return ordered
+
+
+def validate(template):
+    """ Build the dependency graph once and check it for dangling
+        references and cycles, raising a ValueError listing every problem.
+        Returns the graph for reuse
+    """
+    template = template_dict(template)
+    graph = dependency_graph(template)
+    errors = [
+        '%s: %s %s%s does not exist' % (
+            source, edge.kind, edge.target,
+            '.' + edge.attribute if edge.attribute else ''
+        )
+        for source, edge in dangling(template, graph)
+    ] + [
+        'dependency cycle: %s' % ' -> '.join(cycle + cycle[:1])
+        for cycle in cycles(graph)
+    ]
+    if errors:
+        raise ValueError('\n'.join(errors))
+    return graph
@@ -0,0 +1,177 @@
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import copy
+import glob
+import os
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class DocumentCache(object):
+    """ LRU cache of parsed YAML documents keyed on absolute path, a file
+        is parsed again when its mtime or size changes. Every caller gets
+        its own copy of a document, so they may modify it. Preloaded
+        documents are pinned outside the LRU until cache_clear. Inside
+        recording(), paths collects every path loaded, whether or not it
+        was cached, and is None otherwise
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.documents = OrderedDict()
+        self.pinned = {}
+        self.paths = None
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def recording(self):
+        """ Collect the paths loaded inside the block into the set it
+            yields, which is also added to any enclosing recording
+        """
+        previous, self.paths = self.paths, set()
+        try:
+            yield self.paths
+        finally:
+            if previous is not None:
+                previous.update(self.paths)
+            self.paths = previous
+
+    def record(self, path):
+        """ Record path as read while recording, for documents whose
+            contents were used without loading them
+        """
+        if self.paths is not None:
+            self.paths.add(os.path.abspath(path))
+
+    def load(self, path):
+        path = os.path.abspath(path)
+        self.record(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        pinned = self.pinned.get(path)
+        if pinned is not None:
+            if pinned[0] == signature:
+                self.hits += 1
+                return _copy(pinned[1])
+            del self.pinned[path]
+        cached = self.documents.get(path)
+        if cached is not None and cached[0] == signature:
+            self.hits += 1
+            self.documents.move_to_end(path)
+            return _copy(cached[1])
+        self.misses += 1
+        with open(path, 'r') as stream:
+            document = safe_load(stream)
+        self.documents[path] = (signature, document)
+        self.documents.move_to_end(path)
+        while len(self.documents) > self.maxsize:
+            self.documents.popitem(last=False)
+        return _copy(document)
+
+    def preload(self, pattern, max_workers=None, validate=None):
+        """ Read and parse every document a directory, glob pattern or list
+            of paths names in a thread pool, so slow file systems are read
+            concurrently, and cache them for load. A directory is searched
+            recursively for .yaml and .yml files. validate is called on
+            each document. All failures are raised together as one
+            ValueError. Every document is pinned, so maxsize does not
+            evict them, and load uses it until its file changes. Returns
+            every document keyed on absolute path
+        """
+        paths = sorted(set(os.path.abspath(path) for path in _expand(pattern)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda path: _read(path, validate), paths
+            ))
+        errors = [
+            '%s: %s' % (path, error) for path, (_, _, error)
+            in zip(paths, results) if error is not None
+        ]
+        if errors:
+            raise ValueError('\n'.join(errors))
+        preloaded = OrderedDict()
+        for path, (signature, document, _) in zip(paths, results):
+            self.misses += 1
+            self.documents.pop(path, None)
+            self.pinned[path] = (signature, document)
+            preloaded[path] = _copy(document)
+        return preloaded
+
+    def cache_info(self):
+        return CacheInfo(
+            self.hits, self.misses, self.maxsize,
+            len(self.documents) + len(self.pinned)
+        )
+
+    def cache_clear(self):
+        """ Empty the cache, releasing preloaded documents too """
+        self.documents.clear()
+        self.pinned.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def safe_load(stream):
+    """ yaml is imported on first use, with the libyaml CSafeLoader when
+        available, so importing tropopause does not pay for it
+    """
+    import yaml
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def _copy(value):
+    """ Copy of a parsed document, plain dicts and lists are copied
+        directly as that is much faster than deepcopy
+    """
+    if type(value) is dict:
+        return {key: _copy(item) for key, item in value.items()}
+    if type(value) is list:
+        return [_copy(item) for item in value]
+    return copy.deepcopy(value)
+
+
+def _expand(pattern):
+    if not isinstance(pattern, str):
+        return pattern
+    if os.path.isdir(pattern):
+        return [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(pattern)
+            for name in names if name.endswith(('.yaml', '.yml'))
+        ]
+    try:
+        return glob.glob(pattern, recursive=True)
+    except TypeError:
+        # Python 3.4, ** matches a single directory
+        return glob.glob(pattern)
+
+
+def _read(path, validate):
+    """ (signature, document, error) for one preloaded path """
+    try:
+        stat = os.stat(path)
+        with open(path, 'r') as stream:
+            document = safe_load(stream)
+        if validate is not None:
+            validate(document)
+    except Exception as e:
+        return None, None, e
+    return (stat.st_mtime_ns, stat.st_size), document, None
+
+
+documents = DocumentCache()
+
+
+def load_yaml(path):
+    """ Load a YAML document through the shared cache """
+    return documents.load(path)
+
+
+def preload(pattern, max_workers=None, validate=None):
+    """ Preload documents into the shared cache, see DocumentCache.preload """
+    return documents.preload(pattern, max_workers, validate)
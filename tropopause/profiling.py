@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from functools import wraps
+import sys
+import time
+
+
+def profiled(decorator):
+    """ Report the wrappers a decorator creates to the active Profile,
+        when no Profile is active the wrapper is called directly
+    """
+    def instrumented(func):
+        wrapper = decorator(func)
+
+        @wraps(func)
+        def profiled_wrapper(*args, **kwargs):
+            if Profile.active is None:
+                return wrapper(*args, **kwargs)
+            return Profile.active.call(
+                decorator.__name__, type(args[0]).__name__,
+                wrapper, args, kwargs
+            )
+        return profiled_wrapper
+    return instrumented
+
+
+class Stat(object):
+    __slots__ = ['calls', 'seconds', 'bytes']
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+
+class Profile(object):
+    """ Context manager recording calls, cumulative time and, with memory
+        set, bytes allocated by tracemalloc for each decorator on each
+        class built inside it: the peak traced above the level at the
+        call, or before Python 3.9, which cannot reset the peak, the net
+        growth. Not thread safe, one Profile is active at a time
+    """
+    active = None
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stats = OrderedDict()
+        self.stacks = OrderedDict()
+        self.path = ()
+        self.children = [0.0]
+        self.peaks = [0]
+        self.previous = None
+        self.started = False
+        self.tracemalloc = None
+
+    def __enter__(self):
+        # imported here, tracemalloc and its dependencies are only needed
+        # while profiling
+        import tracemalloc
+        self.tracemalloc = tracemalloc
+        self.previous = Profile.active
+        Profile.active = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        return self
+
+    def __exit__(self, *exc):
+        Profile.active = self.previous
+        if self.started:
+            self.tracemalloc.stop()
+            self.started = False
+        return False
+
+    def call(self, decorator, cls, func, args, kwargs):
+        path = self.path
+        self.path = path + (cls + '.' + decorator,)
+        self.children.append(0.0)
+        memory = 0
+        if self.memory:
+            memory, peak = self.tracemalloc.get_traced_memory()
+            if hasattr(self.tracemalloc, 'reset_peak'):
+                # the enclosing call's peak so far, before it is reset
+                self.peaks[-1] = max(self.peaks[-1], peak)
+                self.tracemalloc.reset_peak()
+            self.peaks.append(memory)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stat = self.stats.get((decorator, cls))
+            if stat is None:
+                stat = self.stats[(decorator, cls)] = Stat()
+            stat.calls += 1
+            stat.seconds += elapsed
+            if self.memory:
+                current, peak = self.tracemalloc.get_traced_memory()
+                if hasattr(self.tracemalloc, 'reset_peak'):
+                    peak = max(self.peaks.pop(), peak)
+                else:
+                    self.peaks.pop()
+                    peak = current
+                stat.bytes += peak - memory
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            self.stacks[self.path] = self.stacks.get(self.path, 0.0) + (
+                elapsed - self.children.pop()
+            )
+            self.children[-1] += elapsed
+            self.path = path
+
+    def totals(self, by='decorator'):
+        """ Stats summed by 'decorator' or by 'class' """
+        result = OrderedDict()
+        for (decorator, cls), stat in self.stats.items():
+            total = result.setdefault(
+                decorator if by == 'decorator' else cls, Stat()
+            )
+            total.calls += stat.calls
+            total.seconds += stat.seconds
+            total.bytes += stat.bytes
+        return result
+
+    def report(self, stream=None, sort='seconds'):
+        """ Write a table of stats sorted by 'seconds', 'calls' or 'bytes' """
+        stream = sys.stdout if stream is None else stream
+        stream.write('%-24s %-32s %8s %12s %12s\n' % (
+            'decorator', 'class', 'calls', 'seconds', 'bytes'
+        ))
+        for (decorator, cls), stat in sorted(
+            self.stats.items(),
+            key=lambda item: getattr(item[1], sort),
+            reverse=True
+        ):
+            stream.write('%-24s %-32s %8d %12.6f %12d\n' % (
+                decorator, cls, stat.calls, stat.seconds, stat.bytes
+            ))
+
+    def dump_stacks(self, stream):
+        """ Write collapsed stacks with self time in microseconds, the
+            format flamegraph.pl and speedscope read
+        """
+        for path, seconds in self.stacks.items():
+            stream.write('%s %d\n' % (';'.join(path), seconds * 1e6))
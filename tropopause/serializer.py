@@ -0,0 +1,95 @@
+import json
+from troposphere import encode_to_dict
+
+
+def _sections(template):
+    """ Everything but Resources, as upstream Template.to_dict builds it """
+    t = {}
+    if template.description:
+        t['Description'] = template.description
+    if template.metadata:
+        t['Metadata'] = template.metadata
+    if template.conditions:
+        t['Conditions'] = template.conditions
+    if template.mappings:
+        t['Mappings'] = template.mappings
+    if template.outputs:
+        t['Outputs'] = template.outputs
+    if template.parameters:
+        t['Parameters'] = template.parameters
+    if template.version:
+        t['AWSTemplateFormatVersion'] = template.version
+    if template.transform:
+        t['Transform'] = template.transform
+    return encode_to_dict(t)
+
+
+def dump_json(template, stream, compact=False):
+    """ Write the template to stream as JSON one resource at a time, so
+        only a single resource is held as a dict or string at once. The
+        output matches Template.to_json(), compact drops the whitespace
+    """
+    if compact:
+        encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+        newline, colon = '', ':'
+    else:
+        encoder = json.JSONEncoder(
+            indent=4, sort_keys=True, separators=(',', ': ')
+        )
+        newline, colon = '\n', ': '
+
+    def pad(level):
+        return '' if compact else ' ' * 4 * level
+
+    def encode(obj, level):
+        return encoder.encode(obj).replace('\n', '\n' + pad(level))
+
+    sections = _sections(template)
+    keys = sorted(list(sections) + ['Resources'])
+    stream.write('{' + newline)
+    for i, key in enumerate(keys):
+        stream.write(pad(1) + json.dumps(key) + colon)
+        if key != 'Resources':
+            stream.write(encode(sections[key], 1))
+        elif not template.resources:
+            stream.write('{}')
+        else:
+            stream.write('{' + newline)
+            titles = sorted(template.resources)
+            for j, title in enumerate(titles):
+                stream.write(pad(2) + json.dumps(title) + colon)
+                stream.write(
+                    encode(encode_to_dict(template.resources[title]), 2)
+                )
+                stream.write((',' if j < len(titles) - 1 else '') + newline)
+            stream.write(pad(1) + '}')
+        stream.write((',' if i < len(keys) - 1 else '') + newline)
+    stream.write('}')
+
+
+def dump_yaml(template, stream):
+    """ Write the template to stream as YAML one resource at a time """
+    import yaml
+    try:
+        from yaml import CSafeDumper as SafeDumper
+    except ImportError:
+        from yaml import SafeDumper
+
+    def dump(obj):
+        return yaml.dump(obj, Dumper=SafeDumper, default_flow_style=False)
+
+    sections = _sections(template)
+    for key in sorted(list(sections) + ['Resources']):
+        if key != 'Resources':
+            stream.write(dump({key: sections[key]}))
+        elif not template.resources:
+            stream.write('Resources: {}\n')
+        else:
+            stream.write('Resources:\n')
+            for title in sorted(template.resources):
+                text = dump({
+                    title: encode_to_dict(template.resources[title])
+                })
+                stream.write(''.join(
+                    '  ' + line for line in text.splitlines(True)
+                ))
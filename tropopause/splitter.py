@@ -0,0 +1,554 @@
+""" Split a template too large for CloudFormation into nested stacks or
+    into stacks joined by Exports
+
+Resources are partitioned on the dependency graph from tropopause.graph.
+Resources referenced from many places (a VPC, an InternetGateway) and
+everything they depend on form the base stacks. The rest fall into
+connected components, such as a subnet with its route table, routes and
+NAT gateway, which are kept whole where they fit and packed into stacks
+first fit decreasing. Components too large for one stack are cut in
+dependency order. Every stack only refers to stacks before it, so they
+deploy in order. Partitioning is linear in resources and references
+apart from sorting components by size.
+"""
+from collections import namedtuple, OrderedDict
+import json
+import math
+import os
+import re
+import sys
+from tropopause.graph import PSEUDO_PARAMETERS, SUB_RE, dependency_graph
+from tropopause.graph import references
+from tropopause.graph import template_dict
+
+MAX_RESOURCES = 500
+MAX_BYTES = 1024 * 1024
+MAX_PARAMETERS = 200
+MAX_OUTPUTS = 200
+
+Part = namedtuple(
+    'Part', ['name', 'template', 'resources', 'bytes', 'parameters', 'outputs']
+)
+Split = namedtuple('Split', ['name', 'parent', 'parts', 'cut'])
+
+
+def _size(value):
+    return len(json.dumps(value, separators=(',', ':')))
+
+
+def _ordered(nodes, depends):
+    """ nodes with dependencies before dependents, depth first so related
+        resources stay next to each other
+    """
+    result, done, members = [], set(), set(nodes)
+    for node in nodes:
+        if node in done:
+            continue
+        done.add(node)
+        stack = [(node, iter(depends[node]))]
+        while stack:
+            current, children = stack[-1]
+            for child in children:
+                if child in members and child not in done:
+                    done.add(child)
+                    stack.append((child, iter(depends[child])))
+                    break
+            else:
+                stack.pop()
+                result.append(current)
+    return result
+
+
+class _Budget(object):
+    """ The resources, bytes, Parameters and Outputs of a stack being
+        filled. A value is a Parameter when a member references a resource
+        outside the stack, or a template Parameter, and may be an Output
+        when other resources reference a member
+    """
+    def __init__(self, costs, limits):
+        self.costs = costs
+        self.limits = limits
+        self.titles = []
+        self.members = set()
+        self.inputs = set()
+        self.pending = {}
+        self.bytes = 0
+        self.parameters = 0
+        self.outputs = 0
+
+    def _totals(self, titles):
+        sizes, inputs, outputs = self.costs
+        members = set(titles)
+        total, parameters = self.bytes, self.parameters
+        count = self.outputs
+        for title in titles:
+            total += sizes[title] + outputs[title][1]
+            count += outputs[title][0]
+            if title in self.pending:
+                parameters -= self.pending[title][0]
+                total -= self.pending[title][1]
+        new = OrderedDict()
+        for title in titles:
+            for key, cost in inputs[title].items():
+                if key in self.inputs or key in new:
+                    continue
+                new[key] = cost
+                if key[0] not in members and key[0] not in self.members:
+                    parameters += 1
+                    total += cost
+        return total, parameters, count, new
+
+    def fits(self, titles):
+        max_resources, max_bytes, max_parameters, max_outputs = self.limits
+        total, parameters, outputs, _ = self._totals(titles)
+        return len(self.titles) + len(titles) <= max_resources and \
+            total <= max_bytes and parameters <= max_parameters and \
+            outputs <= max_outputs
+
+    def add(self, titles):
+        self.bytes, self.parameters, self.outputs, new = \
+            self._totals(titles)
+        self.titles.extend(titles)
+        self.members.update(titles)
+        for title in titles:
+            self.pending.pop(title, None)
+        for key, cost in new.items():
+            self.inputs.add(key)
+            if key[0] not in self.members:
+                pending = self.pending.setdefault(key[0], [0, 0])
+                pending[0] += 1
+                pending[1] += cost
+
+
+def _chunks(titles, costs, limits):
+    chunks = [_Budget(costs, limits)]
+    for title in titles:
+        if chunks[-1].titles and not chunks[-1].fits([title]):
+            chunks.append(_Budget(costs, limits))
+        if not chunks[-1].fits([title]):
+            raise ValueError(
+                '%s alone needs more than %d bytes, %d Parameters or %d '
+                'Outputs' % ((title,) + limits[1:])
+            )
+        chunks[-1].add([title])
+    return chunks
+
+
+def _costs(graph, sizes, value_bytes):
+    """ sizes, the values each resource takes from elsewhere and the number
+        and bytes of values other resources take from it
+    """
+    inputs = OrderedDict()
+    exported = {title: OrderedDict() for title in graph}
+    for title in graph:
+        inputs[title] = OrderedDict()
+        for edge in graph[title]:
+            if edge.kind == 'DependsOn' or edge.target == title or \
+                    edge.target in PSEUDO_PARAMETERS:
+                continue
+            key = (edge.target, edge.attribute) if edge.target in graph \
+                else (edge.target, None)
+            cost = value_bytes(*key) if value_bytes is not None else 0
+            inputs[title][key] = cost
+            if edge.target in graph:
+                exported[edge.target][key] = cost
+    outputs = {
+        title: (len(keys), sum(keys.values()))
+        for title, keys in exported.items()
+    }
+    return sizes, inputs, outputs
+
+
+def partition(graph, sizes, max_resources=MAX_RESOURCES, max_bytes=MAX_BYTES,
+              hub_degree=None, max_parameters=MAX_PARAMETERS,
+              max_outputs=MAX_OUTPUTS, value_bytes=None):
+    """ Group the logical IDs of a dependency graph into stacks of at most
+        max_resources resources, max_bytes, max_parameters Parameters and
+        max_outputs Outputs. sizes maps logical ID to bytes, value_bytes
+        gives the bytes a value passed between stacks adds to each side
+        from its target and attribute. A resource with more than
+        hub_degree neighbours, by default the square root of the resource
+        count, is a hub. Returns lists of logical IDs, each only depending
+        on itself and the lists before it
+    """
+    titles = list(graph)
+    if len(titles) <= max_resources and sum(sizes.values()) <= max_bytes:
+        return [titles]
+    costs = _costs(graph, sizes, value_bytes)
+    limits = (max_resources, max_bytes, max_parameters, max_outputs)
+    depends = OrderedDict(
+        (title, list(OrderedDict.fromkeys(
+            edge.target for edge in graph[title]
+            if edge.target in graph and edge.target != title
+        )))
+        for title in titles
+    )
+    neighbours = {title: set() for title in titles}
+    for title in titles:
+        for target in depends[title]:
+            neighbours[title].add(target)
+            neighbours[target].add(title)
+    if hub_degree is None:
+        hub_degree = max(16, int(math.sqrt(len(titles))))
+    base = set()
+    stack = [title for title in titles if len(neighbours[title]) > hub_degree]
+    while stack:
+        title = stack.pop()
+        if title not in base:
+            base.add(title)
+            stack.extend(depends[title])
+    component = {}
+    for title in titles:
+        if title in base or title in component:
+            continue
+        component[title] = title
+        queue = [title]
+        while queue:
+            for neighbour in neighbours[queue.pop()]:
+                if neighbour not in base and neighbour not in component:
+                    component[neighbour] = title
+                    queue.append(neighbour)
+    components = OrderedDict()
+    for title in titles:
+        if title not in base:
+            components.setdefault(component[title], []).append(title)
+    # base and the full chunks of large components are stacks of their own,
+    # the remaining pieces reference nothing but those and are packed
+    parts = []
+    if base:
+        parts.extend(_chunks(
+            _ordered([t for t in titles if t in base], depends), costs,
+            limits
+        ))
+    pieces = []
+    for members in components.values():
+        chunks = _chunks(_ordered(members, depends), costs, limits)
+        parts.extend(chunks[:-1])
+        pieces.append(chunks[-1])
+    bins = []
+    for piece in sorted(pieces, key=lambda p: len(p.titles), reverse=True):
+        for target in bins:
+            if target.fits(piece.titles):
+                target.add(piece.titles)
+                break
+        else:
+            bins.append(piece)
+    return [chunk.titles for chunk in parts + bins]
+
+
+class _Rewriter(object):
+    """ Replaces references to resources in other stacks with Parameters
+        (nested) or Fn::ImportValue (exports), recording what each stack
+        must output and import
+    """
+    def __init__(self, owner, names, mode, prefix, reserved=()):
+        self.owner = owner
+        self.names = names
+        self.mode = mode
+        self.prefix = prefix
+        self.reserved = set(reserved)
+        self.values = {}
+        self.exports = [OrderedDict() for _ in names]
+        self.imports = [OrderedDict() for _ in names]
+        self.depends = [set() for _ in names]
+
+    def _foreign(self, target, attribute, part):
+        """ The value replacing a reference to target in another stack """
+        name = self.values.get((target, attribute))
+        if name is None:
+            name = base = target + re.sub(r'[^A-Za-z0-9]', '', attribute or '')
+            suffix = 1
+            # a Ref keeps the target's name, the target is never local
+            while name in self.reserved or (
+                    name in self.owner and name != target):
+                suffix += 1
+                name = base + str(suffix)
+            self.reserved.add(name)
+            self.values[(target, attribute)] = name
+        producer = self.owner[target]
+        self.exports[producer][name] = {'Ref': target} if attribute is None \
+            else {'Fn::GetAtt': [target, attribute]}
+        self.imports[part][name] = producer
+        if self.mode == 'nested':
+            return name, {'Ref': name}
+        return name, {'Fn::ImportValue': self.prefix + '-' + name}
+
+    def _is_foreign(self, target, part):
+        return target in self.owner and self.owner[target] != part
+
+    def rewrite(self, value, part):
+        """ value with foreign references replaced, unchanged values are
+            returned as is rather than copied
+        """
+        if isinstance(value, list):
+            items = [self.rewrite(item, part) for item in value]
+            if all(new is old for new, old in zip(items, value)):
+                return value
+            return items
+        if not isinstance(value, dict):
+            return value
+        if len(value) == 1 and 'Ref' in value:
+            if self._is_foreign(value['Ref'], part):
+                return self._foreign(value['Ref'], None, part)[1]
+            return value
+        if len(value) == 1 and 'Fn::GetAtt' in value:
+            target = value['Fn::GetAtt']
+            if isinstance(target, str):
+                target = target.split('.', 1)
+            if self._is_foreign(target[0], part):
+                return self._foreign(target[0], target[1], part)[1]
+            return value
+        if len(value) == 1 and 'Fn::Sub' in value:
+            return self._rewrite_sub(value, part)
+        items = OrderedDict(
+            (key, self.rewrite(item, part)) for key, item in value.items()
+        )
+        if all(items[key] is value[key] for key in value):
+            return value
+        return items
+
+    def _rewrite_sub(self, value, part):
+        sub = value['Fn::Sub']
+        string, variables = (sub, {}) if isinstance(sub, str) else sub
+        new_variables = OrderedDict(
+            (key, self.rewrite(item, part)) for key, item in variables.items()
+        )
+
+        def replace(match):
+            target, _, attribute = match.group(1).partition('.')
+            if target in variables or not self._is_foreign(target, part):
+                return match.group(0)
+            name, replacement = self._foreign(target, attribute or None, part)
+            if self.mode == 'exports':
+                new_variables[name] = replacement
+            return '${' + name + '}'
+        new_string = SUB_RE.sub(replace, string)
+        if new_string == string and len(new_variables) == len(variables) \
+                and all(
+                    new_variables[key] is variables[key] for key in variables
+                ):
+            return value
+        if not new_variables:
+            return {'Fn::Sub': new_string}
+        return {'Fn::Sub': [new_string, new_variables]}
+
+    def resource(self, resource, part):
+        resource = self.rewrite(resource, part)
+        depends = resource.get('DependsOn')
+        if depends is not None:
+            depends = [depends] if isinstance(depends, str) else depends
+            local = [
+                target for target in depends
+                if not self._is_foreign(target, part)
+            ]
+            for target in depends:
+                if self._is_foreign(target, part):
+                    self.depends[part].add(self.owner[target])
+            if len(local) != len(depends):
+                resource = OrderedDict(resource)
+                if local:
+                    resource['DependsOn'] = local
+                else:
+                    del resource['DependsOn']
+        return resource
+
+
+def _parameter_names(value, parameters):
+    names = set()
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if len(value) == 1 and value.get('Ref') in parameters:
+                names.add(value['Ref'])
+            elif len(value) == 1 and 'Fn::Sub' in value:
+                sub = value['Fn::Sub']
+                string = sub if isinstance(sub, str) else sub[0]
+                names.update(
+                    name for name in SUB_RE.findall(string)
+                    if name in parameters
+                )
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return names
+
+
+def split_template(template, name='stack', mode='nested', template_url='',
+                   max_resources=MAX_RESOURCES, max_bytes=MAX_BYTES,
+                   hub_degree=None):
+    """ Split a Template, or its dict form, into Parts of at most
+        max_resources resources and max_bytes of template JSON, within
+        CloudFormation's Parameter and Output limits. mode
+        'nested' adds a parent template holding one AWS::CloudFormation::Stack
+        per Part, loaded from template_url + part name + '.json', passing
+        values between them as Parameters. mode 'exports' joins the Parts
+        with Outputs exported as name-value and Fn::ImportValue, the Parts
+        must then be deployed in order. cut counts the values passed
+        between stacks, named after their target and attribute with a
+        number appended where that is already a logical ID. Raises
+        ValueError when a resource cannot fit a Part on its own, or a Part
+        still exceeds a limit once written
+    """
+    if mode not in ('nested', 'exports'):
+        raise ValueError('mode must be nested or exports')
+    doc = template_dict(template)
+    resources = doc.get('Resources', {})
+    parameters = doc.get('Parameters', {})
+    sizes = {title: _size(resource) for title, resource in resources.items()}
+    shared = OrderedDict(
+        (key, doc[key]) for key in (
+            'AWSTemplateFormatVersion', 'Transform', 'Description',
+            'Mappings', 'Conditions'
+        ) if key in doc
+    )
+
+    def value_bytes(target, attribute):
+        # a Parameter or Output and its Export or Fn::ImportValue
+        return 2 * (len(target) + len(attribute or '') + len(name)) + 96
+    groups = partition(
+        dependency_graph(doc), sizes, max_resources,
+        max_bytes - _size(shared) - 64, hub_degree,
+        value_bytes=value_bytes
+    )
+    names = [name + str(i) for i in range(len(groups))]
+    owner = {title: i for i, group in enumerate(groups) for title in group}
+    rewriter = _Rewriter(owner, names, mode, name, reserved=[
+        title for key in ('Parameters', 'Mappings', 'Conditions', 'Outputs')
+        for title in doc.get(key, {})
+    ])
+    bodies = [OrderedDict() for _ in groups]
+    for i, group in enumerate(groups):
+        for title in group:
+            bodies[i][title] = rewriter.resource(resources[title], i)
+    outputs = [OrderedDict() for _ in groups]
+    for title, output in doc.get('Outputs', {}).items():
+        found = [
+            owner[edge.target] for edge in references(output)
+            if edge.target in owner
+        ]
+        i = found[0] if found else 0
+        outputs[i][title] = rewriter.rewrite(output, i)
+    parts = []
+    for i, group in enumerate(groups):
+        child = OrderedDict()
+        for key in ('AWSTemplateFormatVersion', 'Transform'):
+            if key in doc:
+                child[key] = doc[key]
+        if 'Description' in doc:
+            child['Description'] = '%s (%d of %d)' % (
+                doc['Description'], i + 1, len(groups)
+            )
+        for key in ('Mappings', 'Conditions'):
+            if doc.get(key):
+                child[key] = doc[key]
+        used = _parameter_names(
+            [bodies[i], outputs[i], doc.get('Conditions', {})], parameters
+        )
+        child_parameters = OrderedDict(
+            (title, parameters[title]) for title in parameters
+            if title in used
+        )
+        if mode == 'nested':
+            for import_name in rewriter.imports[i]:
+                child_parameters[import_name] = {'Type': 'String'}
+        if child_parameters:
+            child['Parameters'] = child_parameters
+        child['Resources'] = bodies[i]
+        for export_name, value in rewriter.exports[i].items():
+            outputs[i][export_name] = OrderedDict([('Value', value)])
+            if mode == 'exports':
+                outputs[i][export_name]['Export'] = {
+                    'Name': name + '-' + export_name
+                }
+        if outputs[i]:
+            child['Outputs'] = outputs[i]
+        parts.append(Part(
+            names[i], child, len(group), _size(child),
+            len(child_parameters), len(outputs[i])
+        ))
+    over = [
+        part.name for part in parts
+        if part.bytes > max_bytes or part.parameters > MAX_PARAMETERS or
+        part.outputs > MAX_OUTPUTS
+    ]
+    if over:
+        raise ValueError(
+            '%s would need more than %d bytes, %d Parameters or %d '
+            'Outputs' % (', '.join(over), max_bytes, MAX_PARAMETERS,
+                         MAX_OUTPUTS)
+        )
+    parent = None
+    if mode == 'nested':
+        parent = OrderedDict()
+        if 'AWSTemplateFormatVersion' in doc:
+            parent['AWSTemplateFormatVersion'] = \
+                doc['AWSTemplateFormatVersion']
+        if 'Description' in doc:
+            parent['Description'] = doc['Description']
+        if parameters:
+            parent['Parameters'] = parameters
+        parent['Resources'] = OrderedDict()
+        for i, part in enumerate(parts):
+            stack_parameters = OrderedDict(
+                (title, {'Ref': title})
+                for title in part.template.get('Parameters', {})
+                if title in parameters
+            )
+            for import_name, producer in rewriter.imports[i].items():
+                stack_parameters[import_name] = {'Fn::GetAtt': [
+                    names[producer], 'Outputs.' + import_name
+                ]}
+            properties = OrderedDict([
+                ('TemplateURL', template_url + part.name + '.json'),
+            ])
+            if stack_parameters:
+                properties['Parameters'] = stack_parameters
+            stack = OrderedDict([
+                ('Type', 'AWS::CloudFormation::Stack'),
+                ('Properties', properties),
+            ])
+            if rewriter.depends[i]:
+                stack['DependsOn'] = sorted(
+                    names[j] for j in rewriter.depends[i]
+                )
+            parent['Resources'][part.name] = stack
+        parent_outputs = OrderedDict()
+        for i, part_outputs in enumerate(outputs):
+            for title in doc.get('Outputs', {}):
+                if title in part_outputs:
+                    parent_outputs[title] = {'Value': {'Fn::GetAtt': [
+                        names[i], 'Outputs.' + title
+                    ]}}
+        if parent_outputs:
+            parent['Outputs'] = parent_outputs
+    return Split(
+        name, parent, parts,
+        sum(len(imports) for imports in rewriter.imports)
+    )
+
+
+def write_split(split, directory):
+    """ Write the parent, named after the split, and every Part to
+        directory as JSON
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = [(split.name, split.parent)] if split.parent is not None else []
+    files.extend((part.name, part.template) for part in split.parts)
+    for title, template in files:
+        with open(os.path.join(directory, title + '.json'), 'w') as stream:
+            json.dump(template, stream, indent=4)
+
+
+def report(split, stream=None):
+    """ Write the resources, bytes, Parameters and Outputs of each Part """
+    stream = sys.stdout if stream is None else stream
+    stream.write('%-24s %10s %10s %10s %10s\n' % (
+        'stack', 'resources', 'bytes', 'parameters', 'outputs'
+    ))
+    for part in split.parts:
+        stream.write('%-24s %10d %10d %10d %10d\n' % (
+            part.name, part.resources, part.bytes, part.parameters,
+            part.outputs
+        ))
+    stream.write('%d values passed between stacks\n' % split.cut)
@@ -1,10 +1,21 @@
 import re
 
+SCHEME_RE = re.compile(r'https?://')
+HOST_RE = re.compile(r'[\da-z.-]+\.[a-z.]{2}')
+PATH_RE = re.compile(r'[/\w .-]*\n?')
+
 
 def valid_url(url):
-    regex = r'(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?$'
-    valid_url_re = re.compile(regex)
-    if valid_url_re.match(url):
+    """ Scheme is optional, then a host of lower case letters, digits,
+        '.' and '-' with a dot followed by two letters, then word
+        characters, '/', '.', '-' and spaces. The same urls as the
+        original single pattern, which let the top level domain run on
+        into the path, but no pattern nests quantifiers so checking is
+        linear in the length of the url
+    """
+    scheme = SCHEME_RE.match(url)
+    rest = url[scheme.end():] if scheme else url
+    if HOST_RE.match(rest) and PATH_RE.fullmatch(rest):
         return url
     else:
-        raise ValueError("%s is not a valid url", url)
+        raise ValueError("%s is not a valid url" % url)